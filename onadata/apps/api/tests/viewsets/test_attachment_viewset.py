@@ -146,6 +146,59 @@ class TestAttachmentViewSet(TestAbstractViewSet):
         response = self.list_view(request)
         self.assertEqual(response.status_code, 400)
 
+    def test_retrieve_attachment_file(self):
+        self._submit_transport_instance_w_attachment()
+        self.attachment.media_file.open('rb')
+        content = self.attachment.media_file.read()
+        self.attachment.media_file.close()
+
+        request = self.factory.get('/', **self.extra)
+        response = self.retrieve_view(
+            request, pk=self.attachment.pk, format='jpg'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), content)
+        self.assertEqual(int(response['Content-Length']), len(content))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        etag = response['ETag']
+
+        # Byte range
+        request = self.factory.get('/', HTTP_RANGE='bytes=10-19', **self.extra)
+        response = self.retrieve_view(
+            request, pk=self.attachment.pk, format='jpg'
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), content[10:20])
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(
+            response['Content-Range'], f'bytes 10-19/{len(content)}'
+        )
+
+        # Suffix byte range
+        request = self.factory.get('/', HTTP_RANGE='bytes=-5', **self.extra)
+        response = self.retrieve_view(
+            request, pk=self.attachment.pk, format='jpg'
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), content[-5:])
+
+        # Byte range out of the file
+        request = self.factory.get(
+            '/', HTTP_RANGE=f'bytes={len(content)}-', **self.extra
+        )
+        response = self.retrieve_view(
+            request, pk=self.attachment.pk, format='jpg'
+        )
+        self.assertEqual(response.status_code, 416)
+
+        # Unchanged file
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=etag, **self.extra)
+        response = self.retrieve_view(
+            request, pk=self.attachment.pk, format='jpg'
+        )
+        self.assertEqual(response.status_code, 304)
+
     def test_direct_image_link(self):
         self._submit_transport_instance_w_attachment()
 
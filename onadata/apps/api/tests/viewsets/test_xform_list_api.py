@@ -1,13 +1,20 @@
 # coding: utf-8
 import os
+from datetime import timedelta
 
 from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.utils import timezone
 from django_digest.test import DigestAuth
 from guardian.shortcuts import assign_perm
+from mock import MagicMock, patch
+from requests.structures import CaseInsensitiveDict
 
+from onadata.apps.api.tools import get_media_file_response
 from onadata.apps.api.tests.viewsets.test_abstract_viewset import\
     TestAbstractViewSet
 from onadata.apps.api.viewsets.xform_list_api import XFormListApi
+from onadata.apps.main.models.meta_data import MetaData
 from onadata.libs.constants import (
     CAN_ADD_SUBMISSIONS,
     CAN_VIEW_XFORM
@@ -56,6 +63,37 @@ class TestXFormListApi(TestAbstractViewSet):
             self.assertEqual(response['Content-Type'],
                              'text/xml; charset=utf-8')
 
+    def test_get_xform_list_etag(self):
+        request = self.factory.get('/')
+        response = self.view(request)
+        auth = DigestAuth('bob', 'bobbob')
+        request.META.update(auth(request.META, response))
+        response = self.view(request)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        content = response.render().content
+
+        # Unchanged form list
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=etag)
+        response = self.view(request)
+        request.META.update(auth(request.META, response))
+        response = self.view(request)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertTrue(response.has_header('X-OpenRosa-Version'))
+
+        # Editing the form invalidates the cached form list
+        self.xform.title = 'Changed title'
+        self.xform.save()
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=etag)
+        response = self.view(request)
+        request.META.update(auth(request.META, response))
+        response = self.view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNotEqual(response.render().content, content)
+        self.assertIn(b'Changed title', response.render().content)
+
     def test_get_xform_list_inactive_form(self):
         self.xform.downloadable = False
         self.xform.save()
@@ -311,6 +349,44 @@ class TestXFormListApi(TestAbstractViewSet):
         self.assertTrue(response.has_header('Date'))
         self.assertEqual(response['Content-Type'], 'text/xml; charset=utf-8')
 
+    @patch('onadata.apps.main.models.meta_data.requests.head')
+    def test_retrieve_xform_manifest_expired_paired_data(self, mock_head):
+        paired_data = MetaData.objects.create(
+            xform=self.xform,
+            data_type='paired_data',
+            data_value='http://kpi/paired-data/xml-external.xml',
+            file_hash='md5:a2f9e9d9c5d4bd79a11a7a0c1e3c0b01',
+            from_kpi=True,
+        )
+        MetaData.objects.filter(pk=paired_data.pk).update(
+            date_modified=timezone.now() - timedelta(
+                seconds=settings.PAIRED_DATA_EXPIRATION + 1
+            )
+        )
+        self.view = XFormListApi.as_view({
+            "get": "manifest"
+        })
+        request = self.factory.get('/')
+        response = self.view(request, pk=self.xform.pk,
+                             username=self.user.username)
+        self.assertEqual(response.status_code, 200)
+        # The current hash is served without waiting for the refresh
+        self.assertIn(paired_data.file_hash,
+                      response.render().content.decode('utf-8'))
+        # Refreshed in the background (Celery runs tasks eagerly in tests)
+        mock_head.assert_called_once_with(
+            paired_data.data_value,
+            timeout=settings.PAIRED_DATA_REFRESH_TIMEOUT,
+        )
+        paired_data.refresh_from_db()
+        self.assertFalse(paired_data.has_expired)
+
+        # Not refreshed again before it expires
+        response = self.view(request, pk=self.xform.pk,
+                             username=self.user.username)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_head.call_count, 1)
+
     def test_retrieve_xform_manifest_anonymous_user(self):
         self._load_metadata(self.xform)
         self.view = XFormListApi.as_view({
@@ -406,3 +482,39 @@ class TestXFormListApi(TestAbstractViewSet):
         response = self.view(request, pk=self.xform.pk,
                              metadata=self.metadata.pk, format='png')
         self.assertEqual(response.status_code, 401)
+
+    @patch('onadata.apps.api.tools.requests.get')
+    def test_paired_data_proxy_content_length(self, mock_get):
+        paired_data = MetaData.objects.create(
+            xform=self.xform,
+            data_type='paired_data',
+            data_value='http://kpi/paired-data/xml-external.xml',
+            file_hash='md5:a2f9e9d9c5d4bd79a11a7a0c1e3c0b01',
+            from_kpi=True,
+        )
+        content = b'<data><name>bob</name></data>'
+        kpi_response = MagicMock(status_code=200)
+        kpi_response.iter_content.return_value = [content]
+        request = self.factory.get('/')
+        request.user = AnonymousUser()
+
+        # Relayed as is
+        kpi_response.headers = CaseInsensitiveDict({
+            'Content-Type': 'text/xml',
+            'Content-Length': str(len(content)),
+        })
+        mock_get.return_value = kpi_response
+        response = get_media_file_response(paired_data, request)
+        self.assertEqual(response['Content-Length'], str(len(content)))
+        self.assertEqual(b''.join(response.streaming_content), content)
+
+        # Compressed by KPI but decoded while relayed: the length is unknown
+        kpi_response.headers = CaseInsensitiveDict({
+            'Content-Type': 'text/xml',
+            'Content-Encoding': 'gzip',
+            'Content-Length': '12',
+        })
+        response = get_media_file_response(paired_data, request)
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), content)
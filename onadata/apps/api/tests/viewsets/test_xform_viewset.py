@@ -1,14 +1,17 @@
 # coding: utf-8
 import os
 import re
-from io import StringIO
+import zipfile
+from io import BytesIO, StringIO
 from xml.dom import Node
 
 from django.conf import settings
 from django.urls import reverse
+from django.test import override_settings
 from django.test.client import Client
 from defusedxml import minidom
 from guardian.shortcuts import assign_perm
+from mock import patch
 from kobo_service_account.utils import get_request_headers
 from rest_framework import status
 
@@ -198,6 +201,33 @@ class TestXFormViewSet(TestAbstractViewSet):
         # check content without UUID
         self.assertEqual(response_doc.toxml(), expected_doc.toxml())
 
+    def test_attachments_zip(self):
+        self.publish_xls_form()
+        self._submit_transport_instance_w_attachment()
+        view = XFormViewSet.as_view({
+            'get': 'attachments_zip'
+        })
+        request = self.factory.get('/', **self.extra)
+        response = view(request, pk=self.xform.pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        content = b''.join(response.streaming_content)
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            self.assertEqual(
+                archive.namelist(), [self.attachment.media_file.name]
+            )
+
+        # No submissions in this range
+        request = self.factory.get(
+            '/', data={'end': '00_01_01_00_00_00'}, **self.extra
+        )
+        response = view(request, pk=self.xform.pk)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        request = self.factory.get('/', data={'start': 'bad'}, **self.extra)
+        response = view(request, pk=self.xform.pk)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_form_tags(self):
         self.publish_xls_form()
         view = XFormViewSet.as_view({
@@ -496,6 +526,59 @@ class TestXFormViewSet(TestAbstractViewSet):
         self.assertEqual(response.data.get('additions'), 9)
         self.assertEqual(response.data.get('updates'), 0)
 
+    @override_settings(CSV_IMPORT_ASYNC_THRESHOLD=1)
+    def test_csv_import_async(self):
+        self.publish_xls_form()
+        view = XFormViewSet.as_view({'post': 'csv_import'})
+        status_view = XFormViewSet.as_view({'get': 'csv_import_status'})
+        csv_import = open(os.path.join(settings.ONADATA_DIR, 'libs',
+                                       'tests', 'fixtures', 'good.csv'))
+        request = self.factory.post(
+            '/', data={'csv_file': csv_import}, **self.extra
+        )
+        response = view(request, pk=self.xform.id)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        task_id = response.data['task_id']
+
+        # Celery tasks are run synchronously in tests
+        request = self.factory.get('/', {'task_id': task_id}, **self.extra)
+        response = status_view(request, pk=self.xform.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'complete': True,
+            'result': {'additions': 9, 'updates': 0},
+        })
+
+        request = self.factory.get('/', {'task_id': 'unknown'}, **self.extra)
+        response = status_view(request, pk=self.xform.id)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(CSV_IMPORT_ASYNC_THRESHOLD=1)
+    def test_csv_import_async_failure_completes_status(self):
+        self.publish_xls_form()
+        view = XFormViewSet.as_view({'post': 'csv_import'})
+        status_view = XFormViewSet.as_view({'get': 'csv_import_status'})
+        csv_import = open(os.path.join(settings.ONADATA_DIR, 'libs',
+                                       'tests', 'fixtures', 'good.csv'))
+        request = self.factory.post(
+            '/', data={'csv_file': csv_import}, **self.extra
+        )
+        with patch(
+            'onadata.libs.utils.csv_import.import_csv',
+            side_effect=RuntimeError('database is gone'),
+        ):
+            response = view(request, pk=self.xform.id)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        request = self.factory.get(
+            '/', {'task_id': response.data['task_id']}, **self.extra
+        )
+        response = status_view(request, pk=self.xform.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['complete'])
+        self.assertIn('database is gone', response.data['result']['error'])
+        self.assertEqual(self.xform.instances.count(), 0)
+
     def test_csv_import_fail(self):
         self.publish_xls_form()
         view = XFormViewSet.as_view({'post': 'csv_import'})
@@ -16,7 +16,9 @@ from django.http import (
     HttpResponse,
     HttpResponseNotFound,
     HttpResponseRedirect,
+    StreamingHttpResponse,
 )
+from django.utils.http import quote_etag
 from django.utils.translation import gettext as t
 from kobo_service_account.utils import get_real_user
 from rest_framework import exceptions
@@ -29,8 +31,8 @@ from onadata.apps.main.models import UserProfile
 from onadata.apps.main.models.meta_data import MetaData
 from onadata.apps.viewer.models.parsed_instance import datetime_from_str
 from onadata.libs.utils.logger_tools import (
+    disposition_ext_and_date,
     publish_form,
-    response_with_mimetype_and_name,
     OPEN_ROSA_VERSION_HEADER,
     OPEN_ROSA_VERSION,
 )
@@ -39,6 +41,7 @@ from onadata.libs.utils.user_auth import (
     check_and_set_form_by_id_string,
 )
 from onadata.libs.utils.common_tags import HOOK_EVENT
+from onadata.libs.utils.media_response import get_storage_file_response
 
 DECIMAL_PRECISION = 2
 
@@ -201,17 +204,19 @@ def get_media_file_response(
         file_path = metadata.data_file.name
         filename, extension = os.path.splitext(file_path.split('/')[-1])
         extension = extension.strip('.')
-        dfs = default_storage
 
-        if dfs.exists(file_path):
-            response = response_with_mimetype_and_name(
-                metadata.data_file_type,
-                filename, extension=extension, show_date=False,
-                file_path=file_path, full_mime=True)
-
-            return response
-        else:
+        if not default_storage.exists(file_path):
             return HttpResponseNotFound()
+
+        return get_storage_file_response(
+            request,
+            file_path,
+            metadata.data_file_type,
+            etag=quote_etag(metadata.file_hash) if metadata.file_hash else None,
+            content_disposition=disposition_ext_and_date(
+                filename, extension, show_date=False
+            ),
+        )
     elif not metadata.is_paired_data:
         return HttpResponseRedirect(metadata.data_value)
 
@@ -225,13 +230,31 @@ def get_media_file_response(
     # Send the request internally to avoid extra traffic on the public interface
     internal_url = metadata.data_value.replace(settings.KOBOFORM_URL,
                                                settings.KOBOFORM_INTERNAL_URL)
-    response = requests.get(internal_url, headers=headers)
+    # Relay the content of the file as it is received, instead of buffering it
+    kpi_response = requests.get(internal_url, headers=headers, stream=True)
 
-    return HttpResponse(
-        content=response.content,
-        status=response.status_code,
-        content_type=response.headers['content-type'],
+    response = StreamingHttpResponse(
+        _iter_kpi_response(kpi_response),
+        status=kpi_response.status_code,
+        content_type=kpi_response.headers['content-type'],
     )
+    # `iter_content()` decodes gzip and deflate: the length of an encoded
+    # response is not the one of the content relayed
+    if (
+        'content-length' in kpi_response.headers
+        and 'content-encoding' not in kpi_response.headers
+    ):
+        response['Content-Length'] = kpi_response.headers['content-length']
+    return response
+
+
+def _iter_kpi_response(kpi_response):
+    try:
+        yield from kpi_response.iter_content(
+            chunk_size=settings.MEDIA_FILE_RESPONSE_CHUNK_SIZE
+        )
+    finally:
+        kpi_response.close()
 
 
 def get_view_name(view_obj):
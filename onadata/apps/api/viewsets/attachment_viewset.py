@@ -1,5 +1,6 @@
 # coding: utf-8
 from django.http import Http404
+from django.utils.http import quote_etag
 from django.utils.translation import gettext as t
 from rest_framework import renderers
 from rest_framework import viewsets
@@ -12,6 +13,7 @@ from onadata.libs import filters
 from onadata.libs.serializers.attachment_serializer import AttachmentSerializer
 from onadata.libs.renderers.renderers import MediaFileContentNegotiation, \
     MediaFileRenderer
+from onadata.libs.utils.media_response import get_storage_file_response
 
 
 class AttachmentViewSet(viewsets.ReadOnlyModelViewSet):
@@ -156,9 +158,17 @@ class AttachmentViewSet(viewsets.ReadOnlyModelViewSet):
 
         if isinstance(request.accepted_renderer, MediaFileRenderer) \
                 and self.object.media_file is not None:
-            data = self.object.media_file.read()
-
-            return Response(data, content_type=self.object.mimetype)
+            # Attachment files never change once submitted
+            etag = quote_etag('{}-{}'.format(
+                self.object.media_file_basename, self.object.media_file_size
+            ))
+            return get_storage_file_response(
+                request,
+                self.object.media_file.name,
+                self.object.mimetype,
+                size=self.object.media_file_size,
+                etag=etag,
+            )
 
         filename = request.query_params.get('filename')
         serializer = self.get_serializer(self.object)
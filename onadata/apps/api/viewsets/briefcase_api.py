@@ -1,7 +1,9 @@
 # coding: utf-8
-from xml.dom import NotFoundErr
+import hashlib
+import json
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files import File
 from django.core.validators import ValidationError
 from django.contrib.auth.models import User
@@ -22,10 +24,14 @@ from onadata.apps.api.permissions import ViewDjangoObjectPermissions
 from onadata.apps.logger.models.attachment import Attachment
 from onadata.apps.logger.models.instance import Instance
 from onadata.apps.logger.models.xform import XForm
+from onadata.apps.logger.xform_instance_parser import set_root_node_attributes
 from onadata.apps.main.models.meta_data import MetaData
 from onadata.apps.main.models.user_profile import UserProfile
 from onadata.libs import filters
-from onadata.libs.authentication import DigestAuthentication
+from onadata.libs.authentication import (
+    DigestAuthentication,
+    get_authentication_classes,
+)
 from onadata.libs.mixins.openrosa_headers_mixin import OpenRosaHeadersMixin
 from onadata.libs.renderers.renderers import TemplateXMLRenderer
 from onadata.libs.serializers.xform_serializer import XFormListSerializer
@@ -89,18 +95,11 @@ class BriefcaseApi(OpenRosaHeadersMixin, mixins.CreateModelMixin,
     serializer_class = XFormListSerializer
     template_name = 'openrosa_response.xml'
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Respect DEFAULT_AUTHENTICATION_CLASSES, but also ensure that the
-        # previously hard-coded authentication classes are included first
-        authentication_classes = [
-            DigestAuthentication,
-        ]
-        self.authentication_classes = authentication_classes + [
-            auth_class
-            for auth_class in self.authentication_classes
-            if auth_class not in authentication_classes
-        ]
+    # Respect DEFAULT_AUTHENTICATION_CLASSES, but also ensure that the
+    # previously hard-coded authentication classes are included first
+    authentication_classes = get_authentication_classes(
+        [DigestAuthentication]
+    )
 
     def get_object(self):
         formId = self.request.GET.get('formId', '')
@@ -152,13 +151,13 @@ class BriefcaseApi(OpenRosaHeadersMixin, mixins.CreateModelMixin,
         if num_entries:
             instances = instances[:num_entries]
 
-        if instances.count():
-            last_instance = instances[instances.count() - 1]
-            self.resumptionCursor = last_instance.pk
-        elif instances.count() == 0 and cursor:
-            self.resumptionCursor = cursor
+        # Only UUIDs are listed, the page is fetched with a single query and
+        # the cursor is the primary key of its last submission
+        instances = list(instances.values('pk', 'uuid'))
+        if instances:
+            self.resumptionCursor = instances[-1]['pk']
         else:
-            self.resumptionCursor = 0
+            self.resumptionCursor = cursor or 0
 
         return instances
 
@@ -217,35 +216,64 @@ class BriefcaseApi(OpenRosaHeadersMixin, mixins.CreateModelMixin,
 
     def retrieve(self, request, *args, **kwargs):
         self.object = self.get_object()
-
-        submission_xml_root_node = self.object.get_root_node()
-        submission_xml_root_node.setAttribute(
-            'instanceID', 'uuid:%s' % self.object.uuid)
-        submission_xml_root_node.setAttribute(
-            'submissionDate', self.object.date_created.isoformat()
+        media_files = list(
+            Attachment.objects.filter(instance=self.object).only(
+                'pk', 'media_file'
+            )
         )
+        host = request.build_absolute_uri().replace(request.get_full_path(), '')
+
+        # Hashing the attachments is expensive, the submission envelope is
+        # cached until the submission or its attachments change
+        cache_key = self._get_submission_cache_key(media_files, host)
+        data = cache.get(cache_key)
+        if data is None:
+            attributes = {
+                'instanceID': 'uuid:%s' % self.object.uuid,
+                'submissionDate': self.object.date_created.isoformat(),
+            }
+            # Added this because of https://github.com/onaio/onadata/pull/2139
+            # Should bring support to ODK v1.17+
+            removed_attributes = (
+                ('xmlns',) if settings.SUPPORT_BRIEFCASE_SUBMISSION_DATE else ()
+            )
+            data = {
+                'submission_data': set_root_node_attributes(
+                    self.object.xml, attributes, removed_attributes
+                ),
+                'media_files': [
+                    {
+                        'filename': media.filename,
+                        'file_hash': media.file_hash,
+                        'media_file': {'name': media.media_file.name},
+                    }
+                    for media in media_files
+                ],
+                'host': host,
+            }
+            cache.set(
+                cache_key, data, settings.BRIEFCASE_SUBMISSION_CACHE_TIMEOUT
+            )
 
-        # Added this because of https://github.com/onaio/onadata/pull/2139
-        # Should bring support to ODK v1.17+
-        if settings.SUPPORT_BRIEFCASE_SUBMISSION_DATE:
-            # Remove namespace attribute if any
-            try:
-                submission_xml_root_node.removeAttribute('xmlns')
-            except NotFoundErr:
-                pass
-
-        data = {
-            'submission_data': submission_xml_root_node.toxml(),
-            'media_files': Attachment.objects.filter(instance=self.object),
-            'host': request.build_absolute_uri().replace(
-                request.get_full_path(), '')
-        }
         return Response(
             data,
             headers=self.get_openrosa_headers(request, location=False),
             template_name='downloadSubmission.xml',
         )
 
+    def _get_submission_cache_key(self, media_files, host):
+        instance = self.object
+        parts = [
+            instance.pk,
+            instance.xml_hash or Instance.get_hash(instance.xml),
+            instance.date_created.isoformat(),
+            [(media.pk, media.media_file.name) for media in media_files],
+            host,
+            settings.SUPPORT_BRIEFCASE_SUBMISSION_DATE,
+        ]
+        digest = hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+        return f'briefcase_submission_{digest}'
+
     @action(detail=True, methods=['GET'])
     def manifest(self, request, *args, **kwargs):
         self.object = self.get_object()
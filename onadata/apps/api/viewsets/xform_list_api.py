@@ -8,6 +8,7 @@ except ImportError:
 from django.conf import settings
 from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.cache import parse_etags
 from rest_framework import permissions, status, viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import action
@@ -16,13 +17,22 @@ from onadata.apps.api.tools import get_media_file_response
 from onadata.apps.logger.models.xform import XForm
 from onadata.apps.main.models.meta_data import MetaData
 from onadata.apps.main.models.user_profile import UserProfile
+from onadata.apps.main.tasks import refresh_paired_data_async
 from onadata.libs import filters
-from onadata.libs.authentication import DigestAuthentication
+from onadata.libs.authentication import (
+    DigestAuthentication,
+    get_authentication_classes,
+)
 from onadata.libs.renderers.renderers import MediaFileContentNegotiation
 from onadata.libs.renderers.renderers import XFormListRenderer
 from onadata.libs.renderers.renderers import XFormManifestRenderer
 from onadata.libs.serializers.xform_serializer import XFormListSerializer
 from onadata.libs.serializers.xform_serializer import XFormManifestSerializer
+from onadata.libs.utils.formlist_cache import (
+    get_cached_formlist,
+    get_formlist_cache_key,
+    store_formlist_in_cache,
+)
 
 
 # 10,000,000 bytes
@@ -38,17 +48,11 @@ class XFormListApi(viewsets.ReadOnlyModelViewSet):
     serializer_class = XFormListSerializer
     template_name = 'api/xformsList.xml'
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Respect DEFAULT_AUTHENTICATION_CLASSES, but also ensure that the
-        # previously hard-coded authentication classes are included first
-        authentication_classes = [
-            DigestAuthentication,
-        ]
-        self.authentication_classes = authentication_classes + [
-            auth_class for auth_class in self.authentication_classes
-                if auth_class not in authentication_classes
-        ]
+    # Respect DEFAULT_AUTHENTICATION_CLASSES, but also ensure that the
+    # previously hard-coded authentication classes are included first
+    authentication_classes = get_authentication_classes(
+        [DigestAuthentication]
+    )
 
     def get_openrosa_headers(self):
         dt = datetime.now(tz=ZoneInfo('UTC')).strftime('%a, %d %b %Y %H:%M:%S %Z')
@@ -118,13 +122,34 @@ class XFormListApi(viewsets.ReadOnlyModelViewSet):
         return queryset
 
     def list(self, request, *args, **kwargs):
-        self.object_list = self.filter_queryset(self.get_queryset())
+        username = self.kwargs.get('username')
 
         if request.method == 'HEAD':
+            self.object_list = self.filter_queryset(self.get_queryset())
             return self.get_response_for_head_request()
 
-        serializer = self.get_serializer(self.object_list, many=True)
-        return Response(serializer.data, headers=self.get_openrosa_headers())
+        if username is None and request.user.is_anonymous:
+            # raises a permission denied exception, forces authentication
+            self.permission_denied(request)
+
+        # Devices poll this endpoint constantly, serve the rendered list from
+        # the cache as long as it is not invalidated
+        cache_key = get_formlist_cache_key(request, username)
+        formlist = get_cached_formlist(cache_key)
+        if formlist is None:
+            self.object_list = self.filter_queryset(self.get_queryset())
+            serializer = self.get_serializer(self.object_list, many=True)
+            content = XFormListRenderer().render(serializer.data)
+            formlist = store_formlist_in_cache(cache_key, content)
+
+        headers = self.get_openrosa_headers()
+        headers['ETag'] = formlist['etag']
+
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if formlist['etag'] in if_none_match or '*' in if_none_match:
+            return Response(headers=headers, status=status.HTTP_304_NOT_MODIFIED)
+
+        return Response(formlist['content'], headers=headers)
 
     def retrieve(self, request, *args, **kwargs):
         self.object = self.get_object()
@@ -152,6 +177,15 @@ class XFormListApi(viewsets.ReadOnlyModelViewSet):
             if not obj.has_expired:
                 media_files[obj.pk] = obj
                 continue
+
+            if settings.PAIRED_DATA_STALE_WHILE_REVALIDATE:
+                # Do not keep devices waiting for KPI, serve the current hash.
+                # The next manifest gets the refreshed one.
+                refresh_paired_data_async(obj)
+                media_files[obj.pk] = obj
+                continue
+
+            obj.refresh_paired_data()
             expired_objects = True
 
         # Retrieve all media files for the current form again except non
@@ -13,7 +13,6 @@ from rest_framework import viewsets
 from rest_framework import mixins
 from rest_framework.authentication import (
     BasicAuthentication,
-    TokenAuthentication,
     SessionAuthentication,)
 from rest_framework.exceptions import NotAuthenticated
 from rest_framework.response import Response
@@ -22,10 +21,15 @@ from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from onadata.apps.logger.models import Instance
 from onadata.apps.main.models.user_profile import UserProfile
 from onadata.libs import filters
-from onadata.libs.authentication import DigestAuthentication
+from onadata.libs.authentication import (
+    DigestAuthentication,
+    TokenAuthentication,
+    get_authentication_classes,
+)
 from onadata.libs.mixins.openrosa_headers_mixin import OpenRosaHeadersMixin
 from onadata.libs.renderers.renderers import TemplateXMLRenderer
 from onadata.libs.serializers.data_serializer import SubmissionSerializer
+from onadata.libs.utils.auth_cache import get_profile_flags
 from onadata.libs.utils.logger_tools import (
     dict2xform,
     safe_create_instance,
@@ -143,29 +147,20 @@ Here is some example JSON, it would replace `[the JSON]` above:
     serializer_class = SubmissionSerializer
     template_name = 'submission.xml'
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Respect DEFAULT_AUTHENTICATION_CLASSES, but also ensure that the
-        # previously hard-coded authentication classes are included first.
-        # We include BasicAuthentication here to allow submissions using basic
-        # authentication over unencrypted HTTP. REST framework stops after the
-        # first class that successfully authenticates, so
-        # HttpsOnlyBasicAuthentication will be ignored even if included by
-        # DEFAULT_AUTHENTICATION_CLASSES.
-        authentication_classes = [
-            DigestAuthentication,
-            BasicAuthentication,
-            TokenAuthentication
-        ]
-        # Do not use `SessionAuthentication`, which implicitly requires CSRF
-        # prevention (which in turn requires that the CSRF token be submitted
-        # as a cookie and in the body of any "unsafe" requests).
-        self.authentication_classes = authentication_classes + [
-            auth_class
-            for auth_class in self.authentication_classes
-            if auth_class not in authentication_classes
-            and not issubclass(auth_class, SessionAuthentication)
-        ]
+    # Respect DEFAULT_AUTHENTICATION_CLASSES, but also ensure that the
+    # previously hard-coded authentication classes are included first.
+    # We include BasicAuthentication here to allow submissions using basic
+    # authentication over unencrypted HTTP. REST framework stops after the
+    # first class that successfully authenticates, so
+    # HttpsOnlyBasicAuthentication will be ignored even if included by
+    # DEFAULT_AUTHENTICATION_CLASSES.
+    # Do not use `SessionAuthentication`, which implicitly requires CSRF
+    # prevention (which in turn requires that the CSRF token be submitted
+    # as a cookie and in the body of any "unsafe" requests).
+    authentication_classes = get_authentication_classes(
+        [DigestAuthentication, BasicAuthentication, TokenAuthentication],
+        excluded_classes=[SessionAuthentication],
+    )
 
     def create(self, request, *args, **kwargs):
 
@@ -177,8 +172,13 @@ Here is some example JSON, it would replace `[the JSON]` above:
                 raise NotAuthenticated
             else:
                 user = get_object_or_404(User, username=username.lower())
-                profile, created = UserProfile.objects.get_or_create(user=user)
-                if profile.require_auth:
+                profile_flags = get_profile_flags(user.pk)
+                if profile_flags is None:
+                    profile, created = UserProfile.objects.get_or_create(
+                        user=user
+                    )
+                    profile_flags = {'require_auth': profile.require_auth}
+                if profile_flags['require_auth']:
                     raise NotAuthenticated
         elif not username:
             # get the username from the user if not set
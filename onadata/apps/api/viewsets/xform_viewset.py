@@ -1,12 +1,18 @@
 # coding: utf-8
+import itertools
 import json
 import os
 from datetime import datetime
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.core.files.storage import default_storage
-from django.http import Http404, HttpResponseBadRequest
+from django.http import (
+    Http404,
+    HttpResponseBadRequest,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404
 from django.utils.translation import gettext as t
 from kobo_service_account.models import ServiceAccountUser
@@ -20,8 +26,10 @@ from rest_framework.viewsets import ModelViewSet
 
 from onadata.apps.api import tools as utils
 from onadata.apps.api.permissions import XFormPermissions
+from onadata.apps.logger.models.attachment import Attachment
 from onadata.apps.logger.models.xform import XForm
 from onadata.apps.viewer.models.export import Export
+from onadata.apps.viewer.tasks import cancel_async_export
 from onadata.libs import filters
 from onadata.libs.exceptions import NoRecordsFoundError
 from onadata.libs.mixins.anonymous_user_public_forms_mixin import (
@@ -31,17 +39,29 @@ from onadata.libs.mixins.labels_mixin import LabelsMixin
 from onadata.libs.renderers import renderers
 from onadata.libs.serializers.xform_serializer import XFormSerializer
 from onadata.libs.utils import log
-from onadata.libs.utils.common_tags import SUBMISSION_TIME
-from onadata.libs.utils.csv_import import submit_csv
+from onadata.libs.utils.common_tags import ID, SUBMISSION_TIME
+from onadata.libs.utils.csv_import import (
+    get_csv_import_status,
+    submit_csv,
+    submit_csv_async,
+)
 from onadata.libs.utils.export_tools import (
     generate_export,
+    query_mongo,
     should_create_new_export,
 )
 from onadata.libs.utils.export_tools import newset_export_for
-from onadata.libs.utils.logger_tools import response_with_mimetype_and_name
+from onadata.libs.utils.export_progress import get_export_status
+from onadata.libs.utils.logger_tools import (
+    disposition_ext_and_date,
+    response_with_mimetype_and_name,
+)
 from onadata.libs.utils.storage import rmdir
 from onadata.libs.utils.string import str2bool
-from onadata.libs.utils.viewer_tools import format_date_for_mongo
+from onadata.libs.utils.viewer_tools import (
+    format_date_for_mongo,
+    stream_attachments_zipfile,
+)
 
 EXPORT_EXT = {
     'xls': Export.XLS_EXPORT,
@@ -214,6 +234,41 @@ def custom_response_handler(request, xform, query, export_type):
     return response
 
 
+def _get_attachments_for_zip(request, xform):
+    """
+    Yield the attachments of `xform`, restricted to the submissions matching
+    the `query`, `start` and `end` parameters of `request` if any.
+    """
+    attachments = Attachment.objects.only(
+        'media_file', 'media_file_size'
+    ).order_by('pk')
+    query = request.GET.get('query')
+    try:
+        if 'start' in request.GET or 'end' in request.GET:
+            query = _set_start_end_params(request, query or {})
+
+        if not query:
+            yield from attachments.filter(instance__xform=xform).iterator()
+            return
+
+        cursor = query_mongo(
+            xform.user.username, xform.id_string, query, fields=[ID]
+        )
+    except ValueError:
+        raise exceptions.ParseError(t('Invalid query'))
+
+    # Avoid huge `IN` clauses with forms which have many submissions
+    chunk_size = 1000
+    instance_ids = []
+    for record in cursor:
+        instance_ids.append(record[ID])
+        if len(instance_ids) == chunk_size:
+            yield from attachments.filter(instance_id__in=instance_ids)
+            instance_ids = []
+    if instance_ids:
+        yield from attachments.filter(instance_id__in=instance_ids)
+
+
 class XFormViewSet(AnonymousUserPublicFormsMixin, LabelsMixin, ModelViewSet):
 
     """
@@ -559,6 +614,86 @@ Where:
 >
 >        HTTP 200 OK
 
+## Download form attachments in a zip file
+
+Stream a zip file of the form attachments, built on the fly. Optionally, only
+attachments of the submissions matching a query or a date range are included.
+
+Where:
+
+- `pk` - is the form unique identifier
+- `query` - (optional) is a mongo query of the submissions to include
+- `start`, `end` - (optional) submission time range in the format \
+YY_MM_DD_hh_mm_ss
+
+<pre class="prettyprint">
+<b>GET</b> /api/v1/forms/<code>{pk}</code>/attachments_zip
+</pre>
+
+> Example
+>
+>       curl -X GET https://example.com/api/v1/forms/28058/attachments_zip?start=23_01_01_00_00_00
+
+> Binary zip file of the attachments is returned as the response for the
+>download.
+>
+> Response
+>
+>        HTTP 200 OK
+
+## Follow the progress of asynchronous exports
+
+Return the status of the form exports, including the progress of the pending
+ones: the current phase (`query`, `format`, `write` or `upload`), the number of
+processed and total records and the estimated number of seconds left (`eta`).
+
+Where:
+
+- `pk` - is the form unique identifier
+- `export_ids` - ids of the exports, can be repeated
+
+<pre class="prettyprint">
+<b>GET</b> /api/v1/forms/<code>{pk}</code>/export_progress
+</pre>
+
+> Example
+>
+>       curl -X GET https://example.com/api/v1/forms/28058/export_progress?export_ids=12
+
+> Response
+>
+>       [
+>           {
+>               "complete": false,
+>               "url": null,
+>               "filename": null,
+>               "export_id": 12,
+>               "progress": {
+>                   "phase": "format",
+>                   "processed": 3000,
+>                   "total": 12000,
+>                   "eta": 95
+>               },
+>               "cancelled": false
+>           }
+>       ]
+
+## Cancel an asynchronous export
+
+A pending export is marked as failed and stops as soon as possible.
+
+<pre class="prettyprint">
+<b>POST</b> /api/v1/forms/<code>{pk}</code>/cancel_export
+</pre>
+
+> Example
+>
+>       curl -X POST -d export_id=12 https://example.com/api/v1/forms/28058/cancel_export
+
+> Response
+>
+>        HTTP 204 No Content
+
 ## Import CSV data to existing form
 
 - `csv_file` a valid csv file with exported \
@@ -580,6 +715,22 @@ data (instance/submission per row)
 >           "additions": 9,
 >           "updates": 0
 >       }
+
+Files larger than `CSV_IMPORT_ASYNC_THRESHOLD` bytes are imported in the
+background: the response is `HTTP 202 Accepted` with a `task_id`, to poll
+the status of the import with
+
+<pre class="prettyprint">
+<b>GET</b> /api/v1/forms/<code>{pk}</code>/csv_import_status?task_id=<code>{task_id}</code>
+</pre>
+
+> Response
+>
+>        HTTP 200 OK
+>       {
+>           "complete": true,
+>           "result": {"additions": 9, "updates": 0}
+>       }
 """
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [
         renderers.XLSRenderer,
@@ -680,6 +831,51 @@ data (instance/submission per row)
                                        query,
                                        export_type)
 
+    @action(detail=True, methods=['GET'])
+    def attachments_zip(self, request, *args, **kwargs):
+        """
+        Stream a ZIP archive of the form attachments, built on the fly from
+        storage.
+        """
+        xform = self.get_object()
+        attachments = _get_attachments_for_zip(request, xform)
+        # Validate parameters before starting the response
+        try:
+            first_attachment = next(attachments)
+        except StopIteration:
+            raise Http404(t('No attachments found'))
+
+        response = StreamingHttpResponse(
+            stream_attachments_zipfile(
+                itertools.chain([first_attachment], attachments)
+            ),
+            content_type='application/zip',
+        )
+        response['Content-Disposition'] = disposition_ext_and_date(
+            f'{xform.id_string}_attachments', 'zip'
+        )
+        log_export(request, xform, Export.ZIP_EXPORT)
+        return response
+
+    @action(detail=True, methods=['GET'])
+    def export_progress(self, request, *args, **kwargs):
+        xform = self.get_object()
+        exports = Export.objects.filter(
+            xform=xform, id__in=request.GET.getlist('export_ids')
+        ).select_related('xform__user')
+        return Response([get_export_status(export) for export in exports])
+
+    @action(detail=True, methods=['POST'])
+    def cancel_export(self, request, *args, **kwargs):
+        xform = self.get_object()
+        export = get_object_or_404(
+            Export, xform=xform, id=request.data.get('export_id')
+        )
+        if not export.is_pending:
+            raise exceptions.ParseError(t('Export is not pending'))
+        cancel_async_export(export)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(detail=True, methods=['POST'])
     def csv_import(self, request, *args, **kwargs):
         """
@@ -698,12 +894,33 @@ data (instance/submission per row)
             # For safety and clarity, this endpoint now explicitly denies
             # access to all non-owners.
             raise exceptions.PermissionDenied
-        resp = submit_csv(request, xform, request.FILES.get('csv_file'))
+        csv_file = request.FILES.get('csv_file')
+        if (
+            csv_file is not None
+            and csv_file.size >= settings.CSV_IMPORT_ASYNC_THRESHOLD
+        ):
+            resp = submit_csv_async(request, xform, csv_file)
+            success_status = status.HTTP_202_ACCEPTED
+        else:
+            resp = submit_csv(request, xform, csv_file)
+            success_status = status.HTTP_200_OK
         return Response(
             data=resp,
-            status=status.HTTP_200_OK if resp.get('error') is None else
+            status=success_status if resp.get('error') is None else
             status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['GET'])
+    def csv_import_status(self, request, *args, **kwargs):
+        xform = self.get_object()
+        if request.user != xform.user:
+            raise exceptions.PermissionDenied
+        import_status = get_csv_import_status(
+            xform.pk, request.GET.get('task_id')
+        )
+        if import_status is None:
+            raise Http404(t('CSV import not found'))
+        return Response(import_status)
+
     def perform_destroy(self, instance):
         username = instance.user.username
         xform_uuid = instance.uuid
@@ -4,9 +4,31 @@ from redis.exceptions import LockError
 
 NONCE_NO_COUNT = ''  # Needs to be something other than None to determine not set vs set to null
 
+# Replace the count of the nonce `KEYS[1]` with `ARGV[1]` if it exists and
+# `ARGV[1]` is greater than its count. Counts are stored as plain integers by
+# django-redis, anything else (i.e. a pickled `NONCE_NO_COUNT`) means that
+# the nonce has no count yet.
+UPDATE_NONCE_COUNT_SCRIPT = """
+local existing = redis.call('GET', KEYS[1])
+if not existing then
+    return 0
+end
+local count = tonumber(existing)
+if count and tonumber(ARGV[1]) <= count then
+    return 0
+end
+if tonumber(ARGV[2]) > 0 then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+else
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
 
 class RedisCacheNonceStorage():
     _blocking_timeout = 30
+    _update_nonce_count_script = None
 
     def _get_cache(self):
         # Dynamic fetching of cache is necessary to work with override_settings
@@ -15,14 +37,57 @@ class RedisCacheNonceStorage():
     def _get_timeout(self):
         return get_setting('DIGEST_NONCE_TIMEOUT_IN_SECONDS', 5 * 60)
 
+    def _use_atomic_update(self):
+        return get_setting('DIGEST_NONCE_ATOMIC_UPDATE', True)
+
     def _generate_cache_key(self, user, nonce):
         return f'user_nonce_{user}_{nonce}'
 
     def update_existing_nonce(self, user, nonce, nonce_count):
         """
         Check and update nonce record. If no record exists or has an invalid count,
-        return False. Create a lock to prevent a concurrent replay attack where
-        two requests are sent immediately and either may finish first.
+        return False.
+
+        The count is compared and updated atomically by Redis in a single
+        round trip, to prevent a concurrent replay attack where two requests
+        are sent immediately and either may finish first. The former
+        lock-based update is used if `DIGEST_NONCE_ATOMIC_UPDATE` is False.
+        """
+        if not self._use_atomic_update():
+            return self._update_existing_nonce_with_lock(
+                user, nonce, nonce_count
+            )
+
+        cache = self._get_cache()
+        cache_key = self._generate_cache_key(user, nonce)
+
+        if nonce_count == None:
+            # Only set if the key already exists
+            return bool(
+                cache.set(
+                    cache_key, NONCE_NO_COUNT, self._get_timeout(), xx=True
+                )
+            )
+
+        client = cache.client.get_client(write=True)
+        script = RedisCacheNonceStorage._update_nonce_count_script
+        if script is None:
+            script = client.register_script(UPDATE_NONCE_COUNT_SCRIPT)
+            RedisCacheNonceStorage._update_nonce_count_script = script
+
+        timeout = self._get_timeout()
+        return bool(
+            script(
+                keys=[cache.make_key(cache_key)],
+                args=[int(nonce_count), int(timeout) if timeout else 0],
+                client=client,
+            )
+        )
+
+    def _update_existing_nonce_with_lock(self, user, nonce, nonce_count):
+        """
+        Create a lock to prevent a concurrent replay attack where two
+        requests are sent immediately and either may finish first.
         """
         cache = self._get_cache()
         cache_key = self._generate_cache_key(user, nonce)
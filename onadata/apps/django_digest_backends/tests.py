@@ -1,5 +1,7 @@
+from concurrent.futures import ThreadPoolExecutor
+
 from django.core.cache import caches
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from .cache import RedisCacheNonceStorage
 
@@ -30,7 +32,30 @@ class TestCacheNonceStorage(TestCase):
 
         self.assertFalse(self.storage.update_existing_nonce(self.test_user, 'testnonce', 2))
         self.assertTrue(self.storage.update_existing_nonce(self.test_user, 'testnonce', 3))
-    
+
+    def test_update_count_without_count(self):
+        self.storage.store_nonce(self.test_user, 'testnonce', None)
+
+        self.assertTrue(self.storage.update_existing_nonce(self.test_user, 'testnonce', 1))
+        self.assertFalse(self.storage.update_existing_nonce(self.test_user, 'testnonce', 1))
+        self.assertEqual(self.cache.get(f'user_nonce_{self.test_user}_testnonce'), 1)
+
+    def test_concurrent_replay(self):
+        """
+        A nonce count is only accepted once when requests are replayed
+        concurrently
+        """
+        nonce = 'testnonce'
+        self.storage.store_nonce(self.test_user, nonce, 1)
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            results = list(executor.map(
+                lambda count: self.storage.update_existing_nonce(self.test_user, nonce, count),
+                [2] * 50
+            ))
+        self.assertEqual(results.count(True), 1)
+
+    @override_settings(DIGEST_NONCE_ATOMIC_UPDATE=False)
     def test_nonce_lock(self):
         """
         Lock timeout should be considered False and delete the nonce
@@ -0,0 +1,77 @@
+# coding: utf-8
+'''
+Django management command to measure the throughput of the Digest
+authentication nonce storage under concurrent submissions, with the atomic
+(Redis script) and the lock-based nonce count updates.
+
+Every client authenticates its submissions with its own nonce, incrementing
+the nonce count each time, and replays each request once. Replays must all
+be rejected.
+
+:Example:
+    python manage.py benchmark_digest_nonce_storage --clients 50 --submissions 200
+'''
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+
+from onadata.apps.django_digest_backends.cache import RedisCacheNonceStorage
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the Digest authentication nonce storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=20,
+            help='Number of concurrent clients',
+        )
+        parser.add_argument(
+            '--submissions',
+            type=int,
+            default=100,
+            help='Number of submissions sent by each client',
+        )
+
+    def handle(self, *_, **options):
+        clients = options['clients']
+        submissions = options['submissions']
+        storage = RedisCacheNonceStorage()
+
+        for name, update in [
+            ('atomic', storage.update_existing_nonce),
+            ('lock', storage._update_existing_nonce_with_lock),
+        ]:
+            user = f'benchmark_{uuid4().hex}'
+            nonces = [uuid4().hex for _ in range(clients)]
+            for nonce in nonces:
+                storage.store_nonce(user, nonce, 1)
+
+            def submit(nonce):
+                accepted = replayed = 0
+                for nonce_count in range(2, submissions + 2):
+                    accepted += update(user, nonce, nonce_count)
+                    replayed += update(user, nonce, nonce_count)
+                return accepted, replayed
+
+            start = time.time()
+            with ThreadPoolExecutor(max_workers=clients) as executor:
+                results = list(executor.map(submit, nonces))
+            duration = time.time() - start
+
+            cache = storage._get_cache()
+            cache.delete_many(
+                [storage._generate_cache_key(user, n) for n in nonces]
+            )
+
+            updates = clients * submissions * 2
+            self.stdout.write(
+                f'{name}: {updates} nonce updates in {duration:.3f}s '
+                f'({updates / duration:.0f}/s), '
+                f'{sum(r[0] for r in results)}/{clients * submissions} '
+                f'accepted, {sum(r[1] for r in results)} replays accepted'
+            )
@@ -3,37 +3,107 @@
 # coding: utf-8
 import sys
 
-from django.core.management.base import BaseCommand, CommandError
+from botocore.exceptions import BotoCoreError, ClientError
+from django.core.management.base import BaseCommand
 from django.core.files.storage import get_storage_class
 
+from onadata.libs.utils.media_migration import (
+    COPIED,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_WORKERS,
+    FAILED,
+    MediaMigration,
+    get_s3_client,
+)
 
-class Command(BaseCommand):
-    help = "Makes all s3 files private"
-
-    def handle(self, *args, **kwargs):
-        permissions = ('private', 'public-read', 'authenticated-read')
 
-        if len(args) < 1:
-            raise CommandError("Missing permission argument")
+class Command(BaseCommand):
+    help = "Changes the permissions of all s3 files"
 
-        permission = args[0]
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'permission',
+            choices=('private', 'public-read', 'authenticated-read'))
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=DEFAULT_WORKERS,
+            help="Number of files changed concurrently")
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Number of files listed at once (at most 1000)")
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            default=False,
+            help="Start from the first file instead of resuming from the "
+                 "last checkpoint")
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            default=False,
+            help="Only report the files which would be changed")
 
-        if permission not in permissions:
-            raise CommandError(
-                "Expected %s as permission" % ' or '.join(permissions))
+    def handle(self, *args, **kwargs):
+        permission = kwargs['permission']
 
         try:
             s3 = get_storage_class('storages.backends.s3boto3.S3Boto3Storage')()
         except:
             print("Missing necessary libraries. Try running: pip install "
-                    "-r requirements-s3.pip")
+                  "-r requirements-s3.pip")
             sys.exit(1)
-        else:
-            all_files = s3.bucket.list()
 
-            for i, f in enumerate(all_files):
-                f.set_acl(permission)
-                if i % 1000 == 0:
-                    print(i, "file objects processed")
+        client = get_s3_client(s3)
+        bucket_name = s3.bucket_name
+        dry_run = kwargs.get('dry_run', False)
+        migration = MediaMigration(
+            f'change_s3_media_permissions:{bucket_name}',
+            workers=kwargs.get('workers') or DEFAULT_WORKERS,
+            dry_run=dry_run,
+            resume=not kwargs.get('restart', False),
+            stdout=sys.stdout,
+        )
+
+        def change_acl(obj):
+            try:
+                if not dry_run:
+                    client.put_object_acl(
+                        ACL=permission, Bucket=bucket_name, Key=obj['Key'])
+            except (BotoCoreError, ClientError) as e:
+                print("\t! '%(key)s': %(error)s"
+                      % {'key': obj['Key'], 'error': e})
+                return FAILED, 0
+            return COPIED, 0
+
+        migration.run(
+            self._get_batches(
+                client,
+                bucket_name,
+                s3.location,
+                migration.get_position(),
+                min(kwargs.get('batch_size') or DEFAULT_BATCH_SIZE, 1000),
+            ),
+            change_acl,
+        )
+
+    @staticmethod
+    def _get_batches(client, bucket_name, prefix, position, batch_size):
+        # Keys are listed in lexicographical order, so the last key of a
+        # page is the position to resume from
+        paginate_args = {
+            'Bucket': bucket_name,
+            'PaginationConfig': {'PageSize': batch_size},
+        }
+        if prefix:
+            paginate_args['Prefix'] = prefix
+        if position:
+            paginate_args['StartAfter'] = position
 
-            print("a total of", i, "file objects processed")
+        paginator = client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(**paginate_args):
+            objects = page.get('Contents', [])
+            if objects:
+                yield objects[-1]['Key'], objects
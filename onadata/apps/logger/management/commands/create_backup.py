@@ -11,31 +11,36 @@ from onadata.libs.utils.backup_tools import create_zip_backup
 
 
 class Command(BaseCommand):
-    args = "outfile username [id_string]"
     help = "Create a zip backup of a form and all its submissions"
 
-    def handle(self, *args, **options):
-        try:
-            output_file = args[0]
-        except IndexError:
-            raise CommandError("Provide the path to the zip file to backup to")
-        else:
-            output_file = os.path.realpath(output_file)
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'outfile',
+            help="Path to the zip file to backup to")
+        parser.add_argument(
+            'username',
+            help="Username of the forms owner")
+        parser.add_argument(
+            'id_string',
+            nargs='?',
+            help="Only backup the submissions of this form")
+        parser.add_argument(
+            '--include-attachments',
+            action='store_true',
+            default=False,
+            help="Add the attachments of the submissions to the zip file")
 
-        try:
-            username = args[1]
-        except IndexError:
-            raise CommandError("You must provide the username to publish the"
-                               " form to.")
+    def handle(self, *args, **options):
+        output_file = os.path.realpath(options['outfile'])
+        username = options['username']
         # make sure user exists
         try:
             user = User.objects.get(username=username)
         except User.DoesNotExist:
             raise CommandError("The user '%s' does not exist." % username)
 
-        try:
-            id_string = args[2]
-        except IndexError:
+        id_string = options['id_string']
+        if id_string is None:
             xform = None
         else:
             # make sure xform exists
@@ -44,4 +49,5 @@ class Command(BaseCommand):
             except XForm.DoesNotExist:
                 raise CommandError("The id_string '%s' does not exist." %
                                    id_string)
-        create_zip_backup(output_file, user, xform)
+        create_zip_backup(output_file, user, xform,
+                          include_attachments=options['include_attachments'])
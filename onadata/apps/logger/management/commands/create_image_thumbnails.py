@@ -1,17 +1,32 @@
 #!/usr/bin/env python
 # vim: ai ts=4 sts=4 et sw=4 fileencoding=utf-8
 # coding: utf-8
-from django.contrib.auth.models import User
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
+from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand, CommandError
-from django.core.files.storage import default_storage
 from django.conf import settings
 
 from onadata.apps.logger.models.attachment import Attachment
 from onadata.apps.logger.models.xform import XForm
-from onadata.libs.utils.image_tools import resize
-from onadata.libs.utils.model_tools import queryset_iterator
-from onadata.libs.utils.viewer_tools import get_path
+from onadata.libs.utils.image_tools import (
+    cache_thumbnails,
+    generate_thumbnails,
+    get_cached_thumbnails,
+)
+
+# number of attachments dispatched to the workers at once
+CHUNK_SIZE = 500
+
+
+def _generate_thumbnails(filename, force):
+    # Runs in worker processes, which must only deal with the storage: they
+    # inherit the database and cache connections of the parent process
+    try:
+        return generate_thumbnails(filename, force=force), None
+    except (IOError, OSError) as e:
+        return set(), e
 
 
 class Command(BaseCommand):
@@ -24,12 +39,17 @@ class Command(BaseCommand):
         parser.add_argument('-i', '--id_string',
                             help="id string of the form")
 
-        parser.add_argument('-f', '--force', action='store_false',
+        parser.add_argument('-f', '--force', action='store_true',
                             help="regenerate thumbnails if they exist.")
 
+        parser.add_argument('-w', '--workers', type=int,
+                            default=settings.THUMBNAIL_MAX_WORKERS,
+                            help="number of processes creating thumbnails.")
+
     def handle(self, *args, **kwargs):
-        attachments_qs = Attachment.objects.select_related(
-            'instance', 'instance__xform')
+        attachments_qs = Attachment.objects.filter(
+            mimetype__startswith='image'
+        ).only('pk', 'media_file')
         if kwargs.get('username'):
             username = kwargs.get('username')
             try:
@@ -51,28 +71,50 @@ class Command(BaseCommand):
                 )
             attachments_qs = attachments_qs.filter(instance__xform=xform)
 
-        for att in queryset_iterator(attachments_qs):
-            filename = att.media_file.name
-            full_path = get_path(filename,
-                                 settings.THUMB_CONF['small']['suffix'])
-            if kwargs.get('force') is not None:
-                for s in settings.THUMB_CONF.keys():
-                    fp = get_path(filename,
-                                  settings.THUMB_CONF[s]['suffix'])
-                    if default_storage.exists(fp):
-                        default_storage.delete(fp)
-
-            if not default_storage.exists(full_path):
-                try:
-                    resize(filename)
-                    if default_storage.exists(get_path(
-                            filename,
-                            '%s' % settings.THUMB_CONF['small']['suffix'])):
+        force = kwargs.get('force', False)
+        workers = kwargs.get('workers') or 1
+        all_sizes = set(settings.THUMB_ORDER)
+
+        pool = None
+        map_ = map
+        if workers > 1:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            map_ = pool.map
+
+        try:
+            last_pk = 0
+            while True:
+                chunk = list(
+                    attachments_qs.filter(pk__gt=last_pk).order_by('pk')[
+                        :CHUNK_SIZE
+                    ]
+                )
+                if not chunk:
+                    break
+                last_pk = chunk[-1].pk
+
+                if not force:
+                    chunk = [
+                        att for att in chunk
+                        if not all_sizes <= get_cached_thumbnails(att)
+                    ]
+
+                filenames = [att.media_file.name for att in chunk]
+                results = map_(_generate_thumbnails, filenames, repeat(force))
+                for att, (sizes, error) in zip(chunk, results):
+                    filename = att.media_file.name
+                    if error:
+                        print('Error on %(filename)s: %(error)s'
+                              % {'filename': filename, 'error': error})
+                        continue
+
+                    cache_thumbnails(att, sizes)
+                    if all_sizes <= sizes:
                         print('Thumbnails created for %(file)s'
                               % {'file': filename})
                     else:
                         print('Problem with the file %(file)s'
                               % {'file': filename})
-                except (IOError, OSError) as e:
-                    print('Error on %(filename)s: %(error)s'
-                          % {'filename': filename, 'error': e})
+        finally:
+            if pool:
+                pool.shutdown()
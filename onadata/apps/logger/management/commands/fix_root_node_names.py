@@ -2,8 +2,9 @@
 import time
 from django.core.management.base import BaseCommand
 from django.db import connections
-from django.db.models import Func, F, Value
+from django.db.models import Func, F, Max, Value
 from onadata.apps.logger.models import XForm, Instance
+from onadata.apps.viewer.tasks import sync_instances_to_mongo_async
 
 
 def replace_first_and_last(s, old, new):
@@ -25,6 +26,57 @@ def write_same_line(dest_file, output, last_len=[0]):
 XFORM_ROOT_NODE_NAME_PATTERN = r'<instance>[^<]*< *([^ ]+)'
 INSTANCE_ROOT_NODE_NAME_PATTERN = r'\/ *([^\/> ]+) *>[^<>]*$'
 
+XFORM_ROOT_NODE_NAMES_TABLE = 'fix_root_node_names_xforms'
+
+# Rename the root nodes of the mismatched instances of a range of primary
+# keys, i.e. the first opening tag and the last closing tag, with the root node
+# names of their forms read from `XFORM_ROOT_NODE_NAMES_TABLE`. Characters of
+# the old names are escaped to be matched literally.
+BULK_FIX_SQL = rf'''
+WITH candidates AS (
+    SELECT instance.id,
+           instance.xml,
+           substring(instance.xml, %s) AS old_name,
+           xform.root_node_name AS new_name
+    FROM logger_instance AS instance
+    JOIN {XFORM_ROOT_NODE_NAMES_TABLE} AS xform
+        ON xform.xform_id = instance.xform_id
+    WHERE instance.id IN ({{instance_ids_sql}})
+), escaped AS (
+    SELECT id,
+           xml,
+           new_name,
+           regexp_replace(old_name, '([^[:alnum:]_])', '\\\1', 'g')
+               AS old_name_pattern
+    FROM candidates
+    WHERE old_name <> new_name
+), fixed AS (
+    SELECT id,
+           regexp_replace(
+               regexp_replace(
+                   xml,
+                   '< *' || old_name_pattern || '(?=[\s/>])',
+                   '<' || new_name
+               ),
+               '/ *' || old_name_pattern || '( *>[^<>]*)$',
+               '/' || new_name || '\1'
+           ) AS xml
+    FROM escaped
+), updated AS (
+    UPDATE logger_instance AS instance
+    SET xml = fixed.xml,
+        xml_hash = encode(sha256(convert_to(fixed.xml, 'UTF8')), 'hex')
+    FROM fixed
+    WHERE instance.id = fixed.id
+    RETURNING instance.id
+)
+SELECT
+    (SELECT array_agg(id) FROM updated),
+    (SELECT count(*) FROM candidates
+     WHERE old_name IS NULL OR new_name IS NULL),
+    (SELECT count(*) FROM candidates)
+'''
+
 
 class Command(BaseCommand):
     """
@@ -63,6 +115,20 @@ class Command(BaseCommand):
             dest='xml__contains',
             help='consider only instances whose XML contains this string'\
         )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            default=False,
+            help='fix the instances with batched UPDATE statements run by '\
+                 'the database, and update MongoDB for the changed ones'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='width of the ranges of instance IDs updated at once with '\
+                 '--bulk'
+        )
 
     def handle(self, *args, **options):
         verbosity = options['verbosity']
@@ -91,6 +157,7 @@ class Command(BaseCommand):
                         **{option[len('xform__'):]: options[option]}
                     )
 
+        filtered_instances = instances
         instances = instances.annotate(
             root_node_name=Func(
                 F('xml'),
@@ -101,6 +168,15 @@ class Command(BaseCommand):
         if not instances.exists():
             self.stderr.write('No Instances found.')
             return
+        if options.get('bulk'):
+            self._fix_in_bulk(
+                connection,
+                filtered_instances,
+                xforms,
+                options.get('batch_size') or 10000,
+                verbosity,
+            )
+            return
         t0 = time.time()
         self.stderr.write(
             'Fetching Instances; please allow several minutes...', ending='')
@@ -209,3 +285,75 @@ class Command(BaseCommand):
             'At the start of processing, the last instance PK '
             'was {}.'.format(instance_id)
         )
+
+    def _fix_in_bulk(self, connection, instances, xforms, batch_size,
+                     verbosity):
+        """
+        Compute the root node name of each form once, in a temporary table,
+        then rename the mismatched instances by ranges of `batch_size`
+        primary keys, without loading them, and queue the update of their
+        MongoDB documents.
+        """
+        xforms_sql, xforms_params = xforms.values('pk').query.sql_with_params()
+        instances = instances.values('pk')
+        last_pk = instances.aggregate(max_pk=Max('pk'))['max_pk']
+        start_pk = instances.order_by('pk').first()['pk']
+
+        completed_instances = 0
+        changed_instances = 0
+        failed_instances = 0
+        t0 = time.time()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {XFORM_ROOT_NODE_NAMES_TABLE} AS '
+                f'SELECT id AS xform_id, '
+                f'substring(xml, %s) AS root_node_name '
+                f'FROM logger_xform WHERE id IN ({xforms_sql})',
+                [XFORM_ROOT_NODE_NAME_PATTERN, *xforms_params]
+            )
+            cursor.execute(
+                f'CREATE UNIQUE INDEX ON {XFORM_ROOT_NODE_NAMES_TABLE} '
+                f'(xform_id)'
+            )
+            try:
+                for batch_start in range(start_pk, last_pk + 1, batch_size):
+                    batch_sql, batch_params = instances.filter(
+                        pk__gte=batch_start, pk__lt=batch_start + batch_size
+                    ).query.sql_with_params()
+                    cursor.execute(
+                        BULK_FIX_SQL.format(instance_ids_sql=batch_sql),
+                        [INSTANCE_ROOT_NODE_NAME_PATTERN, *batch_params]
+                    )
+                    changed_ids, failed, completed = cursor.fetchone()
+                    changed_ids = changed_ids or []
+                    if changed_ids:
+                        sync_instances_to_mongo_async.delay(changed_ids)
+                    changed_instances += len(changed_ids)
+                    failed_instances += failed
+                    completed_instances += completed
+                    if verbosity > 1:
+                        write_same_line(
+                            self.stderr,
+                            'Completed {} Instances up to ID {}: {} changed, '
+                            '{} failed; {}s elapsed.'.format(
+                                completed_instances,
+                                min(batch_start + batch_size - 1, last_pk),
+                                changed_instances,
+                                failed_instances,
+                                int(time.time() - t0),
+                            )
+                        )
+            finally:
+                cursor.execute(f'DROP TABLE {XFORM_ROOT_NODE_NAMES_TABLE}')
+
+        self.stderr.write(
+            '\nFinished {} Instances: {} changed, {} failed.'.format(
+                completed_instances,
+                changed_instances,
+                failed_instances
+            )
+        )
+        self.stdout.write(
+            'At the start of processing, the last instance PK '
+            'was {}.'.format(last_pk)
+        )
@@ -23,6 +23,9 @@ class Command(BaseCommand):
         parser.add_argument('--to',
                             help="username in this server")
 
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Number of concurrent uploads")
+
 
     def handle(self, *args, **kwargs):
         url = kwargs.get('url')
@@ -31,5 +34,6 @@ class Command(BaseCommand):
         to = kwargs.get('to')
         user = User.objects.get(username=to)
         bc = BriefcaseClient(username=username, password=password,
-                             user=user, url=url)
+                             user=user, url=url,
+                             workers=kwargs.get('workers'))
         bc.push()
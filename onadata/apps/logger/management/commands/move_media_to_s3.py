@@ -3,6 +3,7 @@
 # coding: utf-8
 import sys
 
+from botocore.exceptions import BotoCoreError, ClientError
 from django.core.files.storage import default_storage, get_storage_class
 from django.core.management.base import BaseCommand
 
@@ -11,12 +12,47 @@ from onadata.apps.logger.models.attachment import upload_to as\
     attachment_upload_to
 from onadata.apps.logger.models.xform import XForm, upload_to as\
     xform_upload_to
+from onadata.libs.utils.media_migration import (
+    COPIED,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_WORKERS,
+    FAILED,
+    SKIPPED,
+    MediaMigration,
+    get_s3_client,
+    get_s3_key,
+    get_transfer_config,
+    get_upload_extra_args,
+)
 
 
 class Command(BaseCommand):
     help = ("Moves all attachments and xls files "
             "to s3 from the local file system storage.")
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=DEFAULT_WORKERS,
+            help="Number of files copied concurrently")
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Number of records read at once")
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            default=False,
+            help="Start from the first record instead of resuming from the "
+                 "last checkpoint")
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            default=False,
+            help="Only report the files which would be copied")
+
     def handle(self, *args, **kwargs):
         try:
             fs = get_storage_class(
@@ -27,28 +63,108 @@ class Command(BaseCommand):
                   "requirements/s3.pip")
             sys.exit(1)
 
-        if default_storage.__class__ != s3.__class__:
+        if not isinstance(default_storage, s3.__class__):
             print("You must first set your default storage to s3 in your "
                   "local_settings.py file.")
             sys.exit(1)
 
+        self.fs = fs
+        self.s3 = s3
+        self.s3_client = get_s3_client(s3)
+        self.transfer_config = get_transfer_config()
+        self.dry_run = kwargs.get('dry_run', False)
+
         classes_to_move = [
-            (Attachment, 'media_file', attachment_upload_to),
-            (XForm, 'xls', xform_upload_to),
+            (Attachment, 'media_file', attachment_upload_to,
+             ('instance__xform__user',)),
+            (XForm, 'xls', xform_upload_to, ('user',)),
         ]
 
-        for cls, file_field, upload_to in classes_to_move:
+        for cls, file_field, upload_to, related in classes_to_move:
             print("Moving %(class)ss to s3..." % {'class': cls.__name__})
-            for i in cls.objects.all():
-                f = getattr(i, file_field)
-                old_filename = f.name
-                if f.name and fs.exists(f.name) and not s3.exists(
-                        upload_to(i, f.name)):
-                    f.save(fs.path(f.name), fs.open(fs.path(f.name)))
-                    print ("\t+ '%(fname)s'\n\t---> '%(url)s'"
-                           % {'fname': fs.path(old_filename), 'url': f.url})
-                else:
-                    print("\t- (f.name=%s, fs.exists(f.name)=%s, not s3.exist"
-                          "s(upload_to(i, f.name))=%s)" % (
-                              f.name, fs.exists(f.name),
-                              not s3.exists(upload_to(i, f.name))))
+            migration = MediaMigration(
+                f'move_media_to_s3:{cls.__name__}',
+                workers=kwargs.get('workers') or DEFAULT_WORKERS,
+                dry_run=self.dry_run,
+                resume=not kwargs.get('restart', False),
+                stdout=sys.stdout,
+            )
+            renamed = []
+            queryset = self._get_queryset(cls, file_field, related)
+
+            def copy(obj):
+                return self._copy(obj, file_field, upload_to, renamed)
+
+            def save_new_names():
+                # Files are stored under the name given by `upload_to`
+                if renamed and not self.dry_run:
+                    cls.objects.bulk_update(
+                        [cls(pk=pk, **{file_field: name})
+                         for pk, name in renamed],
+                        [file_field],
+                    )
+                renamed.clear()
+
+            migration.run(
+                self._get_batches(
+                    queryset,
+                    migration.get_position(),
+                    kwargs.get('batch_size') or DEFAULT_BATCH_SIZE,
+                ),
+                copy,
+                after_batch=save_new_names,
+            )
+
+    @staticmethod
+    def _get_queryset(cls, file_field, related):
+        # Forms published from XML, e.g. with Briefcase, have no XLS file
+        return cls.objects.exclude(**{file_field: ''}).exclude(
+            **{f'{file_field}__isnull': True}
+        ).select_related(*related).order_by('pk')
+
+    @staticmethod
+    def _get_batches(queryset, position, batch_size):
+        last_pk = int(position or 0)
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return
+            last_pk = batch[-1].pk
+            yield last_pk, batch
+
+    def _copy(self, obj, file_field, upload_to, renamed):
+        """
+        Copy the file of `obj` to S3, in parts if it is large. Runs in worker
+        threads.
+        """
+        name = getattr(obj, file_field).name
+        if not name:
+            return SKIPPED, 0
+
+        new_name = upload_to(obj, name)
+        try:
+            if not self.fs.exists(name) or self.s3.exists(new_name):
+                print("\t- (f.name=%s, fs.exists(f.name)=%s, not s3.exist"
+                      "s(upload_to(i, f.name))=%s)" % (
+                          name, self.fs.exists(name),
+                          not self.s3.exists(new_name)))
+                return SKIPPED, 0
+
+            size = self.fs.size(name)
+            if not self.dry_run:
+                self.s3_client.upload_file(
+                    self.fs.path(name),
+                    self.s3.bucket_name,
+                    get_s3_key(self.s3, new_name),
+                    ExtraArgs=get_upload_extra_args(self.s3, new_name),
+                    Config=self.transfer_config,
+                )
+        except (BotoCoreError, ClientError, OSError) as e:
+            print("\t! '%(fname)s': %(error)s" % {'fname': name, 'error': e})
+            return FAILED, 0
+
+        if new_name != name:
+            renamed.append((obj.pk, new_name))
+        print("\t+ '%(fname)s'\n\t---> '%(name)s'"
+              % {'fname': self.fs.path(name), 'name': new_name})
+        return COPIED, size
@@ -7,7 +7,7 @@ from datetime import timedelta
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db import connection, transaction
 from django.db.models import Count, Value, F, DateField
 from django.db.models.functions import Cast, Concat
 from django.utils import timezone
@@ -19,6 +19,58 @@ from onadata.apps.logger.models import (
 from onadata.apps.main.models.user_profile import UserProfile
 from onadata.libs.utils.jsonbfield_helper import ReplaceValues
 
+DAILY_COUNTS_TABLE = 'populate_submission_counters_daily'
+MONTHLY_COUNTS_TABLE = 'populate_submission_counters_monthly'
+
+# Count the submissions of all the forms by day in a single grouped query.
+# Monthly counts are summed from daily ones: the period starts on the first
+# day of a month.
+BULK_COUNTS_SQL = f'''
+CREATE TEMPORARY TABLE {DAILY_COUNTS_TABLE} ON COMMIT DROP AS
+SELECT instance.xform_id,
+       xform.user_id,
+       instance.date_created::date AS date,
+       COUNT(*) AS counter
+FROM logger_instance AS instance
+JOIN logger_xform AS xform ON xform.id = instance.xform_id
+WHERE instance.date_created >= %(date_threshold)s
+    AND NOT xform.pending_delete
+    AND xform.user_id <> %(anonymous_user_id)s
+GROUP BY instance.xform_id, xform.user_id, instance.date_created::date;
+
+CREATE TEMPORARY TABLE {MONTHLY_COUNTS_TABLE} ON COMMIT DROP AS
+SELECT xform_id,
+       user_id,
+       EXTRACT(YEAR FROM date)::integer AS year,
+       EXTRACT(MONTH FROM date)::integer AS month,
+       SUM(counter) AS counter
+FROM {DAILY_COUNTS_TABLE}
+GROUP BY xform_id, user_id, year, month;
+'''
+
+# Apply the counts of a temporary table to the counters since the threshold:
+# only the rows whose values changed are updated, thus locked.
+# Counters of deleted forms (`xform_id IS NULL`) cannot be recalculated and
+# are left untouched.
+BULK_APPLY_COUNTS_SQL = '''
+UPDATE {table} AS counter
+SET counter = counts.counter
+FROM {counts} AS counts
+WHERE {match}
+    AND counter.counter <> counts.counter;
+
+INSERT INTO {table} (xform_id, user_id, {period_columns}, counter)
+SELECT counts.xform_id, counts.user_id, {counts_period_columns}, counts.counter
+FROM {counts} AS counts
+WHERE NOT EXISTS (SELECT 1 FROM {table} AS counter WHERE {match});
+
+DELETE FROM {table} AS counter
+WHERE counter.xform_id IS NOT NULL
+    AND counter.user_id <> %(anonymous_user_id)s
+    AND {since_threshold}
+    AND NOT EXISTS (SELECT 1 FROM {counts} AS counts WHERE {match});
+'''
+
 
 class Command(BaseCommand):
 
@@ -57,6 +109,17 @@ class Command(BaseCommand):
             help='Skip updating monthly counters. Default is False',
         )
 
+        parser.add_argument(
+            '-b', '--bulk',
+            action='store_true',
+            default=False,
+            help=(
+                'Recalculate the counters of every user with a few '
+                'set-based queries run by the database, without suspending '
+                'submissions. Default is False'
+            ),
+        )
+
     def handle(self, *args, **kwargs):
         days = kwargs['days']
         self._chunks = kwargs['chunks']
@@ -77,6 +140,12 @@ class Command(BaseCommand):
 
         self.release_old_locks()
 
+        if kwargs['bulk']:
+            self.update_counters_in_bulk()
+            if self._verbosity >= 1:
+                self.stdout.write('Done!')
+            return
+
         # Get profiles whose users' submission counters have not been updated yet.
         subquery = UserProfile.objects.values_list('user_id', flat=True).filter(
             metadata__counters_updates_status='complete'
@@ -148,6 +217,68 @@ class Command(BaseCommand):
         elif self._verbosity >= 2:
             self.stdout.write(f'\tNo monthly counters data!')
 
+    def update_counters_in_bulk(self):
+        """
+        Recalculate the daily and monthly counters of all users at once. A
+        submission received in the meantime can be missed: it is counted by
+        the next run.
+        """
+        params = {
+            'anonymous_user_id': settings.ANONYMOUS_USER_ID,
+            'date_threshold': self._date_threshold,
+            'year': self._date_threshold.year,
+            'month': self._date_threshold.month,
+        }
+        targets = [
+            (
+                DailyXFormSubmissionCounter._meta.db_table,
+                DAILY_COUNTS_TABLE,
+                ['date'],
+                'counter.date >= %(date_threshold)s',
+            ),
+        ]
+        if not self._skip_monthly:
+            targets.append((
+                MonthlyXFormSubmissionCounter._meta.db_table,
+                MONTHLY_COUNTS_TABLE,
+                ['year', 'month'],
+                '(counter.year, counter.month) >= (%(year)s, %(month)s)',
+            ))
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(BULK_COUNTS_SQL, params)
+            for table, counts, period_columns, since_threshold in targets:
+                if self._verbosity >= 2:
+                    self.stdout.write(f'\tUpdating {table}...')
+                match = ' AND '.join(
+                    f'counter.{column} = counts.{column}'
+                    for column in ['xform_id', 'user_id', *period_columns]
+                )
+                cursor.execute(
+                    BULK_APPLY_COUNTS_SQL.format(
+                        table=table,
+                        counts=counts,
+                        match=match,
+                        period_columns=', '.join(period_columns),
+                        counts_period_columns=', '.join(
+                            f'counts.{column}' for column in period_columns
+                        ),
+                        since_threshold=since_threshold,
+                    ),
+                    params,
+                )
+
+            UserProfile.objects.exclude(
+                user_id=settings.ANONYMOUS_USER_ID
+            ).exclude(
+                metadata__counters_updates_status='complete'
+            ).update(
+                metadata=ReplaceValues(
+                    'metadata',
+                    updates={'counters_updates_status': 'complete'},
+                ),
+            )
+
     def build_counters(self, xf: 'logger.XForm') -> tuple[list, dict]:
         daily_counters = []
         total_submissions = defaultdict(int)
@@ -0,0 +1,47 @@
+# coding: utf-8
+'''
+Django management command to populate `XForm` instances with the MD5 hashes
+advertised in form lists.
+
+:Example:
+    python manage.py populate_xform_md5_hashes --repopulate --usernames someuser anotheruser
+    python manage.py populate_xform_md5_hashes --all
+'''
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from ...models import XForm
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument(
+            '--all',
+            action='store_true',
+            help='Populate all `XForm` objects with hashes.',
+        )
+        group.add_argument(
+            '--usernames',
+            nargs='+',
+            help='Space-delimited list of usernames whose `XForm` objects '
+                 'should be populated with hashes.'
+        )
+        parser.add_argument(
+            '--repopulate',
+            action='store_true',
+            help='Recalculate even `XForm` objects that already have hashes.',
+        )
+
+    def handle(self, *_, **options):
+        start_time = datetime.now()
+        xforms_updated_total = XForm.populate_md5_hashes(
+            usernames=options['usernames'],
+            repopulate=options['repopulate'],
+        )
+        execution_time = datetime.now() - start_time
+
+        self.stdout.write('Populated {} `XForm` hashes in {}.'.format(
+            xforms_updated_total, execution_time))
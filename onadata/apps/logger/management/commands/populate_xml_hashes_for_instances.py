@@ -8,9 +8,9 @@ Relies solely on the `argparse` capabilities of `BaseCommand` for argument parsi
 
 :Example:
     python manage.py populate_xml_hashes_for_instances --repopulate --usernames someuser anotheruser
-    python manage.py populate_xml_hashes_for_instances --all
+    python manage.py populate_xml_hashes_for_instances --all --workers 4 --resume
 '''
-
+import sys
 from datetime import datetime
 
 from django.core.management.base import BaseCommand
@@ -38,13 +38,40 @@ class Command(BaseCommand):
             help='Recalculate even `Instance` objects that already have '
                  'hashes.',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Number of `Instance` objects updated at once.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes computing the hashes.',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Resume an interrupted run with the same options from its '
+                 'last updated `Instance`.',
+        )
 
     def handle(self, *_, **options):
         # Populate the `Instance` hashes and track how long it took.
         start_time = datetime.now()
+        checkpoint_key = 'populate_xml_hashes_checkpoint_{}_{}'.format(
+            ','.join(sorted(options['usernames'] or [])),
+            options['repopulate'],
+        )
         instances_updated_total = Instance.populate_xml_hashes_for_instances(
             usernames=options['usernames'],
             repopulate=options['repopulate'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            checkpoint_key=checkpoint_key,
+            resume=options['resume'],
+            stdout=sys.stdout,
         )
         execution_time = datetime.now() - start_time
 
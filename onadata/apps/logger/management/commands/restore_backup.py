@@ -5,34 +5,40 @@ import sys
 from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand, CommandError
 
-from onadata.libs.utils.backup_tools import restore_backup_from_zip
+from onadata.libs.utils.backup_tools import (
+    RESTORE_BATCH_SIZE,
+    restore_backup_from_zip,
+)
 
 
 class Command(BaseCommand):
-    args = 'username input_file'
     help = ("Restore a zip backup of a form and all its"
             " submissions")
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'username',
+            help="Username of the forms owner")
+        parser.add_argument(
+            'input_file',
+            help="Path to the zip file to restore from")
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=RESTORE_BATCH_SIZE,
+            help="Number of submissions inserted at once")
+
     def handle(self, *args, **options):
-        try:
-            username = args[0]
-        except IndexError:
-            raise CommandError("You must provide the username to publish the"
-                                 " form to.")
-            # make sure user exists
+        username = options['username']
+        # make sure user exists
         try:
             User.objects.get(username=username)
         except User.DoesNotExist:
             raise CommandError("The user '%s' does not exist." % username)
 
-        try:
-            input_file = args[1]
-        except IndexError:
-            raise CommandError("You must provide the path to restore from.")
-        else:
-            input_file = os.path.realpath(input_file)
+        input_file = os.path.realpath(options['input_file'])
 
         num_instances, num_restored = restore_backup_from_zip(
-            input_file, username)
+            input_file, username, batch_size=options['batch_size'])
         sys.stdout.write("Restored %d of %d submissions\n" %
                          (num_restored, num_instances))
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import json
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
 from django.db.models import Sum, OuterRef, Subquery
 from django.db.models.functions import Coalesce
 
@@ -11,6 +14,57 @@ from onadata.apps.logger.models.xform import XForm
 from onadata.apps.main.models.user_profile import UserProfile
 from onadata.libs.utils.jsonbfield_helper import ReplaceValues
 
+# Sum the attachments of every form (even the soft-deleted ones) in a single
+# grouped query, and only write, thus lock, the forms whose counter changed
+BULK_XFORM_STORAGE_SQL = '''
+WITH totals AS (
+    SELECT instance.xform_id, SUM(attachment.media_file_size) AS total
+    FROM logger_attachment AS attachment
+    JOIN logger_instance AS instance ON instance.id = attachment.instance_id
+    WHERE attachment.deleted_at IS NULL {instance_filter}
+    GROUP BY instance.xform_id
+), changed AS (
+    SELECT xform.id, COALESCE(totals.total, 0) AS total
+    FROM logger_xform AS xform
+    LEFT JOIN totals ON totals.xform_id = xform.id
+    WHERE xform.attachment_storage_bytes <> COALESCE(totals.total, 0)
+        {xform_filter}
+)
+UPDATE logger_xform AS xform
+SET attachment_storage_bytes = changed.total
+FROM changed
+WHERE xform.id = changed.id
+'''
+
+# Same for the profiles, from the counters of their forms. Profiles which
+# have never been counted are marked as complete as well.
+BULK_PROFILE_STORAGE_SQL = '''
+WITH totals AS (
+    SELECT user_id, SUM(attachment_storage_bytes) AS total
+    FROM logger_xform
+    GROUP BY user_id
+), changed AS (
+    SELECT profile.id, COALESCE(totals.total, 0) AS total
+    FROM main_userprofile AS profile
+    LEFT JOIN totals ON totals.user_id = profile.user_id
+    WHERE profile.user_id <> %(anonymous_user_id)s
+        AND (
+            profile.attachment_storage_bytes <> COALESCE(totals.total, 0)
+            OR profile.metadata ->> 'attachments_counting_status'
+                IS DISTINCT FROM 'complete'
+        )
+        {profile_filter}
+)
+UPDATE main_userprofile AS profile
+SET attachment_storage_bytes = changed.total,
+    metadata = CASE
+        WHEN jsonb_typeof(profile.metadata) = 'object' THEN profile.metadata
+        ELSE '{{}}'::jsonb
+    END || %(metadata)s::jsonb
+FROM changed
+WHERE profile.id = changed.id
+'''
+
 
 class Command(BaseCommand):
     help = (
@@ -59,6 +113,17 @@ class Command(BaseCommand):
             help='Do not attempts to remove submission lock on user profiles. Default is False',
         )
 
+        parser.add_argument(
+            '-b', '--bulk',
+            action='store_true',
+            default=False,
+            help=(
+                'Recalculate the counters of every user (or of `username`) '
+                'with a few set-based queries run by the database, without '
+                'suspending submissions. Default is False'
+            ),
+        )
+
     def handle(self, *args, **kwargs):
 
         self._verbosity = kwargs['verbosity']
@@ -67,6 +132,13 @@ class Command(BaseCommand):
         chunks = kwargs['chunks']
         username = kwargs['username']
         skip_lock_release = kwargs['skip_lock_release']
+        bulk = kwargs['bulk']
+
+        if bulk and (self._force or self._sync):
+            self.stderr.write(
+                '`bulk` option cannot be used with `force` or `sync`'
+            )
+            return
 
         if self._force and self._sync:
             self.stderr.write(
@@ -93,6 +165,12 @@ class Command(BaseCommand):
         if not skip_lock_release:
             self._release_locks()
 
+        if bulk:
+            self._update_counters_in_bulk(username)
+            if self._verbosity >= 1:
+                self.stdout.write('Done!')
+            return
+
         profile_queryset = self._reset_user_profile_counters()
 
         user_queryset = self._get_queryset(profile_queryset, username)
@@ -168,6 +246,50 @@ class Command(BaseCommand):
         if self._verbosity >= 1:
             self.stdout.write('Done!')
 
+    def _update_counters_in_bulk(self, username: str | None):
+        """
+        Recalculate the xform and user profile counters with one `UPDATE`
+        per table. A submission received in the meantime can be missed: it is
+        counted by the next run.
+        """
+        params = {
+            'anonymous_user_id': settings.ANONYMOUS_USER_ID,
+            'metadata': json.dumps({
+                'submissions_suspended': False,
+                'attachments_counting_status': 'complete',
+            }),
+        }
+        filters = {
+            'instance_filter': '',
+            'xform_filter': '',
+            'profile_filter': '',
+        }
+        if username:
+            params['user_id'] = (
+                get_user_model().objects.filter(username=username)
+                .values_list('pk', flat=True).first()
+            )
+            filters = {
+                'instance_filter': (
+                    'AND instance.xform_id IN ('
+                    'SELECT id FROM logger_xform WHERE user_id = %(user_id)s)'
+                ),
+                'xform_filter': 'AND xform.user_id = %(user_id)s',
+                'profile_filter': 'AND profile.user_id = %(user_id)s',
+            }
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(BULK_XFORM_STORAGE_SQL.format(**filters), params)
+            if self._verbosity > 1:
+                self.stdout.write(
+                    f'Updated xform storage counters: {cursor.rowcount}'
+                )
+            cursor.execute(BULK_PROFILE_STORAGE_SQL.format(**filters), params)
+            if self._verbosity > 1:
+                self.stdout.write(
+                    f'Updated user profile storage counters: {cursor.rowcount}'
+                )
+
     def _get_queryset(self, profile_queryset, username):
         # Get all profiles already updated to exclude their forms from the list.
         # It is a lazy query and will be `xforms` queryset.
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Existing forms are populated on first use by `XForm.get_md5_hashes()`, or
+    all at once, ahead of time, with:
+        python manage.py populate_xform_md5_hashes --all
+    """
+
+    dependencies = [
+        ('logger', '0033_add_deleted_at_field_to_attachment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='xform',
+            name='md5_hash',
+            field=models.CharField(max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='xform',
+            name='md5_hash_with_disclaimer',
+            field=models.CharField(max_length=32, null=True),
+        ),
+    ]
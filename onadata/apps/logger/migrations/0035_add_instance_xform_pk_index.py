@@ -0,0 +1,21 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # The instance table is too big to be locked while the index is built
+    atomic = False
+
+    dependencies = [
+        ('logger', '0034_add_md5_hashes_to_xform'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='instance',
+            index=models.Index(
+                fields=['xform', 'id'], name='logger_instance_xform_pk_idx'
+            ),
+        ),
+    ]
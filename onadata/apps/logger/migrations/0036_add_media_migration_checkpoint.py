@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logger', '0035_add_instance_xform_pk_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaMigrationCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('position', models.CharField(default='', max_length=1024)),
+                ('processed', models.BigIntegerField(default=0)),
+                ('date_modified', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -11,3 +11,6 @@ from onadata.apps.logger.models.daily_xform_submission_counter import (
 from onadata.apps.logger.models.monthly_xform_submission_counter import (
     MonthlyXFormSubmissionCounter,
 )
+from onadata.apps.logger.models.media_migration_checkpoint import (
+    MediaMigrationCheckpoint,
+)
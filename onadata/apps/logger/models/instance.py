@@ -1,4 +1,6 @@
 # coding: utf-8
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from hashlib import sha256
 
 try:
@@ -10,7 +12,8 @@ import reversion
 from django.contrib.auth.models import User
 from django.contrib.gis.db import models
 from django.contrib.gis.geos import GeometryCollection, Point
-from django.db import models as django_models, transaction
+from django.core.cache import cache
+from django.db import connection, models as django_models, transaction
 from django.db.models import Case, F, When
 from django.db.models.signals import post_delete
 from django.db.models.signals import post_save
@@ -182,6 +185,62 @@ def update_xform_monthly_counter(sender, instance, created, **kwargs):
     ).update(counter=F('counter') + 1)
 
 
+def update_xform_counters_in_bulk(xform, dates_created):
+    """
+    Same as `update_xform_submission_count()`, `update_xform_daily_counter()`
+    and `update_xform_monthly_counter()` for many new `Instance`s of `xform`
+    at once, with a single update of each counter row.
+
+    :param list dates_created: The `date_created` of the new `Instance`s
+    """
+    if not dates_created:
+        return
+
+    count = len(dates_created)
+    with transaction.atomic():
+        XForm.objects.filter(pk=xform.pk).update(
+            num_of_submissions=F('num_of_submissions') + count,
+            last_submission_time=max(dates_created),
+        )
+        # Hack to avoid circular imports
+        UserProfile = User.profile.related.related_model
+        profile, created = UserProfile.objects.only('pk').get_or_create(
+            user_id=xform.user_id
+        )
+        UserProfile.objects.filter(pk=profile.pk).update(
+            num_of_submissions=F('num_of_submissions') + count,
+        )
+
+        days = Counter(date_created.date() for date_created in dates_created)
+        for day, day_count in days.items():
+            DailyXFormSubmissionCounter.objects.get_or_create(
+                date=day,
+                xform_id=xform.pk,
+                user_id=xform.user_id,
+            )
+            DailyXFormSubmissionCounter.objects.filter(
+                date=day,
+                xform_id=xform.pk,
+            ).update(counter=F('counter') + day_count)
+
+        months = Counter(
+            (date_created.year, date_created.month)
+            for date_created in dates_created
+        )
+        for (year, month), month_count in months.items():
+            MonthlyXFormSubmissionCounter.objects.get_or_create(
+                user_id=xform.user_id,
+                xform_id=xform.pk,
+                year=year,
+                month=month,
+            )
+            MonthlyXFormSubmissionCounter.objects.filter(
+                xform_id=xform.pk,
+                year=year,
+                month=month,
+            ).update(counter=F('counter') + month_count)
+
+
 def update_xform_submission_count_delete(sender, instance, **kwargs):
 
     value = kwargs.pop('value', 1)
@@ -268,6 +327,12 @@ class Instance(models.Model):
 
     class Meta:
         app_label = 'logger'
+        indexes = [
+            # Paginate the submissions of a form by primary key
+            models.Index(
+                fields=['xform', 'id'], name='logger_instance_xform_pk_idx'
+            ),
+        ]
 
     @property
     def asset(self):
@@ -296,10 +361,14 @@ class Instance(models.Model):
         if profile.metadata.get('submissions_suspended', False):
             raise TemporarilyUnavailableError()
 
-    def _set_geom(self):
+    def _set_geom(self, geo_xpaths=None):
+        """
+        :param list geo_xpaths: The geopoint XPaths of the form, to avoid
+            loading its data dictionary when they are already known
+        """
         xform = self.xform
-        data_dictionary = xform.data_dictionary()
-        geo_xpaths = data_dictionary.geopoint_xpaths()
+        if geo_xpaths is None:
+            geo_xpaths = xform.data_dictionary().geopoint_xpaths()
         doc = self.get_dict()
         points = []
 
@@ -358,16 +427,36 @@ class Instance(models.Model):
         self.xml_hash = self.get_hash(self.xml)
 
     @classmethod
-    def populate_xml_hashes_for_instances(cls, usernames=None, pk__in=None, repopulate=False):
+    def populate_xml_hashes_for_instances(
+        cls,
+        usernames=None,
+        pk__in=None,
+        repopulate=False,
+        chunk_size=2000,
+        workers=1,
+        checkpoint_key=None,
+        resume=False,
+        stdout=None,
+    ):
         """
         Populate the `xml_hash` field for `Instance` instances limited to the specified users
         and/or DB primary keys.
 
+        `Instance`s are read by chunks in primary key order. The hashes of a chunk are
+        computed, in `workers` processes if more than one, and written with a single
+        `UPDATE ... FROM (VALUES ...)` statement, which does not trigger any signal.
+
         :param list[str] usernames: Optional list of usernames for whom `Instance`s will be
         populated with hashes.
         :param list[int] pk__in: Optional list of primary keys for `Instance`s that should be
         populated with hashes.
         :param bool repopulate: Optional argument to force repopulation of existing hashes.
+        :param int chunk_size: Number of `Instance`s hashed and updated at once.
+        :param int workers: Number of processes computing the hashes.
+        :param str checkpoint_key: Optional cache key the primary key of the last updated
+        `Instance` is saved to after each chunk, and deleted once all are done.
+        :param bool resume: Start after the primary key saved at `checkpoint_key`.
+        :param stdout: Optional file-like object progress is written to.
         :returns: Total number of `Instance`s updated.
         :rtype: int
         """
@@ -384,38 +473,82 @@ class Instance(models.Model):
         # Query for the target `Instance`s.
         target_instances_queryset = cls.objects.filter(**filter_kwargs)
 
-        # Exit quickly if there's nothing to do.
-        if not target_instances_queryset.exists():
-            return 0
+        last_pk = 0
+        if checkpoint_key and resume:
+            last_pk = cache.get(checkpoint_key) or 0
 
-        # Limit our queryset result content since we'll only need the `pk` and `xml` attributes.
-        target_instances_queryset = target_instances_queryset.only('pk', 'xml')
+        # Only the `pk` and `xml` are needed
+        target_instances_queryset = target_instances_queryset.order_by(
+            'pk'
+        ).values_list('pk', 'xml')
         instances_updated_total = 0
 
-        # Break the potentially large `target_instances_queryset` into chunks to avoid memory
-        # exhaustion.
-        chunk_size = 2000
-        target_instances_queryset = target_instances_queryset.order_by('pk')
-        target_instances_qs_chunk = target_instances_queryset
-        while target_instances_qs_chunk.exists():
-            # Take a chunk of the target `Instance`s.
-            target_instances_qs_chunk = target_instances_qs_chunk[0:chunk_size]
-
-            for instance in target_instances_qs_chunk:
-                pk = instance.pk
-                xml = instance.xml
-                # Do a `Queryset.update()` on this individual instance to avoid signals triggering
-                # things like `Reversion` versioning.
-                instances_updated_count = Instance.objects.filter(pk=pk).update(
-                    xml_hash=cls.get_hash(xml))
-                instances_updated_total += instances_updated_count
-
-            # Set up the next chunk
-            target_instances_qs_chunk = target_instances_queryset.filter(
-                pk__gt=instance.pk)
+        executor = ProcessPoolExecutor(workers) if workers > 1 else None
+        try:
+            while True:
+                # Break the potentially large `target_instances_queryset` into chunks to
+                # avoid memory exhaustion.
+                chunk = list(
+                    target_instances_queryset.filter(pk__gt=last_pk)[:chunk_size]
+                )
+                if not chunk:
+                    break
+
+                pks, xmls = zip(*chunk)
+                if executor:
+                    hashes = executor.map(
+                        cls.get_hash, xmls, chunksize=max(len(xmls) // workers, 1)
+                    )
+                else:
+                    hashes = map(cls.get_hash, xmls)
+                instances_updated_total += cls._bulk_update_xml_hashes(
+                    zip(pks, hashes)
+                )
+
+                last_pk = pks[-1]
+                if checkpoint_key:
+                    cache.set(checkpoint_key, last_pk, None)
+                if stdout:
+                    stdout.write(
+                        f'Populated {instances_updated_total} hashes up to '
+                        f'#{last_pk}\n'
+                    )
+                    stdout.flush()
+        finally:
+            if executor:
+                executor.shutdown()
+
+        if checkpoint_key:
+            cache.delete(checkpoint_key)
 
         return instances_updated_total
 
+    @classmethod
+    def _bulk_update_xml_hashes(cls, pks_and_hashes):
+        """
+        Set the `xml_hash` of many `Instance`s with a single statement
+
+        :param pks_and_hashes: Iterable of `(pk, xml_hash)` tuples
+        :returns: Number of updated rows
+        :rtype: int
+        """
+        params = []
+        for pk, xml_hash in pks_and_hashes:
+            params += [pk, xml_hash]
+        if not params:
+            return 0
+
+        values = ', '.join(['(%s, %s)'] * (len(params) // 2))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {cls._meta.db_table} AS instance '
+                f'SET xml_hash = new.xml_hash '
+                f'FROM (VALUES {values}) AS new (id, xml_hash) '
+                f'WHERE instance.id = new.id',
+                params,
+            )
+            return cursor.rowcount
+
     def get(self, abbreviated_xpath):
         self._set_parser()
         return self._parser.get(abbreviated_xpath)
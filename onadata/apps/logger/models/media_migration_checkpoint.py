@@ -0,0 +1,17 @@
+# coding: utf-8
+from django.db import models
+
+
+class MediaMigrationCheckpoint(models.Model):
+    """
+    Position reached by a media migration, e.g. `move_media_to_s3`, which
+    resumes from it when interrupted
+    """
+    name = models.CharField(max_length=255, unique=True)
+    # Last primary key or storage key processed
+    position = models.CharField(max_length=1024, default='')
+    processed = models.BigIntegerField(default=0)
+    date_modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'logger'
@@ -2,7 +2,7 @@
 import json
 import os
 import re
-from copy import deepcopy
+from copy import copy, deepcopy
 from io import BytesIO
 from xml.sax.saxutils import escape as xml_escape
 
@@ -102,6 +102,12 @@ class XForm(BaseModel):
     kpi_asset_uid = models.CharField(max_length=32, null=True)
     pending_delete = models.BooleanField(default=False)
 
+    # MD5 hashes of `xml` with and without disclaimers, advertised to devices
+    # in form lists. Stored to avoid hashing (and rebuilding) the XML each
+    # time a form is listed.
+    md5_hash = models.CharField(max_length=32, null=True)
+    md5_hash_with_disclaimer = models.CharField(max_length=32, null=True)
+
     class Meta:
         app_label = 'logger'
         unique_together = (("user", "id_string"),)
@@ -179,6 +185,26 @@ class XForm(BaseModel):
         self.description = self.description \
             if self.description and self.description != '' else self.title
 
+    def _set_md5_hashes(self):
+        self.md5_hash = get_hash(self.xml)
+        self.md5_hash_with_disclaimer = get_hash(self.xml_with_disclaimer)
+
+    def get_md5_hashes(self):
+        """
+        Return `md5_hash` and `md5_hash_with_disclaimer`, computing and saving
+        them first if the form has not been populated yet, e.g. if it was
+        published before these fields existed. They are the same hashes as
+        before, so devices do not download the form again.
+        """
+        if self.md5_hash is None or self.md5_hash_with_disclaimer is None:
+            self._set_md5_hashes()
+            # Like `populate_md5_hashes()`, do not touch `date_modified`
+            XForm.all_objects.filter(pk=self.pk).update(
+                md5_hash=self.md5_hash,
+                md5_hash_with_disclaimer=self.md5_hash_with_disclaimer,
+            )
+        return self.md5_hash, self.md5_hash_with_disclaimer
+
     def _set_encrypted_field(self):
         if self.json and self.json != '':
             json_dict = json.loads(self.json)
@@ -209,6 +235,14 @@ class XForm(BaseModel):
             raise XLSFormError(t('In strict mode, the XForm ID must be a '
                                'valid slug and contain no spaces.'))
 
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'xml' in update_fields:
+            self._set_md5_hashes()
+            if update_fields is not None:
+                kwargs['update_fields'] = list(update_fields) + [
+                    'md5_hash', 'md5_hash_with_disclaimer'
+                ]
+
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -245,14 +279,6 @@ class XForm(BaseModel):
         except ObjectDoesNotExist:
             pass
 
-    @property
-    def md5_hash(self):
-        return get_hash(self.xml)
-
-    @property
-    def md5_hash_with_disclaimer(self):
-        return get_hash(self.xml_with_disclaimer)
-
     @property
     def can_be_replaced(self):
         if hasattr(self.submission_count, '__call__'):
@@ -301,7 +327,59 @@ class XForm(BaseModel):
 
     @property
     def xml_with_disclaimer(self):
-        return XMLFormWithDisclaimer(self).get_object().xml
+        # `XMLFormWithDisclaimer` alters the XML of the object it is given
+        return XMLFormWithDisclaimer(copy(self)).get_object().xml
+
+    @classmethod
+    def populate_md5_hashes(cls, usernames=None, pk__in=None, repopulate=False):
+        """
+        Populate the `md5_hash` and `md5_hash_with_disclaimer` fields of
+        `XForm` instances limited to the specified users and/or DB primary
+        keys.
+
+        :param list[str] usernames: Optional list of usernames whose `XForm`s
+        will be populated with hashes.
+        :param list[int] pk__in: Optional list of primary keys of the `XForm`s
+        that should be populated with hashes.
+        :param bool repopulate: Optional argument to force repopulation of
+        existing hashes, e.g. when disclaimers change.
+        :returns: Total number of `XForm`s updated.
+        :rtype: int
+        """
+        filter_kwargs = dict()
+        if usernames:
+            filter_kwargs['user__username__in'] = usernames
+        if pk__in:
+            filter_kwargs['pk__in'] = pk__in
+
+        queryset = cls.all_objects.filter(**filter_kwargs)
+        # By default, skip over forms previously populated with hashes.
+        if not repopulate:
+            queryset = queryset.filter(
+                models.Q(md5_hash=None) | models.Q(md5_hash_with_disclaimer=None)
+            )
+        queryset = queryset.only('pk', 'id_string', 'xml').order_by('pk')
+
+        xforms_updated_total = 0
+        chunk_size = 200
+        last_pk = 0
+        while True:
+            # Break the potentially large queryset into chunks to avoid memory
+            # exhaustion. Forms are big.
+            xforms = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+            if not xforms:
+                break
+
+            for xform in xforms:
+                xform._set_md5_hashes()
+            # `bulk_update()` does not send signals nor touch `date_modified`
+            cls.all_objects.bulk_update(
+                xforms, ['md5_hash', 'md5_hash_with_disclaimer']
+            )
+            xforms_updated_total += len(xforms)
+            last_pk = xforms[-1].pk
+
+        return xforms_updated_total
 
 
 def update_profile_num_submissions(sender, instance, **kwargs):
@@ -1,18 +1,41 @@
 # coding: utf-8
 import logging
 
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ObjectDoesNotExist
 from django.core.files.storage import default_storage
 from django.db import transaction
 from django.db.models import F
 from django.db.models.signals import (
+    post_delete,
     post_save,
     pre_delete,
 )
 from django.dispatch import receiver
+from guardian.models import UserObjectPermission
+from guardian.shortcuts import get_users_with_perms
+from rest_framework.authtoken.models import Token
 
+from onadata.apps.form_disclaimer.models import FormDisclaimer
 from onadata.apps.logger.models.attachment import Attachment
 from onadata.apps.logger.models.xform import XForm
+from onadata.apps.logger.tasks import populate_xform_md5_hashes
 from onadata.apps.main.models.user_profile import UserProfile
+from onadata.apps.viewer.models.data_dictionary import DataDictionary
+from onadata.libs.utils.auth_cache import (
+    invalidate_profile_flags,
+    invalidate_tokens,
+    invalidate_xform_permissions,
+)
+from onadata.libs.utils.formlist_cache import invalidate_formlist_cache
+
+# `XForm` fields which are not part of the form list
+FORMLIST_IGNORED_XFORM_FIELDS = {
+    'num_of_submissions',
+    'last_submission_time',
+    'attachment_storage_bytes',
+}
 
 
 @receiver(pre_delete, sender=Attachment)
@@ -87,3 +110,84 @@ def post_save_attachment(instance, created, **kwargs):
         XForm.objects.filter(pk=xform.pk).update(
             attachment_storage_bytes=F('attachment_storage_bytes') + file_size
         )
+
+
+@receiver(post_save, sender=XForm)
+@receiver(post_save, sender=DataDictionary)
+@receiver(post_delete, sender=XForm)
+@receiver(post_delete, sender=DataDictionary)
+def invalidate_formlist_cache_on_xform_change(instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= FORMLIST_IGNORED_XFORM_FIELDS:
+        return
+
+    xform = instance
+    try:
+        username = xform.user.username
+    except ObjectDoesNotExist:
+        # The owner is being deleted along with their forms
+        return
+
+    user_ids = set(get_users_with_perms(xform).values_list('pk', flat=True))
+    user_ids.add(xform.user_id)
+    invalidate_formlist_cache(user_ids=user_ids, usernames=[username])
+
+
+@receiver(post_save, sender=UserObjectPermission)
+@receiver(post_delete, sender=UserObjectPermission)
+def invalidate_formlist_cache_on_permission_change(instance, **kwargs):
+    if instance.content_type_id == ContentType.objects.get_for_model(XForm).pk:
+        invalidate_formlist_cache(user_ids=[instance.user_id])
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_formlist_cache_on_profile_change(instance, **kwargs):
+    # `require_auth` changes which forms anonymous users can list
+    update_fields = kwargs.get('update_fields')
+    if update_fields and 'require_auth' not in update_fields:
+        return
+    invalidate_formlist_cache(usernames=[instance.user.username])
+
+
+@receiver(post_save, sender=UserObjectPermission)
+@receiver(post_delete, sender=UserObjectPermission)
+def invalidate_auth_cache_on_permission_change(instance, **kwargs):
+    if instance.content_type_id == ContentType.objects.get_for_model(XForm).pk:
+        invalidate_xform_permissions(instance.object_pk, instance.user_id)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_auth_cache_on_profile_change(instance, **kwargs):
+    invalidate_profile_flags(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_auth_cache_on_user_change(instance, **kwargs):
+    # Cached tokens hold the user, e.g. whether it is active. Logins only
+    # update `last_login`, which does not matter.
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_tokens(
+        Token.objects.filter(user_id=instance.pk).values_list('key', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_auth_cache_on_token_delete(instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=FormDisclaimer)
+@receiver(post_delete, sender=FormDisclaimer)
+def update_xform_hashes_on_disclaimer_change(instance, **kwargs):
+    # Disclaimers are part of the form hash. Disclaimers without a form apply
+    # to all of them, whose hashes are recalculated in the background.
+    if instance.xform_id:
+        XForm.populate_md5_hashes(pk__in=[instance.xform_id], repopulate=True)
+        invalidate_formlist_cache_on_xform_change(instance.xform)
+    else:
+        transaction.on_commit(lambda: populate_xform_md5_hashes.delay())
+        invalidate_formlist_cache()
@@ -15,6 +15,7 @@ from django.core.management import call_command
 from django.utils import timezone
 
 from onadata.celery import app
+from onadata.libs.utils.formlist_cache import invalidate_formlist_cache
 from .models.daily_xform_submission_counter import DailyXFormSubmissionCounter
 from .models import Instance, XForm
 
@@ -34,8 +35,10 @@ def delete_daily_counters():
 # See https://github.com/kobotoolbox/kobocat/issues/242
 
 
-@shared_task(soft_time_limit=600, time_limit=900)
+@shared_task(soft_time_limit=6 * 60 * 60, time_limit=6 * 60 * 60 + 300)
 def fix_root_node_names(**kwargs):
+    # The set-based mode is the only one fast enough for large databases
+    kwargs.setdefault('bulk', True)
     call_command(
         'fix_root_node_names',
         **kwargs
@@ -121,4 +124,28 @@ def generate_stats_zip(output_filename):
 
 @app.task()
 def sync_storage_counters():
-    call_command('update_attachment_storage_bytes', verbosity=3, sync=True)
+    # The set-based mode recalculates every counter in a few queries
+    call_command('update_attachment_storage_bytes', verbosity=1, bulk=True)
+
+
+@app.task()
+def populate_xform_md5_hashes():
+    """
+    Recalculate the hashes of all forms, e.g. once disclaimers which apply to
+    all of them have changed
+    """
+    XForm.populate_md5_hashes(repopulate=True)
+    invalidate_formlist_cache()
+
+
+@shared_task(bind=True, soft_time_limit=3600, time_limit=3630)
+def import_csv_async(self, xform_id, file_path, submitted_by_id):
+    """
+    Import a large CSV file uploaded to the `csv_import` endpoint
+    """
+    # Avoid circular import
+    from onadata.libs.utils.csv_import import import_csv_from_storage
+
+    return import_csv_from_storage(
+        xform_id, file_path, submitted_by_id, self.request.id
+    )
@@ -6,6 +6,7 @@ from django.conf import settings
 from django.core.files.base import File
 from django.core.files.storage import default_storage
 from django.core.management import call_command
+from mock import patch
 
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.apps.logger.models import Attachment, Instance
@@ -36,7 +37,18 @@ class TestAttachment(TestBase):
             thumbnail = '%s-small.jpg' % filename
             self.assertNotEqual(
                 url.find(thumbnail), -1)
-            for size in ['small', 'medium', 'large']:
+            # Other sizes are only created when they are requested
+            self.assertTrue(default_storage.exists(thumbnail))
+            self.assertFalse(default_storage.exists(f'{filename}-large.jpg'))
+            with patch.object(
+                default_storage, 'exists', wraps=default_storage.exists
+            ) as mock_exists:
+                # Thumbnails known to exist are not looked up in storage
+                image_url(attachment, 'small')
+                mock_exists.assert_not_called()
+                image_url(attachment, 'large')
+                self.assertTrue(mock_exists.called)
+            for size in ['small', 'large']:
                 thumbnail = f'{filename}-{size}.jpg'
                 self.assertTrue(
                     default_storage.exists(thumbnail))
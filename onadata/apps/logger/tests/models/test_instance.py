@@ -4,6 +4,7 @@ import reversion
 from datetime import datetime, timedelta
 
 from dateutil import parser
+from django.core.cache import cache
 from django.utils.timezone import utc
 from django_digest.test import DigestAuth
 from mock import patch
@@ -120,3 +121,27 @@ class TestInstance(TestBase):
 
     def test_reversion(self):
         self.assertTrue(reversion.is_registered(Instance))
+
+    def test_populate_xml_hashes_for_instances(self):
+        self._publish_transportation_form()
+        self._make_submissions()
+        Instance.objects.update(xml_hash=Instance.DEFAULT_XML_HASH)
+        last_pk = Instance.objects.order_by('pk').values_list(
+            'pk', flat=True
+        )[1]
+        # Resume after the second instance, e.g. after an interruption
+        cache.set('test_xml_hashes', last_pk)
+
+        updated = Instance.populate_xml_hashes_for_instances(
+            chunk_size=1, checkpoint_key='test_xml_hashes', resume=True
+        )
+
+        self.assertEqual(updated, 2)
+        self.assertIsNone(cache.get('test_xml_hashes'))
+        for instance in Instance.objects.all():
+            if instance.pk <= last_pk:
+                self.assertIsNone(instance.xml_hash)
+            else:
+                self.assertEqual(
+                    instance.xml_hash, Instance.get_hash(instance.xml)
+                )
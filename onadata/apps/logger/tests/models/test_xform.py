@@ -3,8 +3,16 @@ import os
 import reversion
 import unittest
 
+from django.test import RequestFactory
+
+from onadata.apps.form_disclaimer.models import FormDisclaimer
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.apps.logger.models import XForm, Instance
+from onadata.libs.serializers.xform_serializer import (
+    XFormListSerializer,
+    XFormSerializer,
+)
+from onadata.libs.utils.hash import get_hash
 
 
 class TestXForm(TestBase):
@@ -26,6 +34,73 @@ class TestXForm(TestBase):
         self.xform._set_title()
         self.assertIn(self.xform.title, self.xform.xml)
 
+    def test_md5_hashes(self):
+        self._publish_transportation_form()
+        self.assertEqual(self.xform.md5_hash, get_hash(self.xform.xml))
+        self.assertEqual(
+            self.xform.md5_hash_with_disclaimer, self.xform.md5_hash
+        )
+
+        # Adding a disclaimer only changes the hash with disclaimer
+        disclaimer = FormDisclaimer.objects.create(
+            xform=self.xform,
+            language_code='en',
+            message='Disclaimer',
+            default=True,
+        )
+        self.xform.refresh_from_db()
+        self.assertEqual(self.xform.md5_hash, get_hash(self.xform.xml))
+        self.assertEqual(
+            self.xform.md5_hash_with_disclaimer,
+            get_hash(self.xform.xml_with_disclaimer),
+        )
+        self.assertNotEqual(
+            self.xform.md5_hash_with_disclaimer, self.xform.md5_hash
+        )
+
+        disclaimer.delete()
+        self.xform.refresh_from_db()
+        self.assertEqual(
+            self.xform.md5_hash_with_disclaimer, self.xform.md5_hash
+        )
+
+        # Backfill
+        XForm.objects.filter(pk=self.xform.pk).update(
+            md5_hash=None, md5_hash_with_disclaimer=None
+        )
+        self.assertEqual(XForm.populate_md5_hashes(), 1)
+        self.xform.refresh_from_db()
+        self.assertEqual(self.xform.md5_hash, get_hash(self.xform.xml))
+        self.assertEqual(
+            self.xform.md5_hash_with_disclaimer, self.xform.md5_hash
+        )
+
+    def test_md5_hashes_are_populated_on_first_use(self):
+        self._publish_transportation_form()
+        XForm.objects.filter(pk=self.xform.pk).update(
+            md5_hash=None, md5_hash_with_disclaimer=None
+        )
+        self.xform.refresh_from_db()
+        # Listed forms keep the hash they had before the fields existed
+        self.assertEqual(
+            XFormListSerializer(self.xform).data['hash'],
+            f'md5:{get_hash(self.xform.xml)}',
+        )
+        self.assertEqual(
+            XFormSerializer(
+                self.xform, context={'request': RequestFactory().get('/')}
+            ).data['hash'],
+            f'md5:{get_hash(self.xform.xml)}',
+        )
+        self.assertEqual(
+            XForm.objects.filter(
+                pk=self.xform.pk,
+                md5_hash=get_hash(self.xform.xml),
+                md5_hash_with_disclaimer=get_hash(self.xform.xml),
+            ).count(),
+            1,
+        )
+
     @unittest.skip('Fails under Django 1.6')
     def test_reversion(self):
         self.assertTrue(reversion.is_registered(XForm))
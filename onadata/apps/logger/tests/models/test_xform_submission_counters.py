@@ -3,6 +3,7 @@ from datetime import timedelta
 
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.utils import timezone
 
 from onadata.apps.logger.models import XForm
@@ -129,3 +130,36 @@ class TestXFormSubmissionCounters(TestBase):
         assert (
             DailyXFormSubmissionCounter.objects.get(**criteria).counter == 2
         )
+
+    def test_populate_submission_counters_in_bulk(self):
+        """
+        Test that the set-based mode rebuilds wrong, missing and stale
+        counters
+        """
+        self._publish_transportation_form_and_submit_instance()
+        today = timezone.now().date()
+        DailyXFormSubmissionCounter.objects.filter(
+            user__username='bob'
+        ).delete()
+        MonthlyXFormSubmissionCounter.objects.filter(
+            user__username='bob'
+        ).update(counter=10)
+        stale_counter = DailyXFormSubmissionCounter.objects.create(
+            date=today - timedelta(days=1),
+            user=self.xform.user,
+            xform=self.xform,
+            counter=3,
+        )
+
+        call_command('populate_submission_counters', bulk=True, verbosity=0)
+
+        daily_counter = DailyXFormSubmissionCounter.objects.get(
+            user__username='bob'
+        )
+        self.assertEqual(daily_counter.date, today)
+        self.assertEqual(daily_counter.counter, 1)
+        self.assertNotEqual(daily_counter.pk, stale_counter.pk)
+        monthly_counter = MonthlyXFormSubmissionCounter.objects.get(
+            user__username='bob'
+        )
+        self.assertEqual(monthly_counter.counter, 1)
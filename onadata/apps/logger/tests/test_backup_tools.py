@@ -3,11 +3,12 @@ from datetime import datetime
 import os
 import tempfile
 import shutil
+import zipfile
 
 from django.conf import settings
 
 from onadata.apps.main.tests.test_base import TestBase
-from onadata.apps.logger.models import Instance
+from onadata.apps.logger.models import Attachment, Instance
 from onadata.apps.logger.import_tools import django_file
 from onadata.apps.logger.import_tools import create_instance
 from onadata.libs.utils.backup_tools import (
@@ -95,3 +96,71 @@ class TestBackupTools(TestBase):
         # remove temp dir tree
         self.assertEqual(instance_count, len(self.surveys))
         shutil.rmtree(temp_dir)
+
+    def test_restore_from_zip_skips_existing_submissions(self):
+        self._publish_transportation_form()
+        for i in range(len(self.surveys)):
+            self._submit_transport_instance(i)
+        instances = Instance.objects.filter(xform=self.xform)
+
+        temp_dir = tempfile.mkdtemp()
+        zip_file_path = os.path.join(temp_dir, "backup.zip")
+        create_zip_backup(zip_file_path, self.user, self.xform)
+
+        with zipfile.ZipFile(zip_file_path) as zf:
+            names = zf.namelist()
+        self.assertEqual(len(names), len(self.surveys))
+        for name in names:
+            self.assertTrue(name.startswith('instances/'))
+            self.assertTrue(name.endswith('.xml'))
+
+        # submissions which are already stored are not restored again
+        num_instances, num_restored = restore_backup_from_zip(
+            zip_file_path, self.user.username)
+        self.assertEqual(num_instances, len(self.surveys))
+        self.assertEqual(num_restored, 0)
+        self.assertEqual(instances.count(), len(self.surveys))
+
+        instances.last().delete()
+        num_instances, num_restored = restore_backup_from_zip(
+            zip_file_path, self.user.username, batch_size=2)
+        self.assertEqual(num_restored, 1)
+        self.assertEqual(instances.count(), len(self.surveys))
+        shutil.rmtree(temp_dir)
+
+    def test_backup_then_restore_attachments_from_zip(self):
+        self._publish_transportation_form()
+        self._submit_transport_instance_w_attachment()
+        self.attachment.media_file.open('rb')
+        with self.attachment.media_file as f:
+            content = f.read()
+        filename = os.path.basename(self.attachment_media_file)
+
+        temp_dir = tempfile.mkdtemp()
+        zip_file_path = os.path.join(temp_dir, "backup.zip")
+        create_zip_backup(
+            zip_file_path, self.user, self.xform, include_attachments=True)
+
+        with zipfile.ZipFile(zip_file_path) as zf:
+            names = zf.namelist()
+        self.assertEqual(len(names), 2)
+        attachment_name = [n for n in names if not n.endswith('.xml')][0]
+        # instances/YYYY/MM/DD/<submission>/<attachment>
+        self.assertEqual(len(attachment_name.split('/')), 6)
+        self.assertEqual(attachment_name.split('/')[-1], filename)
+
+        for instance in Instance.objects.filter(xform=self.xform):
+            instance.delete()
+        self.assertFalse(Attachment.objects.exists())
+
+        num_instances, num_restored = restore_backup_from_zip(
+            zip_file_path, self.user.username)
+        self.assertEqual(num_instances, 1)
+        self.assertEqual(num_restored, 1)
+
+        instance = Instance.objects.get(xform=self.xform)
+        attachment = Attachment.objects.get(instance=instance)
+        attachment.media_file.open('rb')
+        with attachment.media_file as f:
+            self.assertEqual(f.read(), content)
+        shutil.rmtree(temp_dir)
@@ -184,6 +184,33 @@ class TestBriefcaseClient(TestBase):
             instance_folder_path, 'uuid%s' % instance.uuid, media_file)
         self.assertTrue(storage.exists(media_path))
 
+    def test_download_instances_resumes_from_saved_cursor(self):
+        with HTTMock(form_list_xml):
+            self.bc.download_xforms()
+        with HTTMock(instances_xml):
+            self.bc.download_instances(self.xform.id_string)
+
+        instance = Instance.objects.all()[0]
+        forms_folder_path = os.path.join(
+            'deno', 'briefcase', 'forms', self.xform.id_string)
+        cursor_path = os.path.join(forms_folder_path, 'resumption_cursor')
+        with storage.open(cursor_path) as cursor_file:
+            self.assertEqual(cursor_file.read().decode(), str(instance.pk))
+
+        # The submission is past the saved cursor, it is not downloaded again
+        instance_path = os.path.join(
+            forms_folder_path, 'instances', 'uuid%s' % instance.uuid,
+            'submission.xml')
+        storage.delete(instance_path)
+        with HTTMock(instances_xml):
+            self.bc.download_instances(self.xform.id_string)
+        self.assertFalse(storage.exists(instance_path))
+
+        # unless the pull starts from the first submission
+        with HTTMock(instances_xml):
+            self.bc.download_instances(self.xform.id_string, cursor=0)
+        self.assertTrue(storage.exists(instance_path))
+
     def test_push(self):
         with HTTMock(form_list_xml):
             self.bc.download_xforms()
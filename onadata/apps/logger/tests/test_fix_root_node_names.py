@@ -0,0 +1,33 @@
+# coding: utf-8
+from io import StringIO
+
+from django.core.management import call_command
+
+from onadata.apps.logger.models import Instance
+from onadata.apps.main.tests.test_base import TestBase
+
+
+class TestFixRootNodeNames(TestBase):
+
+    def test_bulk_fix_root_node_names(self):
+        self._publish_transportation_form()
+        self._make_submissions()
+        instance = self.xform.instances.order_by('pk').first()
+        original_xml = instance.xml
+        root_node_name = instance.get_root_node_name()
+        wrong_xml = original_xml.replace(
+            f'<{root_node_name} ', '<wrong.name ', 1
+        ).replace(f'</{root_node_name}>', '</wrong.name>')
+        Instance.objects.filter(pk=instance.pk).update(
+            xml=wrong_xml, xml_hash=Instance.get_hash(wrong_xml)
+        )
+
+        stdout = StringIO()
+        call_command(
+            'fix_root_node_names', bulk=True, batch_size=2, stdout=stdout,
+            stderr=StringIO()
+        )
+
+        instance.refresh_from_db()
+        self.assertEqual(instance.xml, original_xml)
+        self.assertEqual(instance.xml_hash, Instance.get_hash(original_xml))
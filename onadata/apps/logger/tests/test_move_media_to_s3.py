@@ -0,0 +1,37 @@
+# coding: utf-8
+from mock import MagicMock
+
+from onadata.apps.logger.management.commands.move_media_to_s3 import Command
+from onadata.apps.logger.models import XForm
+from onadata.apps.logger.models.xform import upload_to as xform_upload_to
+from onadata.apps.main.tests.test_base import TestBase
+from onadata.libs.utils.media_migration import SKIPPED
+
+
+class TestMoveMediaToS3(TestBase):
+
+    def test_forms_without_xls_file_are_skipped(self):
+        """
+        Forms published from XML have a NULL `xls`
+        """
+        self._publish_transportation_form()
+        XForm.objects.filter(pk=self.xform.pk).update(xls=None)
+        self.xform.refresh_from_db()
+
+        command = Command()
+        self.assertFalse(
+            command._get_queryset(XForm, 'xls', ('user',)).filter(
+                pk=self.xform.pk
+            ).exists()
+        )
+
+        command.fs = MagicMock()
+        command.s3 = MagicMock()
+        command.dry_run = False
+        renamed = []
+        self.assertEqual(
+            command._copy(self.xform, 'xls', xform_upload_to, renamed),
+            (SKIPPED, 0),
+        )
+        self.assertEqual(renamed, [])
+        command.s3.exists.assert_not_called()
@@ -9,7 +9,7 @@ from onadata.apps.logger.xform_instance_parser import XFormInstanceParser,\
     xpath_from_xml_node
 from onadata.apps.logger.xform_instance_parser import get_uuid_from_xml,\
     get_meta_from_xml, get_deprecated_uuid_from_xml,\
-    _xml_node_to_dict, clean_and_parse_xml
+    _xml_node_to_dict, clean_and_parse_xml, set_root_node_attributes
 from onadata.libs.utils.common_tags import XFORM_ID_STRING
 
 
@@ -188,3 +188,19 @@ class TestXFormInstanceParser(TestBase):
                 import json
                 jfile_content = jfile.read()
                 self.assertEqual(jfile_content.strip(), json.dumps(dict_).strip())
+
+    def test_set_root_node_attributes(self):
+        xml_str = (
+            "<?xml version='1.0' ?>\n"
+            '<data xmlns="http://opendatakit.org/xforms" id="form" '
+            'version="1"><name a="b">Tom &amp; Jerry</name><empty /></data>'
+        )
+        self.assertEqual(
+            set_root_node_attributes(
+                xml_str,
+                {'version': '2', 'instanceID': 'uuid:"x"'},
+                removed_attributes=['xmlns'],
+            ),
+            '<data id="form" version="2" instanceID=\'uuid:"x"\'>'
+            '<name a="b">Tom &amp; Jerry</name><empty /></data>'
+        )
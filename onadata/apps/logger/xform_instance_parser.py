@@ -3,6 +3,7 @@ import logging
 import re
 import sys
 from xml.dom import Node
+from xml.sax.saxutils import quoteattr
 
 import dateutil.parser
 import six
@@ -41,6 +42,51 @@ class InstanceMultipleNodeError(Exception):
     pass
 
 
+# Everything which may precede the root element: XML declaration, processing
+# instructions, comments, doctype and whitespace
+xml_prolog_pattern = re.compile(
+    r'(?:\s+|<\?.*?\?>|<!--.*?-->|<!DOCTYPE[^>]*>)*', re.DOTALL
+)
+start_tag_pattern = re.compile(
+    r'<([^\s/>]+)((?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*)\s*(/?)>'
+)
+attribute_pattern = re.compile(r'([^\s=]+)\s*=\s*("[^"]*"|\'[^\']*\')')
+
+
+def set_root_node_attributes(xml_str, attributes, removed_attributes=()):
+    """
+    Return `xml_str` without its prolog, with `attributes` set on its root
+    element and `removed_attributes` removed from it.
+
+    Only the start tag of the root element is rewritten, the rest of the
+    XML is returned as is, without being parsed.
+    """
+    xml_str = smart_str(xml_str)
+    prolog_end = xml_prolog_pattern.match(xml_str).end()
+    start_tag = start_tag_pattern.match(xml_str, prolog_end)
+    if start_tag is None:
+        raise InstanceParseError()
+
+    tag_name, raw_attributes, self_closing = start_tag.groups()
+    new_attributes = dict(attributes)
+    start_tag_parts = [tag_name]
+    for name, value in attribute_pattern.findall(raw_attributes):
+        if name in removed_attributes:
+            continue
+        # Existing attributes keep their position
+        if name in new_attributes:
+            value = quoteattr(new_attributes.pop(name))
+        start_tag_parts.append(f'{name}={value}')
+    for name, value in new_attributes.items():
+        start_tag_parts.append(f'{name}={quoteattr(value)}')
+
+    return '<{}{}>{}'.format(
+        ' '.join(start_tag_parts),
+        self_closing,
+        xml_str[start_tag.end():].rstrip(),
+    )
+
+
 def get_meta_from_xml(xml_str, meta_name):
     xml = clean_and_parse_xml(xml_str)
     children = xml.childNodes
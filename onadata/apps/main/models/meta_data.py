@@ -171,27 +171,30 @@ class MetaData(models.Model):
             return False
 
         timedelta = timezone.now() - self.date_modified
-        if timedelta.total_seconds() > settings.PAIRED_DATA_EXPIRATION:
-            # No need to download the whole file. Sending a `HEAD` request to
-            # KPI will cause KPI to delete and recreate the file in KoBoCAT if
-            # needed
-            requests.head(self.data_value)
-            # We update the modification time here to avoid requesting that KPI
-            # resynchronize this file multiple times per the
-            # `PAIRED_DATA_EXPIRATION` period. However, this introduces a race
-            # condition where it's possible that KPI *deletes* this file before
-            # we attempt to update it. We avoid that by locking the row
-            ### TODO: this previously used `select_for_update()`, which locked
-            ### the object for the duration of the *entire* request due to
-            ### Django's `ATOMIC_REQUESTS`. The `update()` method is itself
-            ### atomic since it does not reference any value previously read
-            ### from the database. Is that enough?
-            MetaData.objects.filter(pk=self.pk).update(
-                date_modified=timezone.now()
-            )
-            return True
+        return timedelta.total_seconds() > settings.PAIRED_DATA_EXPIRATION
 
-        return False
+    def refresh_paired_data(self, timeout=None):
+        """
+        Ask KPI to resynchronize this paired data file. Raises
+        `RequestException` if KPI cannot be reached.
+        """
+        # No need to download the whole file. Sending a `HEAD` request to
+        # KPI will cause KPI to delete and recreate the file in KoBoCAT if
+        # needed
+        requests.head(self.data_value, timeout=timeout)
+        # We update the modification time here to avoid requesting that KPI
+        # resynchronize this file multiple times per the
+        # `PAIRED_DATA_EXPIRATION` period. However, this introduces a race
+        # condition where it's possible that KPI *deletes* this file before
+        # we attempt to update it. We avoid that by locking the row
+        ### TODO: this previously used `select_for_update()`, which locked
+        ### the object for the duration of the *entire* request due to
+        ### Django's `ATOMIC_REQUESTS`. The `update()` method is itself
+        ### atomic since it does not reference any value previously read
+        ### from the database. Is that enough?
+        MetaData.objects.filter(pk=self.pk).update(
+            date_modified=timezone.now()
+        )
 
     @property
     def filename(self) -> str:
@@ -0,0 +1,75 @@
+# coding: utf-8
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from redis.exceptions import LockError
+from requests.exceptions import RequestException
+
+from onadata.apps.main.models.meta_data import MetaData
+from onadata.celery import app
+from onadata.libs.utils.cache_tools import increment_counter
+
+
+def refresh_paired_data_async(metadata):
+    """
+    Enqueue the refresh of the paired data file `metadata` unless it is
+    already pending. Once enqueued, no other refresh is enqueued for the file
+    before `PAIRED_DATA_EXPIRATION` seconds, even if the refresh fails.
+    """
+    if cache.add(
+        _get_refresh_key(metadata.pk), True, settings.PAIRED_DATA_EXPIRATION
+    ):
+        refresh_paired_data.delay(metadata.pk)
+
+
+@app.task()
+def refresh_paired_data(metadata_id):
+    try:
+        with cache.lock(
+            f'paired_data_refresh_lock_{metadata_id}',
+            timeout=settings.PAIRED_DATA_REFRESH_TIMEOUT + 30,
+            blocking_timeout=0,
+        ):
+            return _refresh_paired_data(metadata_id)
+    except LockError:
+        # Another worker is refreshing the same file
+        return False
+
+
+def _refresh_paired_data(metadata_id):
+    try:
+        metadata = MetaData.objects.get(pk=metadata_id)
+    except MetaData.DoesNotExist:
+        # KPI deleted the file in the meantime
+        return False
+
+    if not metadata.has_expired:
+        return False
+
+    start = time.time()
+    try:
+        metadata.refresh_paired_data(
+            timeout=settings.PAIRED_DATA_REFRESH_TIMEOUT
+        )
+    except RequestException as e:
+        failures = increment_counter('paired_data_refresh_failures')
+        logging.warning(
+            f'Could not refresh paired data #{metadata_id} in '
+            f'{time.time() - start:.3f}s ({failures} failures): {e}'
+        )
+        return False
+
+    refreshes = increment_counter('paired_data_refresh_successes')
+    logging.info(
+        f'Refreshed paired data #{metadata_id} in {time.time() - start:.3f}s '
+        f'({refreshes} refreshes)'
+    )
+    # Allow the next refresh once this one expires
+    cache.delete(_get_refresh_key(metadata_id))
+    return True
+
+
+def _get_refresh_key(metadata_id):
+    return f'paired_data_refresh_{metadata_id}'
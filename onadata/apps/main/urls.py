@@ -16,6 +16,7 @@ from onadata.apps.main.service_health import service_health
 # exporting stuff
 from onadata.apps.viewer.views import (
     attachment_url,
+    cancel_export,
     create_export,
     delete_export,
     export_progress,
@@ -88,6 +89,8 @@ urlpatterns = [
             r"/delete$", delete_export, name='delete_export'),
     re_path(r"^(?P<username>\w+)/exports/(?P<id_string>[^/]+)/(?P<export_type>\w+)"
             r"/progress$", export_progress, name='export_progress'),
+    re_path(r"^(?P<username>\w+)/exports/(?P<id_string>[^/]+)/(?P<export_type>\w+)"
+            r"/cancel$", cancel_export, name='cancel_export'),
     re_path(r"^(?P<username>\w+)/exports/(?P<id_string>[^/]+)/(?P<export_type>\w+)"
             r"/$", export_list, name='export_list'),
     re_path(r"^(?P<username>\w+)/exports/(?P<id_string>[^/]+)/(?P<export_type>\w+)"
@@ -0,0 +1,76 @@
+# coding: utf-8
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from onadata.apps.logger.models import XForm
+from onadata.libs.utils.mongo_consistency import (
+    DEFAULT_CHUNK_SIZE,
+    check_mongo_consistency,
+)
+
+
+class Command(BaseCommand):
+    args = '[username] [id_string]'
+    help = ("Compare the submissions of the forms in PostgreSQL with their "
+            "documents in MongoDB, and optionally repair the divergent ones.")
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('username', nargs='?', default=None)
+        parser.add_argument('id_string', nargs='?', default=None)
+
+        parser.add_argument('-r', '--repair',
+                            action='store_true',
+                            default=False,
+                            help="Rewrite missing and stale documents, and "
+                                 "delete orphaned ones")
+
+        parser.add_argument('--include-unhashed',
+                            action='store_true',
+                            default=False,
+                            help="Also rewrite the documents written before "
+                                 "their XML hash was stored")
+
+        parser.add_argument('-w', '--workers',
+                            type=int,
+                            default=1,
+                            help="Number of forms checked concurrently")
+
+        parser.add_argument('--chunk-size',
+                            type=int,
+                            default=DEFAULT_CHUNK_SIZE,
+                            help="Number of ids read per query")
+
+    def handle(self, username, id_string, *args, **kwargs):
+        xforms = XForm.objects.all()
+        if username:
+            try:
+                user = User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError("User %s does not exist" % username)
+            xforms = xforms.filter(user=user)
+            if id_string:
+                xforms = xforms.filter(id_string=id_string)
+                if not xforms.exists():
+                    raise CommandError("Xform %s does not exist for user %s" %
+                                       (id_string, user.username))
+
+        results, summary = check_mongo_consistency(
+            xforms,
+            repair=kwargs['repair'],
+            include_unhashed=kwargs['include_unhashed'],
+            workers=kwargs['workers'],
+            chunk_size=kwargs['chunk_size'],
+        )
+
+        for result in results:
+            self.stdout.write(
+                '{userform_id}: {missing} missing, {orphaned} orphaned, '
+                '{stale} stale, {unhashed} unhashed, '
+                '{repaired} repaired'.format(**result)
+            )
+        self.stdout.write(
+            'Checked {forms} forms in {duration}s: {inconsistent_forms} '
+            'inconsistent, {missing} missing, {orphaned} orphaned, {stale} '
+            'stale, {unhashed} unhashed, {repaired} repaired'.format(**summary)
+        )
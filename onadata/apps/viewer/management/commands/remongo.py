@@ -1,9 +1,26 @@
 # coding: utf-8
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
 
-from onadata.apps.viewer.models.parsed_instance import ParsedInstance
+from onadata.apps.logger.models import XForm, Instance
 from onadata.libs.utils.common_tags import USERFORM_ID
+from onadata.libs.utils.mongo_sync import sync_instances_to_mongo
+
+
+def _sync_range(xform_id, start, end, batchsize):
+    # Runs in worker processes, each one with its own database connection
+    queryset = Instance.objects.filter(pk__gte=start, pk__lt=end)
+    if xform_id:
+        queryset = queryset.filter(xform_id=xform_id)
+    return sync_instances_to_mongo(
+        queryset, batch_size=batchsize, stdout=sys.stdout
+    )
 
 
 class Command(BaseCommand):
@@ -13,7 +30,7 @@ class Command(BaseCommand):
         parser.add_argument(
             '--batchsize',
             type=int,
-            default=100,
+            default=1000,
             help="Number of records to process per query")
 
         parser.add_argument('-u', '--username',
@@ -22,40 +39,57 @@ class Command(BaseCommand):
         parser.add_argument('-i', '--id_string',
                             help="id string of the form")
 
+        parser.add_argument(
+            '-w', '--workers',
+            type=int,
+            default=1,
+            help="Number of processes, each one syncing a range of records")
+
     def handle(self, *args, **kwargs):
-        ids = None
+        xform_id = None
         # check for username AND id_string - if one exists so must the other
         if (kwargs.get('username') and not kwargs.get('id_string')) or (
                 not kwargs.get('username') and kwargs.get('id_string')):
             raise CommandError("username and id_string must either both be "
                                "specified or neither")
         elif kwargs.get('username') and kwargs.get('id_string'):
-            from onadata.apps.logger.models import XForm, Instance
             xform = XForm.objects.get(user__username=kwargs.get('username'),
                                       id_string=kwargs.get('id_string'))
-            ids = [i.pk for i in Instance.objects.filter(xform=xform)]
+            xform_id = xform.pk
         # num records per run
         batchsize = kwargs['batchsize']
-        start = 0
-        end = start + batchsize
-        filter_queryset = ParsedInstance.objects.all()
-        # instance ids for when we have a username and id_string
-        if ids:
-            filter_queryset = ParsedInstance.objects.filter(instance__in=ids)
-        # total number of records
-        record_count = filter_queryset.count()
-        i = 0
-        while start < record_count:
-            print('Querying record %s to %s' % (start, end-1))
-            queryset = filter_queryset.order_by('pk')[start:end]
-            for pi in queryset.iterator():
-                if pi.update_mongo(asynchronous=False):
-                    i += 1
-                else:
-                    print("\033[91m[ERROR] Could not parse instance {}\033[0m".format(pi.instance.uuid))
-
-            start = start + batchsize
-            end = min(record_count, start + batchsize)
+        workers = kwargs.get('workers') or 1
+
+        queryset = Instance.objects.all()
+        if xform_id:
+            queryset = queryset.filter(xform_id=xform_id)
+        pk_range = queryset.aggregate(min_pk=Min('pk'), max_pk=Max('pk'))
+        # Split the primary keys in as many ranges as workers
+        starts = []
+        ends = []
+        if pk_range['min_pk'] is not None:
+            min_pk = pk_range['min_pk']
+            max_pk = pk_range['max_pk'] + 1
+            step = -(-(max_pk - min_pk) // workers)
+            starts = list(range(min_pk, max_pk, step))
+            ends = [min(start + step, max_pk) for start in starts]
+
+        if len(starts) <= 1:
+            results = map(_sync_range, repeat(xform_id), starts, ends,
+                          repeat(batchsize))
+        else:
+            # Forked processes must not share the connections of this one
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(
+                    _sync_range, repeat(xform_id), starts, ends,
+                    repeat(batchsize)
+                ))
+        results = list(results)
+        synced = sum(result[0] for result in results)
+        failed = sum(result[1] for result in results)
+
+        print('Synced {} records, {} failed'.format(synced, failed))
         # add indexes after writing so the writing operation above is not
         # slowed
         settings.MONGO_DB.instances.create_index(USERFORM_ID)
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0004_update_meta_data_export_types'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='export',
+            name='export_type',
+            field=models.CharField(
+                default='xls',
+                max_length=10,
+                choices=[
+                    ('xls', 'Excel'),
+                    ('csv', 'CSV'),
+                    ('zip', 'ZIP'),
+                    ('kml', 'kml'),
+                    ('geojson', 'GeoJSON'),
+                ],
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# coding: utf-8
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viewer', '0005_add_geojson_export_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='export',
+            name='file_hash',
+            field=models.CharField(
+                blank=True, db_index=True, max_length=50, null=True
+            ),
+        ),
+        # Identical exports of a form share the same file
+        migrations.AlterUniqueTogether(
+            name='export',
+            unique_together=set(),
+        ),
+    ]
@@ -12,7 +12,16 @@ from onadata.apps.logger.models import XForm
 
 def export_delete_callback(sender, **kwargs):
     export = kwargs['instance']
-    if export.filepath and default_storage.exists(export.filepath):
+    if not export.filepath:
+        return
+    # exports with the same content share the same file
+    if Export.objects.filter(
+        xform_id=export.xform_id,
+        filedir=export.filedir,
+        filename=export.filename,
+    ).exists():
+        return
+    if default_storage.exists(export.filepath):
         default_storage.delete(export.filepath)
 
 
@@ -24,6 +33,7 @@ class Export(models.Model):
     XLS_EXPORT = 'xls'
     CSV_EXPORT = 'csv'
     KML_EXPORT = 'kml'
+    GEOJSON_EXPORT = 'geojson'
     ZIP_EXPORT = 'zip'
 
     EXPORT_MIMES = {
@@ -31,7 +41,8 @@ class Export(models.Model):
         'xlsx': 'vnd.openxmlformats',
         'csv': 'csv',
         'zip': 'zip',
-        'kml': 'vnd.google-earth.kml+xml'
+        'kml': 'vnd.google-earth.kml+xml',
+        'geojson': 'geo+json',
     }
 
     EXPORT_TYPES = [
@@ -39,6 +50,7 @@ class Export(models.Model):
         (CSV_EXPORT, 'CSV'),
         (ZIP_EXPORT, 'ZIP'),
         (KML_EXPORT, 'kml'),
+        (GEOJSON_EXPORT, 'GeoJSON'),
     ]
 
     EXPORT_TYPE_DICT = dict(export_type for export_type in EXPORT_TYPES)
@@ -66,21 +78,23 @@ class Export(models.Model):
     # status
     internal_status = models.SmallIntegerField(default=PENDING)
     export_url = models.URLField(null=True, default=None)
+    # hash of the file content, used to share files between identical exports
+    file_hash = models.CharField(
+        max_length=50, blank=True, null=True, db_index=True
+    )
 
     class Meta:
         app_label = "viewer"
-        unique_together = (("xform", "filename"),)
 
     def save(self, *args, **kwargs):
+        delete_oldest_export = False
         if not self.pk and self.xform:
             # if new, check if we've hit our limit for exports for this form,
             # if so, delete oldest
             # TODO: let user know that last export will be deleted
             num_existing_exports = Export.objects.filter(
                 xform=self.xform, export_type=self.export_type).count()
-
-            if num_existing_exports >= self.MAX_EXPORTS:
-                Export._delete_oldest_export(self.xform, self.export_type)
+            delete_oldest_export = num_existing_exports >= self.MAX_EXPORTS
 
             # update time_of_last_submission with
             # xform.time_of_last_submission_update
@@ -90,6 +104,11 @@ class Export(models.Model):
             self.internal_status = Export.SUCCESSFUL
         super().save(*args, **kwargs)
 
+        # Only delete once saved, the oldest export may share its file with
+        # this one
+        if delete_oldest_export:
+            Export._delete_oldest_export(self.xform, self.export_type)
+
     @classmethod
     def _delete_oldest_export(cls, xform, export_type):
         oldest_export = Export.objects.filter(
@@ -173,6 +192,22 @@ class Export(models.Model):
                 # auto-generation
                 return True
 
+    @classmethod
+    def get_filepath_by_hash(cls, xform, export_type, file_hash):
+        """
+        Return the path of an existing export file of `xform` with the same
+        content, or `None`
+        """
+        export = cls.objects.filter(
+            xform=xform,
+            export_type=export_type,
+            file_hash=file_hash,
+            filename__isnull=False,
+        ).only('filedir', 'filename').order_by('-created_on').first()
+        if export and default_storage.exists(export.filepath):
+            return export.filepath
+        return None
+
     @classmethod
     def is_filename_unique(cls, xform, filename):
         return Export.objects.filter(
@@ -25,7 +25,8 @@ from onadata.libs.utils.common_tags import (
     NOTES,
     SUBMITTED_BY,
     VALIDATION_STATUS,
-    HOOK_EVENT
+    HOOK_EVENT,
+    XML_HASH,
 )
 from onadata.libs.utils.decorators import apply_form_field_names
 from onadata.libs.utils.model_tools import queryset_iterator
@@ -194,7 +195,7 @@ class ParsedInstance(models.Model):
         :param fields: Array string
         :return: pymongo Cursor
         """
-        fields_to_select = {cls.USERFORM_ID: 0}
+        fields_to_select = {cls.USERFORM_ID: 0, XML_HASH: 0}
 
         # fields must be a string array i.e. '["name", "age"]'
         if isinstance(fields, str):
@@ -271,11 +272,13 @@ class ParsedInstance(models.Model):
             GEOLOCATION: [self.lat, self.lng],
             SUBMISSION_TIME: self.instance.date_created.strftime(
                 MONGO_STRFTIME),
-            TAGS: list(self.instance.tags.names()),
+            # Iterate over `all()` to take advantage of prefetched tags
+            TAGS: [tag.name for tag in self.instance.tags.all()],
             NOTES: self.get_notes(),
             VALIDATION_STATUS: self.instance.get_validation_status(),
             SUBMITTED_BY: self.instance.user.username
-            if self.instance.user else None
+            if self.instance.user else None,
+            XML_HASH: self.instance.xml_hash,
         }
 
         d.update(data)
@@ -389,15 +392,15 @@ class ParsedInstance(models.Model):
         note.delete()
 
     def get_notes(self):
+        # Iterate over `all()` to take advantage of prefetched notes
         notes = []
-        note_qs = self.instance.notes.values(
-            'id', 'note', 'date_created', 'date_modified')
-        for note in note_qs:
-            note['date_created'] = \
-                note['date_created'].strftime(MONGO_STRFTIME)
-            note['date_modified'] = \
-                note['date_modified'].strftime(MONGO_STRFTIME)
-            notes.append(note)
+        for note in self.instance.notes.all():
+            notes.append({
+                'id': note.id,
+                'note': note.note,
+                'date_created': note.date_created.strftime(MONGO_STRFTIME),
+                'date_modified': note.date_modified.strftime(MONGO_STRFTIME),
+            })
         return notes
 
 
@@ -34,6 +34,16 @@ from onadata.libs.utils.common_tags import (
     SUBMITTED_BY,
     VALIDATION_STATUS
 )
+from onadata.libs.utils.export_columns import (
+    BatchColumnSplitter,
+    collect_nested_records,
+)
+from onadata.libs.utils.export_progress import (
+    PHASE_FORMAT,
+    PHASE_QUERY,
+    PHASE_WRITE,
+    ExportProgress,
+)
 from onadata.libs.utils.export_tools import question_types_to_exclude
 
 
@@ -103,13 +113,15 @@ class AbstractDataFrameBuilder:
     """
     def __init__(self, username, id_string, filter_query=None,
                  group_delimiter=DEFAULT_GROUP_DELIMITER,
-                 split_select_multiples=True, binary_select_multiples=False):
+                 split_select_multiples=True, binary_select_multiples=False,
+                 progress=None):
         self.username = username
         self.id_string = id_string
         self.filter_query = filter_query
         self.group_delimiter = group_delimiter
         self.split_select_multiples = split_select_multiples
         self.BINARY_SELECT_MULTIPLES = binary_select_multiples
+        self.progress = progress or ExportProgress(None)
         self._setup()
 
     def _setup(self):
@@ -117,6 +129,7 @@ class AbstractDataFrameBuilder:
                                              id_string=self.id_string)
         self.select_multiples = self._collect_select_multiples(self.dd)
         self.gps_fields = self._collect_gps_fields(self.dd)
+        self.gps_components = self._get_gps_components(self.gps_fields)
 
     @classmethod
     def _fields_to_select(cls, dd):
@@ -136,37 +149,15 @@ class AbstractDataFrameBuilder:
         """ Prefix contains the xpath and slash if we are within a repeat so
         that we can figure out which select multiples belong to which repeat
         """
-        for key, choices in select_multiples.items():
-            # the select multiple might be blank or not exist in the record,
-            # need to make those False
-            selections = []
-            if key in record:
-                # split selected choices by spaces and join by / to the
-                # element's xpath
-                selections = ["%s/%s" % (key, r)
-                              for r in record[key].split(" ")]
-                # remove the column since we are adding separate columns
-                # for each choice
-                record.pop(key)
-                if not binary_select_multiples:
-                    # add columns to record for every choice, with default
-                    # False and set to True for items in selections
-                    record.update(dict([(choice, choice in selections)
-                                        for choice in choices]))
-                else:
-                    YES = 1
-                    NO = 0
-                    record.update(
-                        dict([(choice, YES if choice in selections else NO)
-                              for choice in choices]))
-
-            # recurs into repeats
-            for record_key, record_item in record.items():
-                if type(record_item) == list:
-                    for list_item in record_item:
-                        if type(list_item) == dict:
-                            cls._split_select_multiples(
-                                list_item, select_multiples)
+        # add columns to record for every choice, with default False and set
+        # to True for items in selections, and remove the select multiple
+        # column. Recurs into repeats
+        BatchColumnSplitter(
+            select_multiples=select_multiples,
+            binary_select_multiples=binary_select_multiples,
+            answered_only=True,
+            remove_select_multiples=True,
+        ).split(collect_nested_records([record]))
         return record
 
     @classmethod
@@ -188,27 +179,40 @@ class AbstractDataFrameBuilder:
                     tags.append(tag)
             record.update({'_tags': ', '.join(sorted(tags))})
 
+    @classmethod
+    def _get_gps_components(cls, gps_fields):
+        return dict([
+            (xpath, DataDictionary.get_additional_geopoint_xpaths(xpath))
+            for xpath in gps_fields])
+
     @classmethod
     def _split_gps_fields(cls, record, gps_fields):
-        updated_gps_fields = {}
-        for key, value in record.items():
-            if key in gps_fields and isinstance(value, str):
-                gps_xpaths = DataDictionary.get_additional_geopoint_xpaths(key)
-                gps_parts = dict([(xpath, None) for xpath in gps_xpaths])
-                # hack, check if its a list and grab the object within that
-                parts = value.split(' ')
-                # TODO: check whether or not we can have a gps recording
-                # from ODKCollect that has less than four components,
-                # for now we are assuming that this is not the case.
-                if len(parts) == 4:
-                    gps_parts = dict(zip(gps_xpaths, parts))
-                updated_gps_fields.update(gps_parts)
-            # check for repeats within record i.e. in value
-            elif type(value) == list:
-                for list_item in value:
-                    if type(list_item) == dict:
-                        cls._split_gps_fields(list_item, gps_fields)
-        record.update(updated_gps_fields)
+        # TODO: check whether or not we can have a gps recording
+        # from ODKCollect that has less than four components,
+        # for now we are assuming that this is not the case.
+        BatchColumnSplitter(
+            gps_fields=cls._get_gps_components(gps_fields),
+            strict_gps=True,
+        ).split(collect_nested_records([record]))
+
+    def _split_columns(self, records):
+        """
+        Split select multiples and gps fields of a batch of records,
+        including the records of their repeats, at once
+        """
+        select_multiples = None
+        if self.split_select_multiples:
+            select_multiples = self.select_multiples
+
+        BatchColumnSplitter(
+            select_multiples=select_multiples,
+            gps_fields=self.gps_components,
+            binary_select_multiples=self.BINARY_SELECT_MULTIPLES,
+            answered_only=True,
+            remove_select_multiples=True,
+            strict_gps=True,
+        ).split(collect_nested_records(records))
+        return records
 
     def _query_mongo(self, query='{}', start=0,
                      limit=ParsedInstance.DEFAULT_LIMIT,
@@ -267,10 +271,11 @@ class XLSDataFrameBuilder(AbstractDataFrameBuilder):
 
     def __init__(self, username, id_string, filter_query=None,
                  group_delimiter=DEFAULT_GROUP_DELIMITER,
-                 split_select_multiples=True, binary_select_multiples=False):
+                 split_select_multiples=True, binary_select_multiples=False,
+                 progress=None):
         super().__init__(
             username, id_string, filter_query, group_delimiter,
-            split_select_multiples, binary_select_multiples)
+            split_select_multiples, binary_select_multiples, progress)
 
     def _setup(self):
         super()._setup()
@@ -282,7 +287,9 @@ class XLSDataFrameBuilder(AbstractDataFrameBuilder):
         self.xls_writer = ExcelWriter(file_path)
 
         # get record count
+        self.progress.set_phase(PHASE_QUERY)
         record_count = self._query_mongo(count=True)
+        self.progress.set_phase(PHASE_FORMAT, total=record_count)
 
         # query in batches and for each batch create an XLSDataFrameWriter and
         # write to existing xls_writer object
@@ -310,9 +317,11 @@ class XLSDataFrameBuilder(AbstractDataFrameBuilder):
                     writer.write_to_excel(self.xls_writer, section_name,
                                           header=header, index=False)
             header = False
+            self.progress.advance(len(data[self.survey_name]))
             # increment counter(s)
             start += batchsize
             time.sleep(0.1)
+        self.progress.set_phase(PHASE_WRITE)
         self.xls_writer.save()
 
     def _format_for_dataframe(self, cursor):
@@ -327,7 +336,11 @@ class XLSDataFrameBuilder(AbstractDataFrameBuilder):
         main_section = self.sections[self.survey_name]
         main_sections_columns = main_section["columns"]
 
-        for record in cursor:
+        # find any select multiple(s) and gps fields and add additional
+        # columns to records
+        records = self._split_columns(list(cursor))
+
+        for record in records:
             # from record, we'll end up with multiple records, one for each
             # section we have
 
@@ -365,12 +378,6 @@ class XLSDataFrameBuilder(AbstractDataFrameBuilder):
         # data_section[len(data_section)-1].update(record) # we could simply do
         # this but end up with duplicate data from repeats
 
-        if self.split_select_multiples:
-            # find any select multiple(s) and add additional columns to record
-            record = self._split_select_multiples(
-                record, self.select_multiples)
-        # alt, precision
-        self._split_gps_fields(record, self.gps_fields)
         for column in columns:
             data_value = None
             try:
@@ -498,10 +505,11 @@ class CSVDataFrameBuilder(AbstractDataFrameBuilder):
 
     def __init__(self, username, id_string, filter_query=None,
                  group_delimiter=DEFAULT_GROUP_DELIMITER,
-                 split_select_multiples=True, binary_select_multiples=False):
+                 split_select_multiples=True, binary_select_multiples=False,
+                 progress=None):
         super().__init__(
             username, id_string, filter_query, group_delimiter,
-            split_select_multiples, binary_select_multiples)
+            split_select_multiples, binary_select_multiples, progress)
         self.ordered_columns = OrderedDict()
 
     def _setup(self):
@@ -607,15 +615,10 @@ class CSVDataFrameBuilder(AbstractDataFrameBuilder):
             gps_xpaths = self.dd.get_additional_geopoint_xpaths(key)
             self.ordered_columns[key] = [key] + gps_xpaths
         data = []
-        for record in cursor:
-            # split select multiples
-            if self.split_select_multiples:
-                record = self._split_select_multiples(
-                    record, self.select_multiples,
-                    self.BINARY_SELECT_MULTIPLES)
-            # check for gps and split into components i.e. latitude, longitude,
-            # altitude, precision
-            self._split_gps_fields(record, self.gps_fields)
+        # split select multiples and gps into components i.e. latitude,
+        # longitude, altitude, precision
+        records = self._split_columns(list(cursor))
+        for record in records:
             self._tag_edit_string(record)
             flat_dict = {}
             # re index repeats
@@ -633,7 +636,9 @@ class CSVDataFrameBuilder(AbstractDataFrameBuilder):
     def export_to(self, file_or_path, data_frame_max_size=30000):
         from math import ceil
         # get record count
+        self.progress.set_phase(PHASE_QUERY)
         record_count = self._query_mongo(query=self.filter_query, count=True)
+        self.progress.set_phase(PHASE_FORMAT, total=record_count)
 
         self.ordered_columns = OrderedDict()
         self._build_ordered_columns(self.dd.survey, self.ordered_columns)
@@ -651,6 +656,7 @@ class CSVDataFrameBuilder(AbstractDataFrameBuilder):
                 limit=data_frame_max_size)
             data = self._format_for_dataframe(cursor)
             datas.append(data)
+            self.progress.advance(len(data))
 
         columns = list(chain.from_iterable(
             [[xpath] if cols is None else cols
@@ -664,6 +670,7 @@ class CSVDataFrameBuilder(AbstractDataFrameBuilder):
         # add extra columns
         columns += [col for col in self.ADDITIONAL_COLUMNS]
 
+        self.progress.set_phase(PHASE_WRITE)
         header = True
         if hasattr(file_or_path, 'read'):
             csv_file = file_or_path
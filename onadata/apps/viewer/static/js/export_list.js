@@ -86,7 +86,7 @@ var fhExportList =  (function(){
                                 // an export is not complete, reset to false
                                 _bNothingToRefresh = false
 
-                                statusElm.html("Pending ...")
+                                statusElm.html(fhExportList.describeProgress(status.progress))
                                 anchor.addClass('refresh-export-progress')
                                 anchor.removeClass('updating')
                                 anchor.show()
@@ -108,6 +108,20 @@ var fhExportList =  (function(){
             }
         },
 
+        describeProgress: function(progress) {
+            var description
+
+            if(!progress || !progress.phase)
+                return "Pending ..."
+
+            description = progress.phase.charAt(0).toUpperCase() + progress.phase.slice(1)
+            if(progress.total)
+                description += " " + progress.processed + "/" + progress.total
+            if(progress.eta !== null && progress.eta !== undefined && progress.phase === 'format')
+                description += " (about " + Math.ceil(progress.eta / 60) + " min. left)"
+            return description + " ..."
+        },
+
         autoRefresh: function() {
             if(!_bNothingToRefresh)
             {
@@ -13,14 +13,19 @@ from django.conf import settings
 from django.core.mail import mail_admins
 
 from onadata.celery import app
+from onadata.apps.logger.models import Instance
 from onadata.apps.viewer.models.export import Export
-from onadata.libs.exceptions import NoRecordsFoundError
+from onadata.libs.exceptions import ExportCancelledError, NoRecordsFoundError
 from onadata.libs.utils.export_tools import (
     generate_export,
     generate_attachments_zip_export,
-    generate_kml_export
+    generate_geojson_export,
+    generate_kml_export,
 )
+from onadata.libs.utils.export_progress import ExportProgress
 from onadata.libs.utils.logger_tools import mongo_sync_status, report_exception
+from onadata.libs.utils.mongo_consistency import check_mongo_consistency
+from onadata.libs.utils.mongo_sync import sync_instances_to_mongo
 
 
 def create_async_export(xform, export_type, query, force_xlsx, options=None):
@@ -61,10 +66,18 @@ def create_async_export(xform, export_type, query, force_xlsx, options=None):
         # start async export
         result = create_zip_export.apply_async(
             (), arguments, countdown=10)
-    elif export_type == Export.KML_EXPORT:
+    elif export_type in [Export.KML_EXPORT, Export.GEOJSON_EXPORT]:
+        for option in ['bbox', 'start', 'end']:
+            if options and option in options:
+                arguments[option] = options[option]
+
         # start async export
-        result = create_kml_export.apply_async(
-            (), arguments, countdown=10)
+        if export_type == Export.KML_EXPORT:
+            result = create_kml_export.apply_async(
+                (), arguments, countdown=10)
+        else:
+            result = create_geojson_export.apply_async(
+                (), arguments, countdown=10)
     else:
         raise Export.ExportTypeError
     if result:
@@ -79,6 +92,20 @@ def create_async_export(xform, export_type, query, force_xlsx, options=None):
     return None
 
 
+def cancel_async_export(export):
+    """
+    Cancel a pending export. The task is revoked if it has not started yet,
+    otherwise it stops at its next checkpoint.
+    """
+    ExportProgress.cancel(export.pk)
+    if export.task_id and not settings.CELERY_TASK_ALWAYS_EAGER:
+        app.control.revoke(export.task_id)
+    # Export.save() is a busybody; bypass it with update()
+    Export.objects.filter(
+        pk=export.pk, internal_status=Export.PENDING, filename__isnull=True
+    ).update(internal_status=Export.FAILED)
+
+
 @app.task()
 def create_xls_export(username, id_string, export_id, query=None,
                       force_xlsx=True, group_delimiter='/',
@@ -100,6 +127,10 @@ def create_xls_export(username, id_string, export_id, query=None,
         gen_export = generate_export(
             Export.XLS_EXPORT, ext, username, id_string, export_id, query,
             group_delimiter, split_select_multiples, binary_select_multiples)
+    except ExportCancelledError:
+        export.internal_status = Export.FAILED
+        export.save()
+        return None
     except (Exception, NoRecordsFoundError) as e:
         export.internal_status = Export.FAILED
         export.save()
@@ -137,6 +168,9 @@ def create_csv_export(username, id_string, export_id, query=None,
         # should not even be on this page if the survey has no records
         export.internal_status = Export.FAILED
         export.save()
+    except ExportCancelledError:
+        export.internal_status = Export.FAILED
+        export.save()
     except Exception as e:
         export.internal_status = Export.FAILED
         export.save()
@@ -155,7 +189,8 @@ def create_csv_export(username, id_string, export_id, query=None,
 
 
 @app.task()
-def create_kml_export(username, id_string, export_id, query=None):
+def create_kml_export(username, id_string, export_id, query=None, bbox=None,
+                      start=None, end=None):
     # we re-query the db instead of passing model objects according to
     # http://docs.celeryproject.org/en/latest/userguide/tasks.html#state
 
@@ -164,7 +199,8 @@ def create_kml_export(username, id_string, export_id, query=None):
         # though export is not available when for has 0 submissions, we
         # catch this since it potentially stops celery
         gen_export = generate_kml_export(
-            Export.KML_EXPORT, 'kml', username, id_string, export_id, query)
+            Export.KML_EXPORT, 'kml', username, id_string, export_id, query,
+            bbox, start, end)
     except (Exception, NoRecordsFoundError) as e:
         export.internal_status = Export.FAILED
         export.save()
@@ -182,6 +218,31 @@ def create_kml_export(username, id_string, export_id, query=None):
         return gen_export.id
 
 
+@app.task()
+def create_geojson_export(username, id_string, export_id, query=None,
+                          bbox=None, start=None, end=None):
+    export = Export.objects.get(id=export_id)
+    try:
+        gen_export = generate_geojson_export(
+            Export.GEOJSON_EXPORT, 'geojson', username, id_string, export_id,
+            query, bbox, start, end)
+    except (Exception, NoRecordsFoundError) as e:
+        export.internal_status = Export.FAILED
+        export.save()
+        # mail admins
+        details = {
+            'export_id': export_id,
+            'username': username,
+            'id_string': id_string
+        }
+        report_exception("GeoJSON Export Exception: Export ID - "
+                         "%(export_id)s, /%(username)s/%(id_string)s"
+                         % details, e, sys.exc_info())
+        raise
+    else:
+        return gen_export.id
+
+
 @app.task()
 def create_zip_export(username, id_string, export_id, query=None):
     export = Export.objects.get(id=export_id)
@@ -260,6 +321,34 @@ def email_mongo_sync_status():
                              SYNC_MONGO_MANUAL_INSTRUCTIONS]))
 
 
+@app.task()
+def sync_instances_to_mongo_async(instance_ids):
+    """
+    Rebuild the MongoDB documents of the `Instance`s `instance_ids`, e.g.
+    after their XML has been rewritten in bulk
+    """
+    return sync_instances_to_mongo(Instance.objects.filter(pk__in=instance_ids))
+
+
+# All the forms are checked by a single task, which would not finish within
+# the default time limit on large databases
+@shared_task(soft_time_limit=6 * 60 * 60, time_limit=6 * 60 * 60 + 300)
+def check_mongo_consistency_of_all_forms():
+    """
+    Compare all the submissions in PostgreSQL with their documents in
+    MongoDB, repairing the divergent ones if `MONGO_CONSISTENCY_CHECK_REPAIR`
+    is set.
+    """
+    results, summary = check_mongo_consistency(
+        repair=settings.MONGO_CONSISTENCY_CHECK_REPAIR,
+        workers=settings.MONGO_CONSISTENCY_CHECK_WORKERS,
+    )
+    for result in results:
+        logging.warning(f'Inconsistent MongoDB documents: {result}')
+
+    return summary
+
+
 @shared_task(soft_time_limit=60, time_limit=90)
 def log_stuck_exports_and_mark_failed():
     # How long can an export possibly run, not including time spent waiting in
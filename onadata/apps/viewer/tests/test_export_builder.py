@@ -359,6 +359,36 @@ class TestExportBuilder(TestBase):
             }
         self.assertEqual(new_row, expected_row)
 
+    def test_pre_process_rows_splits_batch(self):
+        survey = self._create_childrens_survey()
+        export_builder = ExportBuilder()
+        export_builder.BINARY_SELECT_MULTIPLES = True
+        export_builder.set_survey(survey)
+        section = export_builder.section_by_name('childrens_survey')
+        rows = [
+            {
+                'geo/geolocation': '1.0 36.1 2000 20',
+            },
+            {
+                'geo/geolocation': '',
+            },
+        ]
+        new_rows = export_builder.pre_process_rows(rows, section)
+        self.assertEqual(new_rows[0]['geo/_geolocation_latitude'], 1.0)
+        self.assertEqual(new_rows[0]['geo/_geolocation_precision'], 20.0)
+        self.assertNotIn('geo/_geolocation_latitude', new_rows[1])
+
+        section = export_builder.section_by_name('children')
+        rows = [
+            {'children/fav_colors': 'red  blue'},
+            {'children/fav_colors': ''},
+        ]
+        new_rows = export_builder.pre_process_rows(rows, section)
+        self.assertEqual(new_rows[0]['children/fav_colors/red'], 1)
+        self.assertEqual(new_rows[0]['children/fav_colors/blue'], 1)
+        self.assertEqual(new_rows[0]['children/fav_colors/pink'], 0)
+        self.assertEqual(new_rows[1]['children/fav_colors/red'], 0)
+
     def test_generation_of_gps_fields_works(self):
         survey = self._create_childrens_survey()
         export_builder = ExportBuilder()
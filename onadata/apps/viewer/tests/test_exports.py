@@ -15,6 +15,7 @@ from openpyxl import load_workbook
 
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.apps.viewer.views import (
+    cancel_export,
     delete_export,
     export_list,
     create_export,
@@ -27,7 +28,8 @@ from onadata.apps.viewer.models.parsed_instance import ParsedInstance
 from onadata.apps.logger.models import Instance
 from onadata.apps.viewer.tasks import create_xls_export
 from onadata.libs.utils.export_tools import generate_export,\
-    increment_index_in_filename, dict_to_joined_export
+    increment_index_in_filename, dict_to_joined_export,\
+    generate_geojson_export, generate_kml_export
 
 AMBULANCE_KEY = (
     'transport/available_transportation_types_to_referral_facility/ambulance'
@@ -80,6 +82,34 @@ class TestExports(TestBase):
                                  self.xform.id_string, existing_export.id)
         self.assertEqual(existing_export.id, export.id)
 
+    def test_filtered_export_is_cached(self):
+        self._publish_transportation_form_and_submit_instance()
+        query = '{"transport/loop_over_transport_types_frequency": {"$exists": true}}'
+        export = generate_export(Export.CSV_EXPORT, 'csv', self.user.username,
+                                 self.xform.id_string, filter_query=query)
+        self.assertIsNone(export.pk)
+        self.assertTrue(default_storage.exists(export.filepath))
+
+        # Same query, formatted differently, hits the cache
+        same_query = json.dumps(json.loads(query), indent=2)
+        cached_export = generate_export(
+            Export.CSV_EXPORT, 'csv', self.user.username,
+            self.xform.id_string, filter_query=same_query)
+        self.assertEqual(cached_export.filepath, export.filepath)
+
+        # Other options do not
+        other_export = generate_export(
+            Export.CSV_EXPORT, 'csv', self.user.username,
+            self.xform.id_string, filter_query=query, group_delimiter='.')
+        self.assertNotEqual(other_export.filepath, export.filepath)
+
+        # A new submission invalidates the cached export
+        self._submit_transport_instance(survey_at=1)
+        new_export = generate_export(
+            Export.CSV_EXPORT, 'csv', self.user.username,
+            self.xform.id_string, filter_query=query)
+        self.assertNotEqual(new_export.filepath, export.filepath)
+
     def test_delete_file_on_export_delete(self):
         self._publish_transportation_form()
         self._submit_transport_instance()
@@ -113,6 +143,35 @@ class TestExports(TestBase):
         response = self.client.post(delete_url, post_data)
         self.assertEqual(response.status_code, 302)
 
+    def test_identical_exports_share_file(self):
+        self._publish_transportation_form()
+        self._submit_transport_instance()
+        first_export = generate_export(
+            Export.CSV_EXPORT, 'csv', self.user.username, self.xform.id_string)
+        second_export = generate_export(
+            Export.CSV_EXPORT, 'csv', self.user.username, self.xform.id_string)
+        self.assertNotEqual(first_export.pk, second_export.pk)
+        self.assertEqual(first_export.filepath, second_export.filepath)
+        self.assertEqual(first_export.file_hash, second_export.file_hash)
+
+        # the file is kept as long as an export points to it
+        first_export.delete()
+        self.assertTrue(default_storage.exists(second_export.filepath))
+        second_export.delete()
+        self.assertFalse(default_storage.exists(second_export.filepath))
+
+        # a new submission changes the content
+        self._submit_transport_instance(survey_at=1)
+        third_export = generate_export(
+            Export.CSV_EXPORT, 'csv', self.user.username, self.xform.id_string)
+        fourth_export = generate_export(
+            Export.CSV_EXPORT, 'csv', self.user.username, self.xform.id_string)
+        self._submit_transport_instance(survey_at=2)
+        fifth_export = generate_export(
+            Export.CSV_EXPORT, 'csv', self.user.username, self.xform.id_string)
+        self.assertEqual(third_export.filepath, fourth_export.filepath)
+        self.assertNotEqual(fourth_export.filepath, fifth_export.filepath)
+
     def test_delete_oldest_export_on_limit(self):
         self._publish_transportation_form()
         self._submit_transport_instance()
@@ -191,8 +250,17 @@ class TestExports(TestBase):
         response = self.client.get(progress_url, get_data)
         content = json.loads(response.content)
         self.assertEqual(len(content), 2)
-        self.assertEqual(sorted(['url', 'export_id', 'complete', 'filename']),
-                         sorted(content[0].keys()))
+        self.assertEqual(
+            sorted([
+                'url',
+                'export_id',
+                'complete',
+                'filename',
+                'progress',
+                'cancelled',
+            ]),
+            sorted(content[0].keys())
+        )
 
     def test_dont_auto_export_if_exports_exist(self):
         self._publish_transportation_form()
@@ -527,6 +595,75 @@ class TestExports(TestBase):
         self.assertEqual(status["complete"], True)
         self.assertIsNotNone(status["filename"])
 
+    def test_cancel_export(self):
+        self._publish_transportation_form()
+        self._submit_transport_instance()
+        export = Export.objects.create(xform=self.xform,
+                                       export_type=Export.XLS_EXPORT)
+        cancel_url = reverse(cancel_export, kwargs={
+            'username': self.user.username,
+            'id_string': self.xform.id_string,
+            'export_type': 'xls'
+        })
+        response = self.client.post(cancel_url, {'export_id': export.id})
+        self.assertEqual(response.status_code, 302)
+
+        progress_url = reverse(export_progress, kwargs={
+            'username': self.user.username,
+            'id_string': self.xform.id_string,
+            'export_type': 'xls'
+        })
+        params = {'export_ids': [export.id]}
+        response = self.client.get(progress_url, params)
+        status = json.loads(response.content)[0]
+        self.assertTrue(status['complete'])
+        self.assertTrue(status['cancelled'])
+
+        # the task stops before generating the file
+        self.assertIsNone(create_xls_export(
+            self.user.username, self.xform.id_string, export.id))
+        export.refresh_from_db()
+        self.assertEqual(export.status, Export.FAILED)
+        self.assertIsNone(export.filename)
+
+    def test_geo_exports(self):
+        self._publish_xls_file_and_set_xform(
+            os.path.join(self.this_directory, 'fixtures', 'gps', 'gps.xls'))
+        self._make_submissions_gps()
+
+        export = generate_kml_export(Export.KML_EXPORT, 'kml',
+                                     self.user.username, self.xform.id_string)
+        with default_storage.open(export.filepath) as f:
+            content = f.read().decode()
+        self.assertEqual(content.count('<Placemark>'), 2)
+        self.assertIn('-73.96446704864502, 40.81101715564728', content)
+
+        export = generate_geojson_export(
+            Export.GEOJSON_EXPORT, 'geojson', self.user.username,
+            self.xform.id_string)
+        with default_storage.open(export.filepath) as f:
+            features = json.load(f)['features']
+        self.assertEqual(len(features), 2)
+
+        # only the first submission is within the bounding box
+        export = generate_geojson_export(
+            Export.GEOJSON_EXPORT, 'geojson', self.user.username,
+            self.xform.id_string,
+            bbox=[-73.96448, 40.8110, -73.96445, 40.81105])
+        with default_storage.open(export.filepath) as f:
+            features = json.load(f)['features']
+        self.assertEqual(len(features), 1)
+        self.assertEqual(features[0]['geometry']['coordinates'],
+                         [-73.96446704864502, 40.81101715564728])
+
+        # submissions are older than the start date
+        export = generate_geojson_export(
+            Export.GEOJSON_EXPORT, 'geojson', self.user.username,
+            self.xform.id_string, start='2100-01-01')
+        with default_storage.open(export.filepath) as f:
+            features = json.load(f)['features']
+        self.assertEqual(features, [])
+
     def test_exports_outdated_doesnt_consider_failed_exports(self):
         self._publish_transportation_form()
         self._submit_transport_instance()
@@ -0,0 +1,48 @@
+# coding: utf-8
+from django.conf import settings
+
+from onadata.apps.main.tests.test_base import TestBase
+from onadata.libs.utils.common_tags import ID, USERFORM_ID, XML_HASH
+from onadata.libs.utils.mongo_consistency import check_mongo_consistency
+
+
+class TestMongoConsistency(TestBase):
+
+    def setUp(self):
+        super().setUp()
+        self._publish_transportation_form()
+        self._make_submissions()
+        self.userform_id = f'{self.user.username}_{self.xform.id_string}'
+        self.instances = list(self.xform.instances.order_by('pk'))
+
+    def test_consistent_form(self):
+        results, summary = check_mongo_consistency(chunk_size=2)
+        self.assertEqual(results, [])
+        self.assertEqual(summary['instances'], 4)
+        self.assertEqual(summary['documents'], 4)
+
+    def test_repair_inconsistent_form(self):
+        instances = settings.MONGO_DB.instances
+        missing, stale, unhashed = self.instances[:3]
+        instances.delete_one({ID: missing.pk})
+        instances.update_one({ID: stale.pk}, {'$set': {XML_HASH: 'stale'}})
+        instances.update_one({ID: unhashed.pk}, {'$unset': {XML_HASH: ''}})
+        instances.insert_one({ID: 12345, USERFORM_ID: self.userform_id})
+
+        results, summary = check_mongo_consistency(chunk_size=2)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['userform_id'], self.userform_id)
+        for counter in ('missing', 'orphaned', 'stale', 'unhashed'):
+            self.assertEqual(summary[counter], 1)
+        self.assertEqual(summary['repaired'], 0)
+
+        results, summary = check_mongo_consistency(repair=True, chunk_size=2)
+        self.assertEqual(summary['repaired'], 3)
+        self.assertIsNone(instances.find_one({ID: 12345}))
+        self.assertEqual(
+            instances.find_one({ID: stale.pk})[XML_HASH], stale.xml_hash
+        )
+
+        results, summary = check_mongo_consistency()
+        self.assertEqual(results, [])
+        self.assertEqual(summary['unhashed'], 1)
@@ -25,6 +25,27 @@ class TestRemongo(TestBase):
         count = settings.MONGO_DB.instances.count_documents(filter={})
         self.assertEqual(count, 4)
 
+    def test_remongo_rebuilds_same_documents(self):
+        self._publish_transportation_form()
+        self._submit_transport_instance_w_attachment()
+        instance = self.xform.instances.get()
+        instance.tags.add('hello')
+        ParsedInstance.objects.get(instance=instance).add_note('A note')
+        instance.parsed_instance.update_mongo(asynchronous=False)
+        document = settings.MONGO_DB.instances.find_one({'_id': instance.pk})
+        self.assertEqual(document['_tags'], ['hello'])
+        self.assertEqual(len(document['_attachments']), 1)
+
+        settings.MONGO_DB.instances.drop()
+        ParsedInstance.objects.all().delete()
+        Command().handle(batchsize=3)
+
+        self.assertEqual(
+            settings.MONGO_DB.instances.find_one({'_id': instance.pk}),
+            document
+        )
+        self.assertTrue(ParsedInstance.objects.filter(instance=instance).exists())
+
     def test_remongo_with_username_id_string(self):
         self._publish_transportation_form()
         # submit 1 instances
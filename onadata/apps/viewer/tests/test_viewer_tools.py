@@ -1,9 +1,13 @@
 # coding: utf-8
+import zipfile
+
+from django.core.files.storage import default_storage
 from django.test.client import RequestFactory
 
+from onadata.apps.logger.models import Attachment
 from onadata.apps.main.tests.test_base import TestBase
 from onadata.libs.utils.viewer_tools import export_def_from_filename,\
-    get_client_ip
+    get_client_ip, create_attachments_zipfile
 
 
 class TestViewerTools(TestBase):
@@ -19,3 +23,25 @@ class TestViewerTools(TestBase):
         self.assertIsNotNone(client_ip)
         # will this always be 127.0.0.1
         self.assertEqual(client_ip, "127.0.0.1")
+
+    def test_create_attachments_zipfile(self):
+        self._publish_transportation_form()
+        self._submit_transport_instance_w_attachment()
+        self._submit_transport_instance_w_attachment(survey_at=1)
+        attachments = Attachment.objects.filter(
+            instance__xform=self.xform
+        ).order_by('pk')
+        # A missing file must be skipped without failing the whole archive
+        missing_attachment = attachments.last()
+        default_storage.delete(missing_attachment.media_file.name)
+
+        zip_file = create_attachments_zipfile(attachments)
+        zip_file.seek(0)
+        with zipfile.ZipFile(zip_file) as archive:
+            names = archive.namelist()
+            attachment = attachments.first()
+            self.assertEqual(names, [attachment.media_file.name])
+            with default_storage.open(attachment.media_file.name) as f:
+                self.assertEqual(
+                    archive.read(attachment.media_file.name), f.read()
+                )
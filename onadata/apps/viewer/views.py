@@ -20,7 +20,7 @@ from django.http import (
 )
 from django.shortcuts import get_object_or_404
 from django.shortcuts import render
-from django.utils.http import urlquote
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.translation import gettext as t
 from django.views.decorators.http import require_POST
 from rest_framework.exceptions import AuthenticationFailed
@@ -28,11 +28,14 @@ from rest_framework.settings import api_settings
 
 from onadata.apps.logger.models import XForm, Attachment
 from onadata.apps.viewer.models.export import Export
-from onadata.apps.viewer.tasks import create_async_export
+from onadata.apps.viewer.tasks import cancel_async_export, create_async_export
 from onadata.libs.authentication import digest_authentication
+from onadata.libs.utils.export_progress import get_export_status
+from onadata.libs.utils.export_tools import parse_bbox
 from onadata.libs.utils.image_tools import image_url
 from onadata.libs.utils.log import audit_log, Actions
 from onadata.libs.utils.logger_tools import response_with_mimetype_and_name
+from onadata.libs.utils.media_response import get_protected_url
 from onadata.libs.utils.user_auth import (
     HttpResponseNotAuthorized,
     has_permission,
@@ -73,6 +76,19 @@ def create_export(request, username, id_string, export_type):
         'binary_select_multiples': binary_select_multiples,
     }
 
+    # geographic export filters
+    try:
+        if request.POST.get('options[bbox]'):
+            options['bbox'] = parse_bbox(request.POST['options[bbox]'])
+        for option in ['start', 'end']:
+            value = request.POST.get(f'options[{option}]')
+            if value:
+                if not (parse_datetime(value) or parse_date(value)):
+                    raise ValueError
+                options[option] = value
+    except ValueError:
+        return HttpResponseBadRequest(t('Invalid geographic filters'))
+
     try:
         create_async_export(xform, export_type, query, force_xlsx, options)
     except Export.ExportTypeError:
@@ -131,29 +147,10 @@ def export_progress(request, username, id_string, export_type):
 
     # find the export entry in the db
     export_ids = request.GET.getlist('export_ids')
-    exports = Export.objects.filter(xform=xform, id__in=export_ids)
-    statuses = []
-    for export in exports:
-        status = {
-            'complete': False,
-            'url': None,
-            'filename': None,
-            'export_id': export.id
-        }
-
-        if export.status == Export.SUCCESSFUL:
-            status['url'] = reverse(export_download, kwargs={
-                'username': owner.username,
-                'id_string': xform.id_string,
-                'export_type': export.export_type,
-                'filename': export.filename
-            })
-            status['filename'] = export.filename
-
-        # mark as complete if it either failed or succeeded but NOT pending
-        if export.status == Export.SUCCESSFUL or export.status == Export.FAILED:
-            status['complete'] = True
-        statuses.append(status)
+    exports = Export.objects.filter(
+        xform=xform, id__in=export_ids
+    ).select_related('xform__user')
+    statuses = [get_export_status(export) for export in exports]
 
     return HttpResponse(
         json.dumps(statuses), content_type='application/json')
@@ -166,8 +163,10 @@ def export_download(request, username, id_string, export_type, filename):
     if not has_permission(xform, owner, request):
         return HttpResponseForbidden(t('Not shared.'))
 
-    # find the export entry in the db
-    export = get_object_or_404(Export, xform=xform, filename=filename)
+    # find the export entry in the db, identical exports share their file
+    export = Export.objects.filter(xform=xform, filename=filename).first()
+    if export is None:
+        return HttpResponseNotFound(t('Export not found'))
 
     ext, mime_type = export_def_from_filename(export.filename)
 
@@ -235,6 +234,30 @@ def delete_export(request, username, id_string, export_type):
         }))
 
 
+@login_required
+@require_POST
+def cancel_export(request, username, id_string, export_type):
+    owner = get_object_or_404(User, username__iexact=username)
+    xform = get_object_or_404(XForm, id_string__exact=id_string, user=owner)
+    if not has_permission(xform, owner, request):
+        return HttpResponseForbidden(t('Not shared.'))
+
+    export_id = request.POST.get('export_id')
+
+    # find the export entry in the db
+    export = get_object_or_404(Export, id=export_id, xform=xform)
+
+    if export.is_pending:
+        cancel_async_export(export)
+    return HttpResponseRedirect(reverse(
+        export_list,
+        kwargs={
+            "username": username,
+            "id_string": id_string,
+            "export_type": export_type
+        }))
+
+
 def attachment_url(request, size='medium'):
     media_file = request.GET.get('media_file')
 
@@ -340,16 +363,9 @@ def attachment_url(request, size='medium'):
             # - When using S3 Storage, traffic is multiplied by 2.
             #    S3 -> Nginx -> User
             response = HttpResponse()
-            if not isinstance(default_storage, FileSystemStorage):
-                # Double-encode the S3 URL to take advantage of NGINX's
-                # otherwise troublesome automatic decoding
-                protected_url = '/protected-s3/{}'.format(urlquote(media_url))
-            else:
-                protected_url = media_url.replace(settings.MEDIA_URL, "/protected/")
-
             # Let nginx determine the correct content type
             response["Content-Type"] = ""
-            response["X-Accel-Redirect"] = protected_url
+            response["X-Accel-Redirect"] = get_protected_url(media_url)
             return response
 
     return HttpResponseNotFound(t('Error: Attachment not found'))
@@ -10,8 +10,27 @@ from rest_framework.authentication import (
     TokenAuthentication as DRFTokenAuthentication,
 )
 from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
 
 from onadata.libs.mixins.mfa import MFABlockerMixin
+from onadata.libs.utils.auth_cache import cache_token, get_cached_token
+
+
+def get_authentication_classes(required_classes, excluded_classes=()):
+    """
+    Return `required_classes` followed by the other classes of
+    `DEFAULT_AUTHENTICATION_CLASSES` which are not subclasses of
+    `excluded_classes`.
+
+    Meant to be assigned to `authentication_classes` of views, so that the
+    list is built once instead of on every request.
+    """
+    return list(required_classes) + [
+        auth_class
+        for auth_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        if auth_class not in required_classes
+        and not issubclass(auth_class, tuple(excluded_classes))
+    ]
 
 
 def digest_authentication(request):
@@ -110,6 +129,14 @@ class TokenAuthentication(MFABlockerMixin, DRFTokenAuthentication):
     verbose_name = 'Token authentication'
 
     def authenticate_credentials(self, key):
-        user, token = super().authenticate_credentials(key=key)
-        self.validate_mfa_not_active(user)
-        return user, token
+        # Tokens are cached for a short time, as OpenRosa clients send them
+        # with every request
+        token = get_cached_token(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key=key)
+            cache_token(token)
+        elif not token.user.is_active:
+            raise AuthenticationFailed(t('User inactive or deleted.'))
+
+        self.validate_mfa_not_active(token.user)
+        return token.user, token
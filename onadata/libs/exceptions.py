@@ -1,3 +1,7 @@
 # coding: utf-8
 class NoRecordsFoundError(Exception):
     pass
+
+
+class ExportCancelledError(Exception):
+    pass
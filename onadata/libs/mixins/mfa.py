@@ -3,7 +3,7 @@ from django.conf import settings
 from django.utils.translation import gettext as t
 from rest_framework import exceptions
 
-from onadata.apps.main.models.user_profile import UserProfile
+from onadata.libs.utils.auth_cache import get_profile_flags
 
 
 class MFABlockerMixin:
@@ -19,13 +19,9 @@ class MFABlockerMixin:
         # ToDo Remove the condition when kobotoolbox/kpi#3383 is released/merged
         class_path = f'{self.__module__}.{self.__class__.__name__}'
         if class_path not in settings.MFA_SUPPORTED_AUTH_CLASSES:
-            try:
-                is_mfa_active = user.profile.is_mfa_active
-            except UserProfile.DoesNotExist:
-                pass
-            else:
-                if is_mfa_active:
-                    raise exceptions.AuthenticationFailed(t(
-                        'Multi-factor authentication is enabled for this '
-                        'account. ##authentication class## cannot be used.'
-                    ).replace('##authentication class##', self.verbose_name))
+            profile_flags = get_profile_flags(user.pk)
+            if profile_flags and profile_flags['is_mfa_active']:
+                raise exceptions.AuthenticationFailed(t(
+                    'Multi-factor authentication is enabled for this '
+                    'account. ##authentication class## cannot be used.'
+                ).replace('##authentication class##', self.verbose_name))
@@ -50,11 +50,14 @@ class XFormSerializer(serializers.HyperlinkedModelSerializer):
             'shared',
             'shared_data',
             'pending_delete',
+            'md5_hash',
+            'md5_hash_with_disclaimer',
         )
 
     @check_obj
     def get_hash(self, obj):
-        return "md5:%s" % obj.md5_hash
+        md5_hash, _ = obj.get_md5_hashes()
+        return "md5:%s" % md5_hash
 
     # Tests are expecting this `public` to be passed only "True" or "False"
     # and as a string. I don't know how it worked pre-migrations to django 1.8
@@ -129,7 +132,8 @@ class XFormListSerializer(serializers.Serializer):
 
     @check_obj
     def get_hash(self, obj):
-        return f'md5:{obj.md5_hash_with_disclaimer}'
+        _, md5_hash_with_disclaimer = obj.get_md5_hashes()
+        return f'md5:{md5_hash_with_disclaimer}'
 
     @check_obj
     def get_url(self, obj):
@@ -0,0 +1,51 @@
+# coding: utf-8
+from guardian.shortcuts import assign_perm, remove_perm
+from rest_framework.authtoken.models import Token
+
+from onadata.apps.main.tests.test_base import TestBase
+from onadata.libs.authentication import TokenAuthentication
+from onadata.libs.utils.auth_cache import (
+    get_cached_token,
+    get_profile_flags,
+    has_xform_permission,
+)
+
+
+class AuthCacheTestCase(TestBase):
+
+    def setUp(self):
+        super().setUp()
+        self._publish_transportation_form()
+        self.alice = self._create_user('alice', 'alice')
+
+    def test_xform_permissions_are_invalidated(self):
+        self.assertFalse(
+            has_xform_permission(self.alice, 'report_xform', self.xform)
+        )
+        assign_perm('report_xform', self.alice, self.xform)
+        self.assertTrue(
+            has_xform_permission(self.alice, 'report_xform', self.xform)
+        )
+        remove_perm('report_xform', self.alice, self.xform)
+        self.assertFalse(
+            has_xform_permission(self.alice, 'report_xform', self.xform)
+        )
+
+    def test_profile_flags_are_invalidated(self):
+        self.assertFalse(get_profile_flags(self.user.pk)['require_auth'])
+        self.user.profile.require_auth = True
+        self.user.profile.save()
+        self.assertTrue(get_profile_flags(self.user.pk)['require_auth'])
+
+    def test_tokens_are_invalidated(self):
+        token = Token.objects.get(user=self.alice)
+        user, _ = TokenAuthentication().authenticate_credentials(token.key)
+        self.assertEqual(user, self.alice)
+        self.assertEqual(get_cached_token(token.key), token)
+
+        self.alice.is_active = False
+        self.alice.save()
+        self.assertIsNone(get_cached_token(token.key))
+
+        token.delete()
+        self.assertIsNone(get_cached_token(token.key))
@@ -1,16 +1,21 @@
 # coding: utf-8
 import os
 from io import StringIO, BytesIO
+from tempfile import NamedTemporaryFile
 
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.contrib.auth.models import AnonymousUser
 from django.test import RequestFactory
 from django.urls import reverse
+from mock import patch
 
 from onadata.libs.utils import csv_import
 from onadata.apps.logger.models import XForm
 from onadata.apps.logger.models import Instance
 from onadata.apps.main.tests.test_base import TestBase
+from onadata.apps.viewer.pandas_mongo_bridge import CSVDataFrameBuilder
 
 
 class CSVImportTestCase(TestBase):
@@ -70,3 +75,174 @@ class CSVImportTestCase(TestBase):
         csv_import.submit_csv(self.request, self.xform, edit_csv)
         self.assertEqual(Instance.objects.count(),
                          count, 'submit_csv edits #2 test Failed!')
+
+    def test_submit_csv_updates_counters_and_mongo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = csv_import.submit_csv(
+                self.request, self.xform, self.good_csv
+            )
+        self.assertEqual(resp, {'additions': 9, 'updates': 0})
+
+        self.xform.refresh_from_db()
+        self.assertEqual(self.xform.num_of_submissions, 9)
+        self.assertEqual(
+            sum(self.xform.daily_counters.values_list(
+                'counter', flat=True
+            )),
+            9
+        )
+        self.assertEqual(
+            settings.MONGO_DB.instances.count_documents(
+                {'_id': {'$in': list(
+                    self.xform.instances.values_list('pk', flat=True)
+                )}}
+            ),
+            9
+        )
+        # Submission times are read from the CSV file
+        self.assertEqual(
+            Instance.objects.filter(
+                date_created__date='2014-09-04'
+            ).count(),
+            9
+        )
+
+    def test_submit_csv_rejects_unknown_columns(self):
+        resp = csv_import.submit_csv(
+            self.request,
+            self.xform,
+            BytesIO(
+                'formhub/uuid,name,not_a/question\n'
+                f'{self.xform.uuid},Name_1,value'.encode()
+            ),
+        )
+        self.assertIn('not_a/question', resp.get('error'))
+        self.assertEqual(Instance.objects.count(), 0)
+
+    def test_submit_csv_bad_rows_are_not_saved(self):
+        resp = csv_import.submit_csv(self.request, self.xform, self.bad_csv)
+        self.assertIsNotNone(resp.get('error'))
+        self.assertEqual(Instance.objects.count(), 0)
+
+    def _publish_new_repeats_form(self):
+        fixture_dir = os.path.join(
+            settings.ONADATA_DIR, 'apps', 'viewer', 'tests', 'fixtures',
+            'new_repeats'
+        )
+        self._publish_xls_file(os.path.join(fixture_dir, 'new_repeats.xls'))
+        xform = XForm.objects.get(id_string='new_repeats')
+        instance_path = os.path.join(
+            fixture_dir, 'instances', 'new_repeats_01.xml'
+        )
+        return xform, instance_path
+
+    def test_submit_csv_reimports_export(self):
+        """
+        Test that an export of submissions with groups, repeats and "select
+        multiple" questions is imported back to the same data
+        """
+        xform, instance_path = self._publish_new_repeats_form()
+        self._make_submission(instance_path)
+        with NamedTemporaryFile(suffix='.csv') as export_file:
+            CSVDataFrameBuilder(
+                self.user.username, xform.id_string
+            ).export_to(export_file.name)
+            xform.instances.all().delete()
+            request = RequestFactory().post(
+                reverse('xform-csv-import', kwargs={'pk': xform.pk})
+            )
+            request.user = xform.user
+            with open(export_file.name, 'rb') as csv_file:
+                resp = csv_import.submit_csv(request, xform, csv_file)
+
+        self.assertEqual(resp, {'additions': 1, 'updates': 0})
+        data = xform.instances.get().json
+        self.assertEqual(
+            sorted(data['web_browsers'].split()), ['chrome', 'ie']
+        )
+        self.assertEqual(data['info/name'], 'Adam')
+        self.assertEqual(
+            [
+                kid['kids/kids_details/kids_name']
+                for kid in data['kids/kids_details']
+            ],
+            ['Abel', 'Cain'],
+        )
+
+    def test_get_columns_and_submission_dict(self):
+        """
+        Test the mapping of group, repeat and "select multiple" headers
+        """
+        xform, _ = self._publish_new_repeats_form()
+        headers = [
+            'info/name',
+            'kids/kids_details[2]/kids_name',
+            'web_browsers',
+            'web_browsers/chrome',
+            'web_browsers/ie',
+        ]
+        columns = csv_import._get_columns(headers, xform.data_dictionary())
+        # The choice columns of `web_browsers` are redundant with its column
+        self.assertEqual(
+            [header for header, _, _ in columns], headers[:3]
+        )
+        submission = csv_import._get_submission_dict(
+            {
+                'info/name': 'Adam',
+                'kids/kids_details[2]/kids_name': 'Cain',
+                'web_browsers': 'chrome ie',
+                'web_browsers/chrome': 'True',
+                'web_browsers/ie': 'True',
+            },
+            columns,
+        )
+        self.assertEqual(submission, {
+            'info': {'name': 'Adam'},
+            'kids': {'kids_details': [{'kids_name': 'Cain'}]},
+            'web_browsers': 'chrome ie',
+        })
+
+        # Without the question column, choices are read from their columns
+        columns = csv_import._get_columns(
+            ['web_browsers/chrome', 'web_browsers/ie', 'web_browsers/safari'],
+            xform.data_dictionary(),
+        )
+        submission = csv_import._get_submission_dict(
+            {
+                'web_browsers/chrome': 'True',
+                'web_browsers/ie': '1',
+                'web_browsers/safari': 'False',
+            },
+            columns,
+        )
+        self.assertEqual(submission, {'web_browsers': 'chrome ie'})
+
+        # Nested groups, e.g. `a/b/c`, are nested dicts
+        submission = csv_import._get_submission_dict(
+            {'a/b/c': 'value', 'a/rep[2]/q': 'repeated'},
+            [
+                ('a/b/c', [('a', None), ('b', None), ('c', None)], None),
+                ('a/rep[2]/q', [('a', None), ('rep', 2), ('q', None)], None),
+            ],
+        )
+        self.assertEqual(submission, {
+            'a': {'b': {'c': 'value'}, 'rep': [{'q': 'repeated'}]},
+        })
+
+    def test_import_csv_from_storage_failure_completes_status(self):
+        file_path = default_storage.save(
+            'bob/csv_imports/test.csv', ContentFile(self.good_csv.read())
+        )
+        with patch.object(
+            csv_import, 'import_csv', side_effect=RuntimeError('boom')
+        ):
+            with self.assertRaises(RuntimeError):
+                csv_import.import_csv_from_storage(
+                    self.xform.pk, file_path, self.user.pk, 'task'
+                )
+
+        self.assertEqual(
+            csv_import.get_csv_import_status(self.xform.pk, 'task'),
+            {'complete': True, 'result': {'error': 'CSV import failed: boom'}},
+        )
+        self.assertFalse(default_storage.exists(file_path))
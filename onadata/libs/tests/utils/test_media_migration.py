@@ -0,0 +1,82 @@
+# coding: utf-8
+from datetime import timedelta
+
+from django.test import TestCase
+
+from onadata.apps.logger.models import MediaMigrationCheckpoint
+from onadata.libs.utils.media_migration import (
+    COPIED,
+    FAILED,
+    SKIPPED,
+    MediaMigration,
+)
+
+
+class MediaMigrationTestCase(TestCase):
+
+    def _batches(self, position):
+        items = list(range(1, 10))
+        start = int(position or 0)
+        for i in range(start, len(items), 3):
+            batch = items[i:i + 3]
+            yield batch[-1], batch
+
+    def test_run_saves_checkpoint(self):
+        migration = MediaMigration('test', workers=2)
+        counts = migration.run(
+            self._batches(migration.get_position()),
+            lambda item: (SKIPPED, 0) if item % 2 else (COPIED, 10),
+        )
+
+        self.assertEqual(counts, {COPIED: 4, SKIPPED: 5, FAILED: 0})
+        self.assertEqual(migration.bytes, 40)
+        checkpoint = MediaMigrationCheckpoint.objects.get(name='test')
+        self.assertEqual(checkpoint.position, '9')
+        self.assertEqual(checkpoint.processed, 9)
+
+    def test_checkpoint_date_modified_is_updated(self):
+        checkpoint = MediaMigrationCheckpoint.objects.create(name='test')
+        MediaMigrationCheckpoint.objects.filter(pk=checkpoint.pk).update(
+            date_modified=checkpoint.date_modified - timedelta(days=1)
+        )
+        checkpoint.refresh_from_db()
+        previous = checkpoint.date_modified
+
+        migration = MediaMigration('test')
+        migration.run(self._batches(None), lambda item: (COPIED, 0))
+        checkpoint.refresh_from_db()
+        self.assertGreater(checkpoint.date_modified, previous)
+
+    def test_resume_from_checkpoint(self):
+        MediaMigrationCheckpoint.objects.create(name='test', position='6')
+        processed = []
+        migration = MediaMigration('test')
+
+        def operation(item):
+            processed.append(item)
+            return COPIED, 0
+
+        migration.run(self._batches(migration.get_position()), operation)
+        self.assertEqual(sorted(processed), [7, 8, 9])
+
+        # without resuming, every item is processed again
+        processed.clear()
+        migration = MediaMigration('test', resume=False)
+        migration.run(self._batches(migration.get_position()), operation)
+        self.assertEqual(sorted(processed), list(range(1, 10)))
+
+    def test_failures_and_dry_run_do_not_move_checkpoint(self):
+        migration = MediaMigration('test')
+        migration.run(
+            self._batches(None),
+            lambda item: (FAILED, 0) if item == 2 else (COPIED, 0),
+        )
+        self.assertFalse(
+            MediaMigrationCheckpoint.objects.filter(name='test').exists()
+        )
+
+        migration = MediaMigration('test', dry_run=True)
+        migration.run(self._batches(None), lambda item: (COPIED, 0))
+        self.assertFalse(
+            MediaMigrationCheckpoint.objects.filter(name='test').exists()
+        )
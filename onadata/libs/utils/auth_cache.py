@@ -0,0 +1,96 @@
+# coding: utf-8
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from guardian.core import ObjectPermissionChecker
+
+from onadata.apps.main.models.user_profile import UserProfile
+
+# Entries are also changed by KPI, which writes to the database directly
+# without sending signals: they expire after `AUTH_CACHE_TIMEOUT` seconds
+PROFILE_FLAGS_KEY = 'auth_profile_flags_{}'
+TOKEN_KEY = 'auth_token_{}'
+XFORM_PERMISSIONS_KEY = 'auth_xform_perms_{}_{}'
+
+
+def get_profile_flags(user_id):
+    """
+    Return the authentication related flags of the profile of the user
+    `user_id` as a dict, or `None` if the user has no profile
+    """
+    key = PROFILE_FLAGS_KEY.format(user_id)
+    flags = cache.get(key)
+    if flags is None:
+        profile = (
+            UserProfile.objects.filter(user_id=user_id)
+            .values('require_auth', 'is_mfa_active')
+            .first()
+        )
+        # Cache missing profiles as well
+        flags = profile or {}
+        cache.set(key, flags, settings.AUTH_CACHE_TIMEOUT)
+
+    return flags or None
+
+
+def get_cached_token(key):
+    """
+    Return the `Token` whose key is `key`, with its user, if it is cached
+    """
+    return cache.get(_get_token_cache_key(key))
+
+
+def cache_token(token):
+    cache.set(
+        _get_token_cache_key(token.key), token, settings.AUTH_CACHE_TIMEOUT
+    )
+
+
+def get_xform_permissions(user, xform):
+    """
+    Return the codenames of the permissions `user` has on `xform`
+    """
+    key = XFORM_PERMISSIONS_KEY.format(xform.pk, user.pk)
+    perms = cache.get(key)
+    if perms is None:
+        perms = ObjectPermissionChecker(user).get_perms(xform)
+        cache.set(key, perms, settings.AUTH_CACHE_TIMEOUT)
+
+    return perms
+
+
+def has_xform_permission(user, codename, xform):
+    """
+    Same as `user.has_perm(codename, xform)`, with the object permissions of
+    `user` read from the cache
+    """
+    if not isinstance(user, User):
+        # Anonymous and service account users
+        return user.has_perm(codename, xform)
+
+    if not user.is_active:
+        return False
+
+    if user.is_superuser:
+        return True
+
+    return codename in get_xform_permissions(user, xform)
+
+
+def invalidate_profile_flags(user_id):
+    cache.delete(PROFILE_FLAGS_KEY.format(user_id))
+
+
+def invalidate_tokens(keys):
+    cache.delete_many([_get_token_cache_key(key) for key in keys])
+
+
+def invalidate_xform_permissions(xform_id, user_id):
+    cache.delete(XFORM_PERMISSIONS_KEY.format(xform_id, user_id))
+
+
+def _get_token_cache_key(key):
+    # Do not expose the credentials in the cache keys
+    return TOKEN_KEY.format(hashlib.sha256(key.encode()).hexdigest())
@@ -1,20 +1,42 @@
 # coding: utf-8
+from collections import defaultdict
 from datetime import datetime
-import errno
+from functools import partial
+from itertools import islice
+import mimetypes
 import os
 import shutil
 import sys
-import tempfile
 import zipfile
-from time import sleep
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.db import transaction
+from django.utils import timezone
+from django.utils.encoding import smart_str
 
 from onadata.apps.logger.import_tools import django_file
-from onadata.apps.logger.models import Instance
-from onadata.libs.utils.logger_tools import create_instance
-from onadata.libs.utils.model_tools import queryset_iterator
+from onadata.apps.logger.models import Attachment, Instance, SurveyType
+from onadata.apps.logger.models.instance import get_id_string_from_xml_str
+from onadata.apps.logger.xform_instance_parser import XFormInstanceParser
+from onadata.libs.utils.csv_import import (
+    save_new_instances,
+    sync_imported_instances,
+)
+from onadata.libs.utils.logger_tools import (
+    create_instance,
+    get_uuid_from_submission,
+    get_xform_from_submission,
+    save_attachments,
+)
 
 
 DATE_FORMAT = "%Y-%m-%d-%H-%M-%S"
+INSTANCES_DIR = "instances"
+BACKUP_BATCH_SIZE = 2000
+RESTORE_BATCH_SIZE = 500
+ZIP_CHUNK_SIZE = 1024 * 1024
 
 
 def _date_created_from_filename(filename):
@@ -31,88 +53,102 @@ def _date_created_from_filename(filename):
         parts_dict, DATE_FORMAT)
 
 
-def create_zip_backup(zip_output_file, user, xform=None):
-    # create a temp dir that we'll create our structure within and zip it
-    # when we are done
-    tmp_dir_path = tempfile.mkdtemp()
-
-    instances_path = os.path.join(tmp_dir_path, "instances")
-
-    # get the xls file from storage
+def create_zip_backup(zip_output_file, user, xform=None,
+                      include_attachments=False):
+    """
+    Write the submissions of `user`, or only the ones of `xform`, to a ZIP
+    archive as `instances/YYYY/MM/DD/YYYY-MM-DD-HH-MM-SS[-i].xml` entries.
+    With `include_attachments`, the attachments of each submission are added
+    to a directory of the same name, without the `.xml` extension.
 
-    # for each submission in the database - create an xml file in this
-    # form
-    # /<id_string>/YYYY/MM/DD/YYYY-MM-DD-HH-MM-SS.xml
+    Submissions are read with a server-side cursor and written, like
+    attachments streamed from storage, straight into the archive.
+    """
     qs = Instance.objects.filter(xform__user=user)
     if xform:
         qs = qs.filter(xform=xform)
 
     num_instances = qs.count()
+    rows = qs.order_by('pk').values_list(
+        'pk', 'date_created', 'xml'
+    ).iterator(chunk_size=BACKUP_BATCH_SIZE)
+    # Number of submissions created at each second, to name duplicates
+    name_counts = defaultdict(int)
     done = 0
-    sys.stdout.write("Creating XML Instances\n")
-    for instance in queryset_iterator(qs, 100):
-        # get submission time
-        date_time_str = instance.date_created.strftime(DATE_FORMAT)
-        date_parts = date_time_str.split("-")
-        sub_dirs = os.path.join(*date_parts[:3])
-        # create the directories
-        full_path = os.path.join(instances_path, sub_dirs)
-        if not os.path.exists(full_path):
-            try:
-                os.makedirs(full_path)
-            except OSError as e:
-                if e.errno != errno.EEXIST:
-                    raise
-
-        full_xml_path = os.path.join(full_path, date_time_str + ".xml")
-        # check for duplicate file names
-        file_index = 1
-        while os.path.exists(full_xml_path):
-            full_xml_path = os.path.join(
-                full_path, "%s-%d.xml" % (date_time_str, file_index))
-            file_index += 1
-        # create the instance xml
-        with open(full_xml_path, 'wb') as f:
-            f.write(instance.xml.encode())
-        done += 1
-        sys.stdout.write("\r%.2f %% done" % (
-            float(done)/float(num_instances) * 100))
-        sys.stdout.flush()
-        sleep(0)
-
-    # write zip file
-    sys.stdout.write("\nWriting to ZIP arhive.\n")
-    zf = zipfile.ZipFile(zip_output_file, "w")
-    done = 0
-    for dir_path, dir_names, file_names in os.walk(tmp_dir_path):
-        for file_name in file_names:
-            archive_path = dir_path.replace(tmp_dir_path + os.path.sep,
-                                            "", 1)
-            zf.write(os.path.join(dir_path, file_name),
-                     os.path.join(archive_path, file_name))
-            done += 1
+    sys.stdout.write("Writing to ZIP archive\n")
+    with zipfile.ZipFile(
+        zip_output_file, 'w', zipfile.ZIP_DEFLATED, allowZip64=True
+    ) as zf:
+        for batch in iter(lambda: list(islice(rows, BACKUP_BATCH_SIZE)), []):
+            attachments = defaultdict(list)
+            if include_attachments:
+                for instance_id, media_file in Attachment.objects.filter(
+                    instance_id__in=[pk for pk, _, _ in batch]
+                ).values_list('instance_id', 'media_file'):
+                    attachments[instance_id].append(media_file)
+
+            for pk, date_created, xml in batch:
+                date_time_str = date_created.strftime(DATE_FORMAT)
+                index = name_counts[date_time_str]
+                name_counts[date_time_str] += 1
+                entry_name = '/'.join(
+                    [INSTANCES_DIR] + date_time_str.split('-')[:3]
+                    + [f'{date_time_str}-{index}' if index else date_time_str]
+                )
+                zf.writestr(f'{entry_name}.xml', xml.encode())
+                for media_file in attachments[pk]:
+                    _write_attachment(zf, entry_name, media_file)
+
+            done += len(batch)
             sys.stdout.write("\r%.2f %% done" % (
                 float(done)/float(num_instances) * 100))
             sys.stdout.flush()
-            sleep(0)
-    zf.close()
-    # removed dir tree
-    shutil.rmtree(tmp_dir_path)
+
     sys.stdout.write("\nBackup saved to %s\n" % zip_output_file)
 
 
-def restore_backup_from_zip(zip_file_path, username):
+def restore_backup_from_zip(zip_file_path, username,
+                            batch_size=RESTORE_BATCH_SIZE):
+    """
+    Restore the submissions of a backup made by `create_zip_backup()`,
+    reading its entries straight from the archive. Submissions are inserted
+    by batches with `bulk_create()`, and their attachments, if the backup
+    has any, saved to storage. Submissions already stored are skipped.
+
+    :returns: The number of submissions in the archive, and of restored ones
+    :rtype: tuple(int, int)
+    """
     try:
-        temp_directory = tempfile.mkdtemp()
         zf = zipfile.ZipFile(zip_file_path)
-
-        zf.extractall(temp_directory)
     except zipfile.BadZipfile:
         sys.stderr.write("Bad zip arhcive.")
-    else:
-        return restore_backup_from_path(temp_directory, username, "backup")
-    finally:
-        shutil.rmtree(temp_directory)
+        return 0, 0
+
+    with zf:
+        xml_entries = []
+        attachment_entries = defaultdict(list)
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            parts = info.filename.split('/')
+            if parts[0] == INSTANCES_DIR and len(parts) == 6:
+                attachment_entries['/'.join(parts[:5])].append(info)
+            else:
+                xml_entries.append(info)
+
+        restore = _BackupRestore(zf, username, attachment_entries)
+        num_restored = 0
+        for start in range(0, len(xml_entries), batch_size):
+            num_restored += restore.restore(
+                xml_entries[start:start + batch_size]
+            )
+            sys.stdout.write("\r%.2f %% done" % (
+                float(min(start + batch_size, len(xml_entries)))
+                / float(len(xml_entries)) * 100))
+            sys.stdout.flush()
+
+    sys.stdout.write("\n")
+    return len(xml_entries), num_restored
 
 
 def restore_backup_from_xml_file(xml_instance_path, username):
@@ -160,3 +196,152 @@ def restore_backup_from_path(dir_path, username, status):
                 xml_instance_path,
                 username)
     return num_instances, num_restored
+
+
+class _BackupRestore:
+    """
+    Build the submissions of backup entries, caching what is common to all
+    the submissions of a form
+    """
+
+    def __init__(self, zf, username, attachment_entries):
+        self.zf = zf
+        self.username = username
+        self.attachment_entries = attachment_entries
+        self.xforms = {}
+        self.data_dictionaries = {}
+        self.survey_types = {}
+
+    def restore(self, entries):
+        """
+        Insert the submissions of `entries`, form by form
+
+        :returns: The number of restored submissions
+        """
+        instances_by_xform = defaultdict(list)
+        xml_hashes = set()
+        for info in entries:
+            file_name = os.path.basename(info.filename)
+            try:
+                instance = self._build_instance(info)
+            except Exception as e:
+                sys.stderr.write(
+                    "Could not restore %s: %s\n" % (file_name, e))
+                continue
+            # The same submission can be in the archive more than once
+            if instance.xml_hash in xml_hashes:
+                continue
+            xml_hashes.add(instance.xml_hash)
+            instances_by_xform[instance.xform].append((info, instance))
+
+        num_restored = 0
+        for xform, entry_instances in instances_by_xform.items():
+            existing_hashes = set(
+                Instance.objects.filter(
+                    xform__user_id=xform.user_id,
+                    xml_hash__in=[
+                        instance.xml_hash for _, instance in entry_instances
+                    ],
+                ).values_list('xml_hash', flat=True)
+            )
+            entry_instances = [
+                (info, instance) for info, instance in entry_instances
+                if instance.xml_hash not in existing_hashes
+            ]
+            instances = [instance for _, instance in entry_instances]
+            with transaction.atomic():
+                save_new_instances(xform, instances)
+                for info, instance in entry_instances:
+                    self._save_attachments(info, instance)
+                transaction.on_commit(partial(
+                    sync_imported_instances,
+                    xform,
+                    [instance.pk for instance in instances],
+                    [],
+                ))
+            num_restored += len(instances)
+
+        return num_restored
+
+    def _build_instance(self, info):
+        xml = smart_str(self.zf.read(info))
+        xform = self._get_xform(xml)
+        data_dictionary = self.data_dictionaries[xform.pk]
+
+        try:
+            date_created = _date_created_from_filename(
+                os.path.basename(info.filename))
+        except ValueError:
+            sys.stderr.write(
+                "Couldn't determine date created from filename: '%s'\n" %
+                info.filename)
+            date_created = timezone.now()
+        else:
+            date_created = timezone.make_aware(date_created, timezone.utc)
+
+        instance = Instance(
+            xform=xform,
+            xml=xml,
+            status='submitted_via_web',
+            validation_status={},
+            date_created=date_created,
+        )
+        instance._parser = XFormInstanceParser(xml, data_dictionary)
+        instance._set_uuid()
+        instance._populate_xml_hash()
+        instance._set_geom(data_dictionary.geopoint_xpaths())
+        instance._set_json()
+
+        slug = instance.get_root_node_name()
+        if slug not in self.survey_types:
+            self.survey_types[slug], _ = SurveyType.objects.get_or_create(
+                slug=slug)
+        instance.survey_type = self.survey_types[slug]
+        return instance
+
+    def _get_xform(self, xml):
+        key = get_uuid_from_submission(xml) or get_id_string_from_xml_str(xml)
+        if key not in self.xforms:
+            xform = get_xform_from_submission(xml, self.username)
+            Instance(xform=xform).check_active(force=False)
+            self.xforms[key] = xform
+            self.data_dictionaries[xform.pk] = xform.data_dictionary()
+        return self.xforms[key]
+
+    def _save_attachments(self, info, instance):
+        media_files = []
+        for attachment_info in self.attachment_entries.get(
+            os.path.splitext(info.filename)[0], []
+        ):
+            name = os.path.basename(attachment_info.filename)
+            media_files.append(InMemoryUploadedFile(
+                file=self.zf.open(attachment_info),
+                field_name='media_file',
+                name=name,
+                content_type=(
+                    mimetypes.guess_type(name)[0]
+                    or 'application/octet-stream'
+                ),
+                size=attachment_info.file_size,
+                charset=None,
+            ))
+        if media_files:
+            save_attachments(instance, media_files)
+
+
+def _write_attachment(zf, entry_name, media_file):
+    """
+    Stream the attachment `media_file` from storage into the `entry_name`
+    directory of the archive
+    """
+    try:
+        source = default_storage.open(media_file, 'rb')
+    except (OSError, SuspiciousFileOperation) as e:
+        sys.stderr.write(
+            "Could not add attachment %s: %s\n" % (media_file, e))
+        return
+
+    with source, zf.open(
+        f'{entry_name}/{os.path.basename(media_file)}', 'w', force_zip64=True
+    ) as destination:
+        shutil.copyfileobj(source, destination, ZIP_CHUNK_SIZE)
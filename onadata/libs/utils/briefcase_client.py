@@ -4,6 +4,8 @@ import math
 import mimetypes
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from io import StringIO
 from urllib.parse import urljoin
 from xml.parsers.expat import ExpatError
@@ -12,6 +14,8 @@ import requests
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.db import connection
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPDigestAuth
 
 from onadata.apps.logger.xform_instance_parser import clean_and_parse_xml
@@ -19,6 +23,7 @@ from onadata.libs.utils.logger_tools import publish_xml_form, publish_form, \
     create_instance
 
 NUM_RETRIES = 3
+RESUMPTION_CURSOR_FILENAME = 'resumption_cursor'
 
 
 def django_file(file_obj, field_name, content_type):
@@ -78,7 +83,17 @@ def node_value(node, tag_name):
 
 
 class BriefcaseClient:
-    def __init__(self, url, username, password, user):
+    """
+    Pull forms, submissions and media files from an OpenRosa/Briefcase
+    server into the storage, and push them from the storage to `user`.
+
+    Submissions and media files are downloaded, and submissions uploaded,
+    by up to `workers` threads sharing a pool of keep-alive connections.
+    The submission list cursor of each form is saved in the storage, so an
+    interrupted pull resumes where it stopped.
+    """
+
+    def __init__(self, url, username, password, user, workers=1):
         self.url = url
         self.user = user
         self.auth = HTTPDigestAuth(username, password)
@@ -89,8 +104,34 @@ class BriefcaseClient:
         self.forms_path = os.path.join(
             self.user.username, 'briefcase', 'forms')
         self.resumption_cursor = 0
+        self.workers = max(workers, 1)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=self.workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.logger = logging.getLogger('console_logger')
 
+    def _map(self, func, items, close_connection=False):
+        """
+        Return the results of `func` applied to each of `items`, using
+        `self.workers` threads.
+
+        :param bool close_connection: Close the database connection of the
+            thread after each item, if `func` uses the database
+        """
+        if self.workers == 1:
+            return [func(item) for item in items]
+
+        def run(item):
+            try:
+                return func(item)
+            finally:
+                if close_connection:
+                    connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(run, items))
+
     def _get_form_list(self, xml_text):
         xml_doc = clean_and_parse_xml(xml_text)
         forms = []
@@ -107,9 +148,8 @@ class BriefcaseClient:
         return forms
 
     def download_manifest(self, manifest_url, id_string):
-        if self._get_response(manifest_url):
-            manifest_res = self._current_response
-
+        manifest_res = self._get_response(manifest_url)
+        if manifest_res:
             try:
                 manifest_doc = clean_and_parse_xml(manifest_res.content)
             except ExpatError:
@@ -123,14 +163,13 @@ class BriefcaseClient:
 
     def download_xforms(self, include_instances=False):
         # fetch formList
-        if not self._get_response(self.form_list_url):
-            response = self._current_response.content \
-                if self._current_response else "Unknown Error"
-            self.logger.error("Failed to download xforms %s." % response)
+        response = self._get_response(self.form_list_url)
+        if not response:
+            self.logger.error(
+                "Failed to download xforms %s." % self.form_list_url)
 
             return
 
-        response = self._current_response
         forms = self._get_form_list(response.content)
 
         self.logger.debug('Successfully fetched %s.' % self.form_list_url)
@@ -140,17 +179,14 @@ class BriefcaseClient:
                 self.forms_path, id_string, '%s.xml' % id_string)
 
             if not default_storage.exists(form_path):
-                if not self._get_response(download_url):
+                form_res = self._get_response(download_url)
+                if not form_res:
                     self.logger.error("Failed to download xform %s."
                                       % download_url)
                     continue
 
-                form_res = self._current_response
                 content = ContentFile(form_res.content.strip())
                 default_storage.save(form_path, content)
-            else:
-                form_res = default_storage.open(form_path)
-                content = form_res.read()
 
             self.logger.debug("Fetched %s." % download_url)
 
@@ -163,29 +199,40 @@ class BriefcaseClient:
 
     @retry(NUM_RETRIES)
     def _get_response(self, url, params=None):
-        self._current_response = None
-        response = requests.get(url, auth=self.auth, params=params)
-        success = response.status_code == 200
-        self._current_response = response
+        """
+        Return the response to a GET request of `url`, or `False` if it
+        failed
+        """
+        try:
+            response = self.session.get(url, auth=self.auth, params=params)
+        except requests.RequestException as e:
+            self.logger.warning("Failed to fetch %s: %s" % (url, e))
+            return False
 
-        return success
+        return response if response.status_code == 200 else False
 
     @retry(NUM_RETRIES)
     def _get_media_response(self, url):
-        self._current_response = None
-        head_response = requests.head(url, auth=self.auth)
+        try:
+            head_response = self.session.head(url, auth=self.auth)
 
-        # S3 redirects, avoid using formhub digest on S3
-        if head_response.status_code == 302:
-            url = head_response.headers.get('location')
+            # S3 redirects, avoid using formhub digest on S3
+            if head_response.status_code == 302:
+                url = head_response.headers.get('location')
 
-        response = requests.get(url)
-        success = response.status_code == 200
-        self._current_response = response
+            response = self.session.get(url)
+        except requests.RequestException as e:
+            self.logger.warning("Failed to fetch %s: %s" % (url, e))
+            return False
 
-        return success
+        return response if response.status_code == 200 else False
 
-    def download_media_files(self, xml_doc, media_path):
+    def _get_media_files(self, xml_doc, media_path):
+        """
+        Return the `(filename, download_url, path)` of the media files listed
+        in `xml_doc` which are not in `media_path` yet
+        """
+        media_files = []
         for media_node in xml_doc.getElementsByTagName('mediaFile'):
             filename_node = media_node.getElementsByTagName('filename')
             url_node = media_node.getElementsByTagName('downloadUrl')
@@ -195,13 +242,26 @@ class BriefcaseClient:
                 if default_storage.exists(path):
                     continue
                 download_url = url_node[0].childNodes[0].nodeValue
-                if self._get_media_response(download_url):
-                    download_res = self._current_response
-                    media_content = ContentFile(download_res.content)
-                    default_storage.save(path, media_content)
-                    self.logger.debug("Fetched %s." % filename)
-                else:
-                    self.logger.error("Failed to fetch %s." % filename)
+                media_files.append((filename, download_url, path))
+
+        return media_files
+
+    def _download_media_file(self, media_file):
+        filename, download_url, path = media_file
+        download_res = self._get_media_response(download_url)
+        if not download_res:
+            self.logger.error("Failed to fetch %s." % filename)
+            return False
+
+        default_storage.save(path, ContentFile(download_res.content))
+        self.logger.debug("Fetched %s." % filename)
+        return True
+
+    def download_media_files(self, xml_doc, media_path):
+        return all(self._map(
+            self._download_media_file,
+            self._get_media_files(xml_doc, media_path)
+        ))
 
     def get_instances_uuids(self, xml_doc):
         uuids = []
@@ -215,64 +275,116 @@ class BriefcaseClient:
 
         return uuids
 
-    def download_instances(self, form_id, cursor=0, num_entries=100):
-        self.logger.debug("Starting submissions download for %s" % form_id)
-        if not self._get_response(self.submission_list_url,
-                                  params={'formId': form_id,
-                                          'numEntries': num_entries,
-                                          'cursor': cursor}):
-            self.logger.error("Fetching %s formId: %s, cursor: %s" %
-                              (self.submission_list_url, form_id, cursor))
-            return
+    def _download_instance(self, form_id, path, uuid):
+        """
+        Download the submission `uuid` unless it is already in `path`.
+
+        Return the media files of the submission which still have to be
+        downloaded, or `None` if the submission could not be downloaded.
+        """
+        self.logger.debug("Fetching %s %s submission" % (uuid, form_id))
+        form_str = '%(formId)s[@version=null and @uiVersion=null]/'\
+            '%(formId)s[@key=%(instanceId)s]' % {
+                'formId': form_id,
+                'instanceId': uuid
+            }
+        media_path = os.path.join(path, uuid.replace(':', ''))
+        instance_path = os.path.join(media_path, 'submission.xml')
+        if not default_storage.exists(instance_path):
+            instance_res = self._get_response(self.download_submission_url,
+                                              params={'formId': form_str})
+            if not instance_res:
+                self.logger.error("Failed to fetch %s %s submission" %
+                                  (form_id, uuid))
+                return None
+            content = instance_res.content.strip()
+            default_storage.save(instance_path, ContentFile(content))
+        else:
+            with default_storage.open(instance_path) as instance_file:
+                content = instance_file.read()
 
-        response = self._current_response
-        self.logger.debug("Fetching %s formId: %s, cursor: %s" %
-                          (self.submission_list_url, form_id, cursor))
         try:
-            xml_doc = clean_and_parse_xml(response.content)
+            instance_doc = clean_and_parse_xml(content)
         except ExpatError:
-            return
+            return []
+
+        self.logger.debug("Fetched %s %s submission" % (form_id, uuid))
+        return self._get_media_files(instance_doc, media_path)
+
+    def _get_cursor_path(self, form_id):
+        return os.path.join(
+            self.forms_path, form_id, RESUMPTION_CURSOR_FILENAME)
+
+    def _read_cursor(self, form_id):
+        cursor_path = self._get_cursor_path(form_id)
+        if not default_storage.exists(cursor_path):
+            return 0
+
+        with default_storage.open(cursor_path) as cursor_file:
+            return cursor_file.read().decode('utf-8').strip() or 0
+
+    def _write_cursor(self, form_id, cursor):
+        cursor_path = self._get_cursor_path(form_id)
+        default_storage.delete(cursor_path)
+        default_storage.save(cursor_path, ContentFile(str(cursor).encode()))
+
+    def download_instances(self, form_id, cursor=None, num_entries=100):
+        """
+        Download the submissions of `form_id` and their media files, from
+        `cursor` or else from where the previous pull stopped.
 
-        instances = self.get_instances_uuids(xml_doc)
+        The saved cursor only moves past pages whose submissions and media
+        files have all been downloaded.
+        """
+        self.logger.debug("Starting submissions download for %s" % form_id)
+        if cursor is None:
+            cursor = self._read_cursor(form_id)
         path = os.path.join(self.forms_path, form_id, 'instances')
+        save_cursor = True
 
-        for uuid in instances:
-            self.logger.debug("Fetching %s %s submission" % (uuid, form_id))
-            form_str = '%(formId)s[@version=null and @uiVersion=null]/'\
-                '%(formId)s[@key=%(instanceId)s]' % {
-                    'formId': form_id,
-                    'instanceId': uuid
-                }
-            instance_path = os.path.join(path, uuid.replace(':', ''),
-                                         'submission.xml')
-            if not default_storage.exists(instance_path):
-                if self._get_response(self.download_submission_url,
-                                      params={'formId': form_str}):
-                    instance_res = self._current_response
-                    content = instance_res.content.strip()
-                    default_storage.save(instance_path, ContentFile(content))
-                else:
-                    continue
-            else:
-                instance_res = default_storage.open(instance_path)
-                content = instance_res.read()
+        while True:
+            self.logger.debug("Fetching %s formId: %s, cursor: %s" %
+                              (self.submission_list_url, form_id, cursor))
+            response = self._get_response(self.submission_list_url,
+                                          params={'formId': form_id,
+                                                  'numEntries': num_entries,
+                                                  'cursor': cursor})
+            if not response:
+                self.logger.error("Fetching %s formId: %s, cursor: %s" %
+                                  (self.submission_list_url, form_id, cursor))
+                return
 
             try:
-                instance_doc = clean_and_parse_xml(content)
+                xml_doc = clean_and_parse_xml(response.content)
             except ExpatError:
-                continue
+                return
 
-            media_path = os.path.join(path, uuid.replace(':', ''))
-            self.download_media_files(instance_doc, media_path)
-            self.logger.debug("Fetched %s %s submission" % (form_id, uuid))
+            instances = self._map(
+                partial(self._download_instance, form_id, path),
+                self.get_instances_uuids(xml_doc)
+            )
+            media_files = [
+                media_file
+                for instance_media_files in instances
+                if instance_media_files
+                for media_file in instance_media_files
+            ]
+            downloaded = self._map(self._download_media_file, media_files)
+            if None in instances or not all(downloaded):
+                # Retry the failed downloads from this page on the next pull
+                save_cursor = False
+
+            rs_nodes = xml_doc.getElementsByTagName('resumptionCursor')
+            if not rs_nodes or not rs_nodes[0].childNodes:
+                return
 
-        if xml_doc.getElementsByTagName('resumptionCursor'):
-            rs_node = xml_doc.getElementsByTagName('resumptionCursor')[0]
-            cursor = rs_node.childNodes[0].nodeValue
+            next_cursor = rs_nodes[0].childNodes[0].nodeValue
+            if next_cursor == str(cursor):
+                return
 
-            if self.resumption_cursor != cursor:
-                self.resumption_cursor = cursor
-                self.download_instances(form_id, cursor)
+            if save_cursor:
+                self._write_cursor(form_id, next_cursor)
+            self.resumption_cursor = cursor = next_cursor
 
     def _upload_xform(self, path, file_name):
         class PublishXForm:
@@ -310,31 +422,29 @@ class BriefcaseClient:
 
         create_instance(self.user.username, new_xml_file, attachments)
 
-    def _upload_instances(self, path):
-        instances_count = 0
-        dirs, not_in_use = default_storage.listdir(path)
+    def _upload_instance_dir(self, path, instance_dir):
+        instance_dir_path = os.path.join(path, instance_dir)
+        i_dirs, files = default_storage.listdir(instance_dir_path)
 
-        for instance_dir in dirs:
-            instance_dir_path = os.path.join(path, instance_dir)
-            i_dirs, files = default_storage.listdir(instance_dir_path)
-            xml_file = None
+        if 'submission.xml' not in files:
+            return False
 
-            if 'submission.xml' in files:
-                file_obj = default_storage.open(
-                    os.path.join(instance_dir_path, 'submission.xml'))
-                xml_file = file_obj
+        with default_storage.open(
+                os.path.join(instance_dir_path, 'submission.xml')) as xml_file:
+            try:
+                self._upload_instance(xml_file, instance_dir_path, files)
+            except Exception:
+                return False
 
-            if xml_file:
-                try:
-                    self._upload_instance(xml_file, instance_dir_path, files)
-                except ExpatError:
-                    continue
-                except Exception:
-                    pass
-                else:
-                    instances_count += 1
+        return True
+
+    def _upload_instances(self, path):
+        dirs, not_in_use = default_storage.listdir(path)
 
-        return instances_count
+        return sum(self._map(
+            partial(self._upload_instance_dir, path), dirs,
+            close_connection=True
+        ))
 
     def push(self):
         dirs, files = default_storage.listdir(self.forms_path)
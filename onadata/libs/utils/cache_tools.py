@@ -0,0 +1,41 @@
+# coding: utf-8
+import logging
+
+from django.core.cache import cache
+
+
+def increment_counter(key):
+    """
+    Increment the counter stored in the cache as `key`, which never expires,
+    and return its new value
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+        return 1
+
+
+def log_cache_lookup(name, hit, log_every=1):
+    """
+    Count hits and misses of the `name` cache, and log its hit ratio every
+    `log_every` lookups.
+
+    Counters are stored in the cache as `<name>_cache_hits` and
+    `<name>_cache_misses`.
+    """
+    hits_key = f'{name}_cache_hits'
+    misses_key = f'{name}_cache_misses'
+    count = increment_counter(hits_key if hit else misses_key)
+    if count % log_every:
+        return
+
+    counters = cache.get_many([hits_key, misses_key])
+    hits = counters.get(hits_key, 0)
+    misses = counters.get(misses_key, 0)
+    total = hits + misses
+    ratio = hits / total * 100 if total else 0
+    logging.info(
+        f'{name.capitalize()} cache {"hit" if hit else "miss"} '
+        f'(hit ratio: {ratio:.2f}%, {hits} hits, {misses} misses)'
+    )
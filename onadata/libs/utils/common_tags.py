@@ -36,6 +36,8 @@ SUBMISSION_TIME = '_submission_time'
 DELETEDAT = "_deleted_at"  # no longer used but may persist in old submissions
 SUBMITTED_BY = "_submitted_by"
 VALIDATION_STATUS = "_validation_status"
+# hash of the submission XML, to detect stale documents; not returned by the API
+XML_HASH = "_xml_hash"
 
 INSTANCE_ID = "instanceID"
 META_INSTANCE_ID = "meta/instanceID"
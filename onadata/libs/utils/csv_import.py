@@ -1,15 +1,62 @@
 # coding: utf-8
 import io
 import json
+import re
+import time
 import uuid
 from datetime import datetime
-from typing import TextIO, Union
+from typing import Callable, Optional, TextIO, Union
+from xml.parsers.expat import ExpatError
 
+import dateutil.parser
 import unicodecsv as ucsv
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext as t
+from kobo_service_account.utils import get_real_user
 
-from onadata.apps.logger.models import Instance
-from onadata.libs.utils.logger_tools import dict2xml, safe_create_instance
+from onadata.apps.logger.exceptions import (
+    FormInactiveError,
+    TemporarilyUnavailableError,
+)
+from onadata.apps.logger.models import Instance, SurveyType, XForm
+from onadata.apps.logger.models.instance import (
+    InstanceHistory,
+    update_xform_counters_in_bulk,
+)
+from onadata.apps.logger.signals import pre_delete_attachment
+from onadata.apps.logger.xform_instance_parser import (
+    InstanceMultipleNodeError,
+    XFormInstanceParser,
+)
+from onadata.apps.restservice.models import RestService
+from onadata.apps.restservice.utils import call_service
+from onadata.apps.viewer.models.parsed_instance import ParsedInstance
+from onadata.libs.utils.common_tags import HOOK_EVENT
+from onadata.libs.utils.logger_tools import (
+    check_submission_permissions,
+    dict2xml,
+    get_soft_deleted_attachments,
+)
+from onadata.libs.utils.mongo_sync import sync_instances_to_mongo
+
+BULK_BATCH_SIZE = 500
+
+PHASE_VALIDATE = 'validate'
+PHASE_SAVE = 'save'
+PHASE_MONGO = 'mongo'
+
+# Columns of these groups are always accepted, whatever the form
+METADATA_GROUPS = ('formhub', 'meta')
+SELECTED_VALUES = ('true', '1', 'yes')
+
+repeat_index_regex = re.compile(r'^(?P<name>[^\[\]]+)\[(?P<index>\d+)\]$')
 
 
 def get_submission_meta_dict(xform, instance_id):
@@ -25,35 +72,32 @@ def get_submission_meta_dict(xform, instance_id):
     :return: The metadata dict
     :rtype:  dict
     """
-    uuid_arg = 'uuid:{}'.format(uuid.uuid4())
-    meta = {'instanceID': uuid_arg}
+    is_edit = xform.instances.filter(uuid=instance_id).exists()
+    return [_get_meta(instance_id, is_edit), int(is_edit)]
 
-    update = 0
 
-    if xform.instances.filter(uuid=instance_id).count() > 0:
-        uuid_arg = 'uuid:{}'.format(uuid.uuid4())
-        meta.update({'instanceID': uuid_arg,
-                     'deprecatedID': 'uuid:{}'.format(instance_id)})
-        update += 1
-    return [meta, update]
-
-
-def dict2xmlsubmission(submission_dict, xform, instance_id, submission_date):
+def dict2xmlsubmission(
+    submission_dict, xform, instance_id, submission_date, root_name=None
+):
     """Creates and xml submission from an appropriate dict (& other data)
 
     :param dict submission_dict: A dict containing form submission data.
     :param onadata.apps.logger.models.XForm xfrom: The submission's XForm.
     :param string instance_id: The submission/instance `uuid`.
     :param string submission_date: An isoformatted datetime string.
+    :param string root_name: The name of the root node of the form, read
+        from `xform` if not given.
 
     :return: An xml submission string
     :rtype: string
     """
+    if root_name is None:
+        root_name = json.loads(xform.json).get('name', xform.id_string)
     return ('<?xml version="1.0" ?>'
             '<{0} id="{1}" instanceID="uuid:{2}" submissionDate="{3}" '
             'xmlns="http://opendatakit.org/submissions">{4}'
             '</{0}>'.format(
-                json.loads(xform.json).get('name', xform.id_string),
+                root_name,
                 xform.id_string, instance_id, submission_date,
                 dict2xml(submission_dict).replace('\n', '')))
 
@@ -66,8 +110,8 @@ def submit_csv(
     """ Imports CSV data to an existing form
 
     Takes a csv formatted file or string containing rows of submission/instance
-    and converts those to xml submissions and finally submits them by calling
-    :py:func:`onadata.libs.utils.logger_tools.safe_create_instance`
+    and imports them with
+    :py:func:`onadata.libs.utils.csv_import.import_csv`
 
     """
     if isinstance(csv_file, str):
@@ -77,55 +121,518 @@ def submit_csv(
                           'Expected file or String '
                           'got {} instead.'.format(type(csv_file).__name__))}
 
+    try:
+        check_submission_permissions(request, xform)
+    except PermissionDenied as e:
+        return {'error': str(e)}
+
+    return import_csv(xform, csv_file, _get_submitted_by(request))
+
+
+def submit_csv_async(
+    request: 'django.http.HttpRequest',
+    xform: 'onadata.apps.logger.models.XForm',
+    csv_file: 'django.core.files.uploadedfile.UploadedFile',
+) -> dict:
+    """
+    Store `csv_file` and import it with a Celery task, whose progress can be
+    read with :py:func:`get_csv_import_status`
+
+    :return: The id of the task, or an error
+    :rtype: dict
+    """
+    # Avoid circular import
+    from onadata.apps.logger.tasks import import_csv_async
+
+    try:
+        check_submission_permissions(request, xform)
+    except PermissionDenied as e:
+        return {'error': str(e)}
+
+    submitted_by = _get_submitted_by(request)
+    file_path = default_storage.save(
+        f'{xform.user.username}/csv_imports/{uuid.uuid4().hex}.csv',
+        File(csv_file),
+    )
+    task_id = uuid.uuid4().hex
+    _set_csv_import_status(xform.pk, task_id, {'complete': False})
+    import_csv_async.apply_async(
+        (xform.pk, file_path, submitted_by.pk if submitted_by else None),
+        task_id=task_id,
+    )
+    return {'task_id': task_id}
+
+
+def import_csv_from_storage(
+    xform_id: int, file_path: str, submitted_by_id: Optional[int], task_id: str
+) -> dict:
+    """
+    Import the CSV file stored at `file_path` by
+    :py:func:`submit_csv_async`, saving the progress and then the result of
+    the import as the status of `task_id`, and delete the file.
+
+    If the import raises, e.g. when the task reaches its time limit, the
+    status is completed with the error before the exception is re-raised, so
+    that clients stop polling it.
+    """
+    last_saved = 0
+
+    def progress(phase, processed, total):
+        nonlocal last_saved
+        # Only write to the cache once per second
+        if time.time() - last_saved < 1 and processed < total:
+            return
+        last_saved = time.time()
+        _set_csv_import_status(xform_id, task_id, {
+            'complete': False,
+            'phase': phase,
+            'processed': processed,
+            'total': total,
+        })
+
+    try:
+        xform = XForm.objects.select_related('user').get(pk=xform_id)
+        submitted_by = (
+            User.objects.get(pk=submitted_by_id) if submitted_by_id else None
+        )
+        with default_storage.open(file_path, 'rb') as csv_file:
+            with transaction.atomic():
+                result = import_csv(xform, csv_file, submitted_by, progress)
+    except Exception as e:
+        _set_csv_import_status(xform_id, task_id, {
+            'complete': True,
+            'result': {'error': t('CSV import failed: {}').format(
+                str(e) or type(e).__name__
+            )},
+        })
+        raise
+    finally:
+        default_storage.delete(file_path)
+
+    _set_csv_import_status(
+        xform_id, task_id, {'complete': True, 'result': result}
+    )
+    return result
+
+
+def get_csv_import_status(xform_id: int, task_id: str) -> Optional[dict]:
+    """
+    Return the status of the asynchronous CSV import `task_id` of the form
+    `xform_id`, or `None` if it is unknown
+    """
+    return cache.get(_get_csv_import_status_key(xform_id, task_id))
+
+
+def import_csv(
+    xform: 'onadata.apps.logger.models.XForm',
+    csv_file: TextIO,
+    submitted_by: Optional[User] = None,
+    progress: Optional[Callable[[str, int, int], None]] = None,
+) -> dict:
+    """
+    Import the rows of `csv_file` as submissions of `xform`.
+
+    All the rows are validated against the form before anything is written:
+    an invalid row aborts the whole import. Rows whose `_uuid` is the one of
+    an existing submission edit it.
+
+    New submissions are then inserted with `bulk_create` and the submission
+    counters updated once. MongoDB is written in bulk, and REST services
+    called, once the transaction is committed.
+
+    :param progress: Called with the phase, the number of processed rows and
+        the total number of rows
+    :return: The number of added and updated submissions, or an error
+    :rtype: dict
+    """
+    try:
+        Instance(xform=xform).check_active(force=False)
+    except FormInactiveError:
+        return {'error': t('Form is not active')}
+    except TemporarilyUnavailableError:
+        return {'error': t('Temporarily unavailable')}
+
     csv_reader = ucsv.DictReader(csv_file)
-    rollback_uuids = []
-    submission_time = datetime.utcnow().isoformat()
-    ona_uuid = {'formhub': {'uuid': xform.uuid}}
-    error = None
-    additions = inserts = 0
-    for row in csv_reader:
-        # fetch submission uuid before purging row metadata
+    rows = list(csv_reader)
+    total = len(rows)
+    data_dictionary = xform.data_dictionary()
+    try:
+        columns = _get_columns(csv_reader.fieldnames or [], data_dictionary)
+    except ValueError as e:
+        return {'error': str(e)}
+
+    row_uuids = [row.get('_uuid') for row in rows if row.get('_uuid')]
+    existing_instances = {
+        instance.uuid: instance
+        for instance in xform.instances.filter(
+            uuid__in=row_uuids
+        ).select_related('user')
+    }
+    if existing_instances and not _can_edit(submitted_by, xform):
+        return {'error': t(
+            'Forbidden attempt to edit a submission. To make a new '
+            'submission, remove `_uuid` from the CSV file and try again.'
+        )}
+
+    root_name = json.loads(xform.json).get('name', xform.id_string)
+    geo_xpaths = data_dictionary.geopoint_xpaths()
+    now = timezone.now()
+    default_submission_date = datetime.utcnow().isoformat()
+    seen_uuids = set()
+    new_instances = []
+    edited_instances = []
+    histories = []
+
+    for row_number, row in enumerate(rows, start=2):
+        # `row_number` is the line of the row in the file, after the headers
         row_uuid = row.get('_uuid')
-        submission_date = row.get('_submission_time', submission_time)
-
-        row_iter = dict(row)
-        for key in row_iter:  # seems faster than a comprehension
-            # remove metadata (keys starting with '_')
-            if key.startswith('_'):
-                del row[key]
-            # process nested data e.g x[formhub/uuid] => x[formhub][uuid]
-            if r'/' in key:
-                p, c = key.split('/')
-                row[p] = {c: row[key]}
-                del row[key]
-
-        # inject our form's uuid into the submission
-        row.update(ona_uuid)
-
-        old_meta = row.get('meta', {})
-        new_meta, update = get_submission_meta_dict(xform, row_uuid)
-        inserts += update
-        old_meta.update(new_meta)
-        row.update({'meta': old_meta})
-
-        row_uuid = row.get('meta').get('instanceID')
-        rollback_uuids.append(row_uuid.replace('uuid:', ''))
-
-        xml_file = io.StringIO(
-            dict2xmlsubmission(row, xform, row_uuid, submission_date))
+        if row_uuid:
+            if row_uuid in seen_uuids:
+                return {'error': t(
+                    'Row {}: duplicate `_uuid` {}'
+                ).format(row_number, row_uuid)}
+            seen_uuids.add(row_uuid)
 
+        submission_date = row.get('_submission_time') or \
+            default_submission_date
         try:
-            error, instance = safe_create_instance(
-                request.user.username, xml_file, [], xform.uuid, request
+            date_created = dateutil.parser.parse(submission_date)
+        except (ValueError, OverflowError):
+            return {'error': t(
+                'Row {}: invalid `_submission_time` {}'
+            ).format(row_number, submission_date)}
+        if not timezone.is_aware(date_created):
+            date_created = timezone.make_aware(date_created, timezone.utc)
+
+        existing_instance = existing_instances.get(row_uuid)
+        data = _get_submission_dict(row, columns)
+        data['formhub'] = {'uuid': xform.uuid}
+        meta = data.get('meta')
+        if not isinstance(meta, dict):
+            meta = data['meta'] = {}
+        meta.update(_get_meta(row_uuid, existing_instance is not None))
+        new_uuid = meta['instanceID'].replace('uuid:', '')
+
+        xml = dict2xmlsubmission(
+            data, xform, new_uuid, submission_date, root_name=root_name
+        )
+        try:
+            parser = XFormInstanceParser(xml, data_dictionary)
+        except (ExpatError, InstanceMultipleNodeError, ValueError) as e:
+            return {'error': t('Row {}: {}').format(row_number, e)}
+
+        if existing_instance is None:
+            instance = Instance(
+                xform=xform,
+                user=submitted_by,
+                status='submitted_via_web',
+                validation_status={},
             )
-        except ValueError as e:
-            error = e
+            new_instances.append(instance)
+        else:
+            instance = existing_instance
+            histories.append(InstanceHistory(
+                xml=instance.xml, xform_instance=instance, uuid=row_uuid
+            ))
+            instance.date_modified = now
+            edited_instances.append(instance)
+
+        instance._parser = parser
+        instance.xml = xml
+        instance.uuid = new_uuid
+        instance.date_created = date_created
+        instance._populate_xml_hash()
+        instance._set_geom(geo_xpaths)
+        instance._set_json()
+
+        if progress:
+            progress(PHASE_VALIDATE, row_number - 1, total)
+
+    if not rows:
+        return {'additions': 0, 'updates': 0}
+
+    survey_type, _ = SurveyType.objects.get_or_create(
+        slug=(new_instances or edited_instances)[0].get_root_node_name()
+    )
+    for instance in new_instances:
+        instance.survey_type = survey_type
+
+    with transaction.atomic():
+        save_new_instances(xform, new_instances, progress, total)
+        _save_edited_instances(edited_instances, histories)
+
+    instance_ids = [instance.pk for instance in new_instances]
+    edited_instance_ids = [instance.pk for instance in edited_instances]
+    transaction.on_commit(
+        lambda: sync_imported_instances(
+            xform, instance_ids, edited_instance_ids, progress
+        )
+    )
+
+    return {
+        'additions': len(new_instances),
+        'updates': len(edited_instances),
+    }
+
+
+def _can_edit(user, xform):
+    if user is None:
+        return False
+    return user.is_superuser or user.has_perm('logger.change_xform', xform)
 
-        if error:
-            Instance.objects.filter(uuid__in=rollback_uuids,
-                                    xform=xform).delete()
-            return {'error': str(error)}
+
+def _get_columns(headers, data_dictionary):
+    """
+    Return the columns of the CSV file holding the data of the submissions,
+    as a list of `(header, path, option)`, where `path` is the list of the
+    names, with their repeat index, of the XML nodes of the column, and
+    `option` the choice of a "select multiple" question the column holds.
+
+    Metadata columns (starting with "_") are skipped, as are the choice
+    columns of "select multiple" questions whose own column is in the file:
+    exports have both, and the question column already holds all the
+    selected choices.
+
+    :raises ValueError: if a column does not match any question of the form
+    """
+    known_xpaths = set()
+    select_multiple_xpaths = set()
+    for element in data_dictionary.get_survey_elements():
+        xpath = element.get_abbreviated_xpath()
+        known_xpaths.add(xpath)
+        if element.bind.get('type') == 'select':
+            select_multiple_xpaths.add(xpath)
+
+    columns = []
+    unknown_headers = []
+    header_set = set(headers)
+    for header in headers:
+        names = header.split('/')
+        if header.startswith('_') or names[-1].startswith('_'):
+            # Metadata, e.g. `_uuid` or `group/_geopoint_latitude`
+            continue
+
+        path = [_parse_node_name(name) for name in names]
+        xpath = '/'.join(name for name, index in path)
+        parent_xpath = xpath.rpartition('/')[0]
+        if parent_xpath in select_multiple_xpaths:
+            if header.rpartition('/')[0] not in header_set:
+                columns.append((header, path[:-1], path[-1][0]))
+        elif xpath in known_xpaths or names[0] in METADATA_GROUPS:
+            columns.append((header, path, None))
+        else:
+            unknown_headers.append(header)
+
+    if unknown_headers:
+        raise ValueError(t(
+            'Columns not found in the form: {}'
+        ).format(', '.join(unknown_headers)))
+
+    return columns
+
+
+def _get_meta(instance_id, is_edit):
+    meta = {'instanceID': 'uuid:{}'.format(uuid.uuid4())}
+    if is_edit:
+        meta['deprecatedID'] = 'uuid:{}'.format(instance_id)
+    return meta
+
+
+def _get_submission_dict(row, columns):
+    """
+    Build the nested dict of the XML nodes of the submission held by `row`,
+    e.g. the value of the column `group/subgroup/question` is
+    `submission['group']['subgroup']['question']`
+    """
+    submission = {}
+    for header, path, option in columns:
+        value = row[header]
+        node = submission
+        for name, index in path[:-1]:
+            node = _get_child_node(node, name, index)
+        name, index = path[-1]
+
+        if option is not None:
+            # The selected choices of "select multiple" questions are
+            # exported in a column per choice
+            selected = node.get(name)
+            if selected is None:
+                selected = node[name] = ''
+            if (
+                str(value).strip().lower() in SELECTED_VALUES
+                and option not in selected.split()
+            ):
+                node[name] = f'{selected} {option}'.strip()
+            continue
+
+        if index is None:
+            node[name] = value
         else:
-            additions += 1
+            values = node.setdefault(name, [])
+            values.extend([''] * (index - len(values)))
+            values[index - 1] = value
+
+    return _remove_empty_repeats(submission)
+
+
+def _get_child_node(node, name, index):
+    if index is None:
+        child = node.get(name)
+        if not isinstance(child, dict):
+            child = node[name] = {}
+        return child
+
+    children = node.setdefault(name, [])
+    while len(children) < index:
+        children.append({})
+    return children[index - 1]
+
+
+def _get_submitted_by(request):
+    if request and request.user.is_authenticated:
+        return get_real_user(request)
+    return None
+
+
+def _parse_node_name(name):
+    match = repeat_index_regex.match(name)
+    if match:
+        return match.group('name'), int(match.group('index'))
+    return name, None
+
+
+def _remove_empty_repeats(node):
+    """
+    Remove the repeat iterations without any value: exports have columns for
+    as many iterations as the submission with the most of them
+    """
+    for name, child in list(node.items()):
+        if isinstance(child, dict):
+            _remove_empty_repeats(child)
+        elif isinstance(child, list):
+            children = [
+                _remove_empty_repeats(item) if isinstance(item, dict) else item
+                for item in child
+            ]
+            node[name] = [item for item in children if _has_value(item)]
+    return node
+
+
+def _has_value(node):
+    if isinstance(node, dict):
+        return any(_has_value(child) for child in node.values())
+    if isinstance(node, list):
+        return any(_has_value(child) for child in node)
+    return node not in ('', None)
+
+
+def _save_edited_instances(instances, histories):
+    if not instances:
+        return
+
+    InstanceHistory.objects.bulk_create(histories, batch_size=BULK_BATCH_SIZE)
+    Instance.objects.bulk_update(
+        instances,
+        [
+            'xml',
+            'xml_hash',
+            'uuid',
+            'json',
+            'geom',
+            'date_created',
+            'date_modified',
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+
+    instances_by_id = {instance.pk: instance for instance in instances}
+    parsed_instances = list(
+        ParsedInstance.objects.filter(instance_id__in=instances_by_id.keys())
+    )
+    for parsed_instance in parsed_instances:
+        parsed_instance.instance = instances_by_id[parsed_instance.instance_id]
+        parsed_instance._set_geopoint()
+    ParsedInstance.objects.bulk_update(
+        parsed_instances, ['lat', 'lng'], batch_size=BULK_BATCH_SIZE
+    )
+
+    # Hide the attachments the edited submissions do not refer to anymore
+    for instance in instances:
+        for attachment in get_soft_deleted_attachments(instance):
+            pre_delete_attachment(attachment, only_update_counters=True)
+
+
+def save_new_instances(xform, instances, progress=None, total=None):
+    """
+    Insert the new, unsaved `instances` of `xform` with `bulk_create`, with
+    their `ParsedInstance`s, and update the submission counters once
+    """
+    if not instances:
+        return
+
+    dates_created = [instance.date_created for instance in instances]
+    for start in range(0, len(instances), BULK_BATCH_SIZE):
+        Instance.objects.bulk_create(
+            instances[start:start + BULK_BATCH_SIZE]
+        )
+        if progress:
+            progress(
+                PHASE_SAVE, min(start + BULK_BATCH_SIZE, len(instances)), total
+            )
+
+    # `bulk_create()` sets `auto_now_add` fields to the current time, restore
+    # the submission times of the CSV file
+    for instance, date_created in zip(instances, dates_created):
+        instance.date_created = date_created
+    Instance.objects.bulk_update(
+        instances, ['date_created'], batch_size=BULK_BATCH_SIZE
+    )
+
+    parsed_instances = []
+    for instance in instances:
+        parsed_instance = ParsedInstance(instance=instance)
+        parsed_instance._set_geopoint()
+        parsed_instances.append(parsed_instance)
+    ParsedInstance.objects.bulk_create(
+        parsed_instances, batch_size=BULK_BATCH_SIZE
+    )
+
+    update_xform_counters_in_bulk(xform, dates_created)
+
+
+def _set_csv_import_status(xform_id, task_id, status):
+    cache.set(
+        _get_csv_import_status_key(xform_id, task_id),
+        status,
+        settings.CSV_IMPORT_STATUS_TIMEOUT,
+    )
+
 
-    return {'additions': additions - inserts, 'updates': inserts}
+def _get_csv_import_status_key(xform_id, task_id):
+    return f'csv_import_status_{xform_id}_{task_id}'
+
+
+def sync_imported_instances(
+    xform, instance_ids, edited_instance_ids, progress=None
+):
+    """
+    Write the documents of the imported submissions to MongoDB and call the
+    REST services of `xform`
+    """
+    all_ids = instance_ids + edited_instance_ids
+    sync_instances_to_mongo(Instance.objects.filter(pk__in=all_ids))
+    if progress:
+        progress(PHASE_MONGO, len(all_ids), len(all_ids))
+
+    if not RestService.objects.filter(xform=xform).exists():
+        return
+
+    parsed_instances = ParsedInstance.objects.filter(
+        instance_id__in=all_ids
+    ).select_related('instance__xform', 'instance__user')
+    edited_instance_ids = set(edited_instance_ids)
+    for parsed_instance in parsed_instances.iterator():
+        if parsed_instance.instance_id in edited_instance_ids:
+            call_service(parsed_instance, HOOK_EVENT['ON_EDIT'])
+        else:
+            call_service(parsed_instance, HOOK_EVENT['ON_SUBMIT'])
@@ -0,0 +1,160 @@
+# coding: utf-8
+import hashlib
+import json
+import logging
+import os
+import time
+
+from bson import json_util
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import Max
+from redis.exceptions import LockError
+
+from onadata.libs.utils.cache_tools import log_cache_lookup
+
+
+def normalize_query(query):
+    """
+    Return a canonical string representation of `query` so that equivalent
+    queries (e.g. same keys in a different order) share the same cache entry.
+    """
+    if not query:
+        return None
+
+    if isinstance(query, str):
+        try:
+            query = json.loads(query, object_hook=json_util.object_hook)
+        except ValueError:
+            return query
+
+    return json.dumps(
+        query, default=json_util.default, sort_keys=True, separators=(',', ':')
+    )
+
+
+def get_export_fingerprint(
+    xform,
+    export_type,
+    extension,
+    filter_query,
+    group_delimiter,
+    split_select_multiples,
+    binary_select_multiples,
+):
+    """
+    Build a fingerprint of everything that has an influence on the content of
+    an export. Any new, edited or deleted submission, as well as a new
+    version of the form, produces a different fingerprint.
+    """
+    submissions = xform.instances.aggregate(
+        last_submission_id=Max('pk'), last_modified=Max('date_modified')
+    )
+    last_modified = submissions['last_modified']
+    parts = {
+        'xform': xform.pk,
+        'export_type': export_type,
+        'extension': extension,
+        'query': normalize_query(filter_query),
+        'group_delimiter': group_delimiter,
+        'split_select_multiples': bool(split_select_multiples),
+        'binary_select_multiples': bool(binary_select_multiples),
+        'last_submission_id': submissions['last_submission_id'],
+        'last_submission_modified': (
+            last_modified.isoformat() if last_modified else None
+        ),
+        'num_of_submissions': xform.num_of_submissions,
+        'form_version': xform.date_modified.isoformat(),
+    }
+    return hashlib.sha256(
+        json.dumps(parts, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def get_export_cache_file_path(
+    username, id_string, export_type, fingerprint, extension
+):
+    return os.path.join(
+        username,
+        'exports',
+        id_string,
+        export_type,
+        'cache',
+        f'{id_string}_{fingerprint[:16]}.{extension}',
+    )
+
+
+def get_cached_export(fingerprint):
+    """
+    Return the storage path of the export matching `fingerprint` if it has
+    been cached and the file still exists, `None` otherwise.
+    """
+    file_path = cache.get(_get_entry_key(fingerprint))
+    hit = bool(file_path) and default_storage.exists(file_path)
+    log_cache_lookup('export', hit)
+    return file_path if hit else None
+
+
+def store_export_in_cache(xform, fingerprint, file_path, size):
+    """
+    Register `file_path` as the cached export for `fingerprint`, then evict
+    expired entries and the oldest ones if the form exceeds
+    `EXPORT_CACHE_MAX_FILES_PER_FORM` files or
+    `EXPORT_CACHE_MAX_BYTES_PER_FORM` bytes. Evicted files are deleted from
+    storage.
+    """
+    timeout = settings.EXPORT_CACHE_TIMEOUT
+    index_key = f'export_cache_index_{xform.pk}'
+
+    try:
+        with cache.lock(
+            f'export_cache_lock_{xform.pk}', timeout=60, blocking_timeout=10
+        ):
+            now = time.time()
+            index = cache.get(index_key, [])
+            index.append({
+                'fingerprint': fingerprint,
+                'path': file_path,
+                'size': size,
+                'created': now,
+            })
+            index.sort(key=lambda entry: entry['created'], reverse=True)
+
+            kept = []
+            evicted = []
+            total_size = 0
+            for entry in index:
+                is_newest = not kept
+                if not is_newest and (
+                    now - entry['created'] > timeout
+                    or len(kept) >= settings.EXPORT_CACHE_MAX_FILES_PER_FORM
+                    or total_size + entry['size']
+                    > settings.EXPORT_CACHE_MAX_BYTES_PER_FORM
+                ):
+                    evicted.append(entry)
+                    continue
+                kept.append(entry)
+                total_size += entry['size']
+
+            for entry in evicted:
+                cache.delete(_get_entry_key(entry['fingerprint']))
+                # Another entry may share the file if the same fingerprint
+                # has been stored twice
+                if entry['path'] not in [e['path'] for e in kept]:
+                    default_storage.delete(entry['path'])
+
+            cache.set(_get_entry_key(fingerprint), file_path, timeout)
+            cache.set(index_key, kept, None)
+    except LockError:
+        # The export is still usable, it is just not cached
+        logging.warning(
+            f'Could not acquire export cache lock for XForm #{xform.pk}'
+        )
+        return False
+
+    return True
+
+
+def _get_entry_key(fingerprint):
+    return f'export_cache_{fingerprint}'
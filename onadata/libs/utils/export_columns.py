@@ -0,0 +1,152 @@
+# coding: utf-8
+import numpy as np
+import pandas as pd
+
+
+class BatchColumnSplitter:
+    """
+    Split select multiple and geopoint answers of a batch of records into one
+    column per choice and one column per geopoint component.
+
+    Answers are split with vectorized pandas string operations for the whole
+    batch at once instead of looping over each record and each choice.
+    Records are updated in place.
+    """
+
+    def __init__(
+        self,
+        select_multiples=None,
+        gps_fields=None,
+        binary_select_multiples=False,
+        answered_only=False,
+        remove_select_multiples=False,
+        strict_gps=False,
+    ):
+        """
+        :param dict select_multiples: Choice xpaths by select multiple xpath
+        :param dict gps_fields: Component xpaths by geopoint xpath
+        :param bool binary_select_multiples: Use 1/0 instead of True/False
+        :param bool answered_only: Only add choice columns to records which
+            contain the select multiple. Otherwise, all records get them, set
+            to `None` (or 0 if binary) when nothing is selected.
+        :param bool remove_select_multiples: Remove the select multiple
+            answer from records once it has been split
+        :param bool strict_gps: Only split geopoints with all of their 4
+            components, otherwise components are set to `None`. Incomplete
+            geopoints are split as far as they go if `False`.
+        """
+        self.select_multiples = select_multiples or {}
+        self.gps_fields = gps_fields or {}
+        self.binary_select_multiples = binary_select_multiples
+        self.answered_only = answered_only
+        self.remove_select_multiples = remove_select_multiples
+        self.strict_gps = strict_gps
+
+    def split(self, records):
+        if not records:
+            return records
+
+        for xpath, choices in self.select_multiples.items():
+            self._split_select_multiple(records, xpath, choices)
+
+        for xpath, components in self.gps_fields.items():
+            self._split_gps(records, xpath, components)
+
+        return records
+
+    @staticmethod
+    def _get_answers(records, xpath):
+        """
+        Return a `Series` of the string answers for `xpath`, and a mask of the
+        records which contain `xpath`.
+        """
+        values = [record.get(xpath) for record in records]
+        answers = pd.Series(
+            [value if isinstance(value, str) else None for value in values],
+            dtype=object,
+        )
+        present = np.fromiter(
+            (xpath in record for record in records), dtype=bool,
+            count=len(records)
+        )
+        return answers, present
+
+    def _split_select_multiple(self, records, xpath, choices):
+        answers, present = self._get_answers(records, xpath)
+        if self.answered_only:
+            if not present.any():
+                return
+            rows = np.flatnonzero(present)
+        else:
+            rows = range(len(records))
+
+        # Normalize whitespace before splitting on single spaces
+        selections = answers.str.split().str.join(' ').str.get_dummies(
+            sep=' '
+        )
+        has_selections = selections.sum(axis=1) > 0
+        prefix_length = len(xpath) + 1
+
+        for choice in choices:
+            name = choice[prefix_length:]
+            if name in selections.columns:
+                selected = selections[name] > 0
+            else:
+                selected = pd.Series(False, index=answers.index)
+
+            if self.binary_select_multiples:
+                values = selected.astype(int).tolist()
+            elif self.answered_only:
+                values = selected.tolist()
+            else:
+                values = selected.astype(object).where(
+                    has_selections, None
+                ).tolist()
+
+            for row in rows:
+                records[row][choice] = values[row]
+
+        if self.remove_select_multiples:
+            for row in np.flatnonzero(present):
+                del records[row][xpath]
+
+    def _split_gps(self, records, xpath, components):
+        answers, _ = self._get_answers(records, xpath)
+        parts = answers.str.split(expand=True)
+        parts_count = answers.str.split().str.len()
+
+        if self.strict_gps:
+            rows = np.flatnonzero(parts_count.notna())
+            complete = (parts_count == len(components)).tolist()
+            for index, component in enumerate(components):
+                if index in parts.columns:
+                    values = parts[index].tolist()
+                else:
+                    values = [None] * len(records)
+                for row in rows:
+                    records[row][component] = (
+                        values[row] if complete[row] else None
+                    )
+        else:
+            for index, component in enumerate(components):
+                if index not in parts.columns:
+                    break
+                values = parts[index].tolist()
+                for row in np.flatnonzero(parts_count > index):
+                    records[row][component] = values[row]
+
+
+def collect_nested_records(records):
+    """
+    Return `records` along with the records of all their repeat groups, at
+    any depth.
+    """
+    collected = []
+    pending = list(records)
+    while pending:
+        record = pending.pop()
+        collected.append(record)
+        for value in record.values():
+            if isinstance(value, list):
+                pending.extend(item for item in value if isinstance(item, dict))
+    return collected
@@ -0,0 +1,152 @@
+# coding: utf-8
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+from onadata.apps.viewer.models.export import Export
+from onadata.libs.exceptions import ExportCancelledError
+
+PHASE_QUERY = 'query'
+PHASE_FORMAT = 'format'
+PHASE_WRITE = 'write'
+PHASE_UPLOAD = 'upload'
+
+
+class ExportProgress:
+    """
+    Keep track of the progress of an asynchronous export in the cache, keyed
+    by export id, so that it can be reported while the export is running.
+
+    The cancellation flag is read at each checkpoint, i.e. when the phase
+    changes and when the progress is saved, and `ExportCancelledError` is
+    raised once the export has been cancelled.
+
+    Nothing is tracked for exports without an id, e.g. exports generated
+    synchronously by the API.
+    """
+
+    # minimum delay (in seconds) between two writes to the cache
+    SAVE_INTERVAL = 1
+
+    def __init__(self, export_id):
+        self.export_id = export_id
+        self.phase = None
+        self.processed = 0
+        self.total = None
+        self._started = None
+        self._saved = 0
+
+    @classmethod
+    def get(cls, export_id):
+        """
+        Return the progress of the export as a dict, or `None` if it has not
+        been reported (yet).
+        """
+        return cache.get(_get_progress_key(export_id))
+
+    @classmethod
+    def cancel(cls, export_id):
+        cache.set(
+            _get_cancel_key(export_id), True, settings.EXPORT_PROGRESS_TIMEOUT
+        )
+
+    @classmethod
+    def is_cancelled(cls, export_id):
+        return bool(cache.get(_get_cancel_key(export_id)))
+
+    def set_phase(self, phase, total=None):
+        if not self.export_id:
+            return
+
+        self.phase = phase
+        if total is not None:
+            self.total = total
+            self.processed = 0
+            self._started = time.time()
+        self._save()
+
+    def advance(self, count):
+        """
+        Add `count` processed records. The cache is updated at most every
+        `SAVE_INTERVAL` seconds.
+        """
+        if not self.export_id:
+            return
+
+        self.processed += count
+        if time.time() - self._saved >= self.SAVE_INTERVAL:
+            self._save()
+
+    def clear(self):
+        if self.export_id:
+            cache.delete(_get_progress_key(self.export_id))
+
+    def _get_eta(self):
+        """
+        Estimate the number of seconds left to process all the records from
+        the rate records have been processed at so far.
+        """
+        if not self.processed or not self.total or not self._started:
+            return None
+        remaining = max(self.total - self.processed, 0)
+        elapsed = time.time() - self._started
+        return round(elapsed / self.processed * remaining)
+
+    def _save(self):
+        if self.is_cancelled(self.export_id):
+            raise ExportCancelledError(
+                f'Export #{self.export_id} has been cancelled'
+            )
+
+        self._saved = time.time()
+        cache.set(
+            _get_progress_key(self.export_id),
+            {
+                'phase': self.phase,
+                'processed': self.processed,
+                'total': self.total,
+                'eta': self._get_eta(),
+            },
+            settings.EXPORT_PROGRESS_TIMEOUT,
+        )
+
+
+def get_export_status(export):
+    """
+    Return the status of `export` as polled by users while it is generated
+    """
+    status = {
+        'complete': False,
+        'url': None,
+        'filename': None,
+        'export_id': export.id,
+        'progress': None,
+        'cancelled': ExportProgress.is_cancelled(export.id),
+    }
+
+    if export.status == Export.SUCCESSFUL:
+        status['url'] = reverse('export_download', kwargs={
+            'username': export.xform.user.username,
+            'id_string': export.xform.id_string,
+            'export_type': export.export_type,
+            'filename': export.filename
+        })
+        status['filename'] = export.filename
+
+    # mark as complete if it either failed or succeeded but NOT pending
+    if export.status in [Export.SUCCESSFUL, Export.FAILED]:
+        status['complete'] = True
+    else:
+        status['progress'] = ExportProgress.get(export.id)
+
+    return status
+
+
+def _get_progress_key(export_id):
+    return f'export_progress_{export_id}'
+
+
+def _get_cancel_key(export_id):
+    return f'export_cancelled_{export_id}'
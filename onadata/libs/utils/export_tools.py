@@ -2,7 +2,9 @@
 import json
 import os
 import re
+import zipfile
 from datetime import datetime, date, time, timedelta
+from xml.sax.saxutils import escape as xml_escape
 
 from bson import json_util
 from django.conf import settings
@@ -10,8 +12,10 @@ from django.core.files.base import File
 from django.core.files.storage import FileSystemStorage
 from django.core.files.temp import NamedTemporaryFile
 from django.core.files.storage import default_storage
-from django.contrib.auth.models import User
-from django.shortcuts import render
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.geos import Polygon
+from django.db.models import F, FloatField, Func, Value
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.text import slugify
 from openpyxl.utils.datetime import to_excel, time_to_days, timedelta_to_days
 from openpyxl.workbook import Workbook
@@ -22,6 +26,22 @@ from pyxform.section import Section, RepeatingSection
 from onadata.apps.logger.models import Attachment, Instance, XForm
 from onadata.apps.viewer.models.export import Export
 from onadata.apps.api.mongo_helper import MongoHelper
+from onadata.libs.exceptions import ExportCancelledError
+from onadata.libs.utils.export_cache import (
+    get_cached_export,
+    get_export_cache_file_path,
+    get_export_fingerprint,
+    store_export_in_cache,
+)
+from onadata.libs.utils.export_columns import BatchColumnSplitter
+from onadata.libs.utils.hash import get_hash
+from onadata.libs.utils.export_progress import (
+    PHASE_FORMAT,
+    PHASE_QUERY,
+    PHASE_UPLOAD,
+    PHASE_WRITE,
+    ExportProgress,
+)
 from onadata.libs.utils.viewer_tools import create_attachments_zipfile
 from onadata.libs.utils.common_tags import (
     ID,
@@ -205,6 +225,10 @@ class ExportBuilder:
     }
 
     XLS_SHEET_NAME_MAX_CHARS = 31
+    # number of records processed at once
+    BATCH_SIZE = 1000
+    # progress of the export, not tracked unless replaced
+    progress = ExportProgress(None)
 
     @classmethod
     def string_to_date_with_xls_validation(cls, date_str):
@@ -344,35 +368,16 @@ class ExportBuilder:
     @classmethod
     def split_select_multiples(cls, row, select_multiples):
         # for each select_multiple, get the associated data and split it
-        for xpath, choices in select_multiples.items():
-            # get the data matching this xpath
-            data = row.get(xpath)
-            selections = []
-            if data:
-                selections = [
-                    '{0}/{1}'.format(
-                        xpath, selection) for selection in data.split()]
-            if not cls.BINARY_SELECT_MULTIPLES:
-                row.update(dict(
-                    [(choice, choice in selections if selections else None)
-                     for choice in choices]))
-            else:
-                YES = 1
-                NO = 0
-                row.update(dict(
-                    [(choice, YES if choice in selections else NO)
-                     for choice in choices]))
+        BatchColumnSplitter(
+            select_multiples=select_multiples,
+            binary_select_multiples=cls.BINARY_SELECT_MULTIPLES,
+        ).split([row])
         return row
 
     @classmethod
     def split_gps_components(cls, row, gps_fields):
         # for each gps_field, get associated data and split it
-        for xpath, gps_components in gps_fields.items():
-            data = row.get(xpath)
-            if data:
-                gps_parts = data.split()
-                if len(gps_parts) > 0:
-                    row.update(zip(gps_components, gps_parts))
+        BatchColumnSplitter(gps_fields=gps_fields).split([row])
         return row
 
     @classmethod
@@ -405,34 +410,47 @@ class ExportBuilder:
         """
         Split select multiples, gps and decode . and $
         """
+        return self.pre_process_rows([row], section)[0]
+
+    def pre_process_rows(self, rows, section):
+        """
+        Split select multiples, gps and decode . and $ for a batch of rows of
+        the same section
+        """
         section_name = section['name']
 
         # first decode fields so that subsequent lookups
         # have decoded field names
         if section_name in self.encoded_fields:
-            row = ExportBuilder.decode_mongo_encoded_fields(
-                row, self.encoded_fields[section_name])
-
-        if self.SPLIT_SELECT_MULTIPLES and\
-                section_name in self.select_multiples:
-            row = ExportBuilder.split_select_multiples(
-                row, self.select_multiples[section_name])
-
-        if section_name in self.gps_fields:
-            row = ExportBuilder.split_gps_components(
-                row, self.gps_fields[section_name])
+            rows = [
+                ExportBuilder.decode_mongo_encoded_fields(
+                    row, self.encoded_fields[section_name])
+                for row in rows
+            ]
+
+        select_multiples = {}
+        if self.SPLIT_SELECT_MULTIPLES:
+            select_multiples = self.select_multiples.get(section_name)
+        BatchColumnSplitter(
+            select_multiples=select_multiples,
+            gps_fields=self.gps_fields.get(section_name),
+            binary_select_multiples=self.BINARY_SELECT_MULTIPLES,
+        ).split(rows)
 
         # convert to native types
-        for elm in section['elements']:
-            # only convert if its in our list and its not empty, just to
-            # optimize
-            value = row.get(elm['xpath'])
-            if elm['type'] in ExportBuilder.TYPES_TO_CONVERT\
-                    and value is not None and value != '':
-                row[elm['xpath']] = ExportBuilder.convert_type(
-                    value, elm['type'])
-
-        return row
+        elements_to_convert = [
+            elm for elm in section['elements']
+            if elm['type'] in ExportBuilder.TYPES_TO_CONVERT
+        ]
+        for row in rows:
+            for elm in elements_to_convert:
+                # only convert if its not empty, just to optimize
+                value = row.get(elm['xpath'])
+                if value is not None and value != '':
+                    row[elm['xpath']] = ExportBuilder.convert_type(
+                        value, elm['type'])
+
+        return rows
 
     @classmethod
     def get_valid_sheet_name(cls, desired_name, existing_names):
@@ -456,7 +474,8 @@ class ExportBuilder:
             i += 1
         return generated_name
 
-    def to_xls_export(self, path, data, *args):
+    def to_xls_export(self, path, data, username=None, id_string=None,
+                      filter_query=None):
         def write_row(data, work_sheet, fields, work_sheet_titles):
             # update parent_table with the generated sheet's title
             data[PARENT_TABLE_NAME] = work_sheet_titles.get(
@@ -485,9 +504,37 @@ class ExportBuilder:
             ws = work_sheets[section_name]
             ws.append(headers)
 
+        def write_sections(outputs):
+            for section in self.sections:
+                # get data for this section and write to xls
+                section_name = section['name']
+                fields = [
+                    element['xpath'] for element in
+                    section['elements']] + self.EXTRA_FIELDS
+
+                ws = work_sheets[section_name]
+                # section might not exist within the output, e.g. data was
+                # not provided for said repeat - write test to check this
+                rows = []
+                for output in outputs:
+                    row = output.get(section_name, None)
+                    if type(row) == dict:
+                        rows.append(row)
+                    elif type(row) == list:
+                        rows.extend(row)
+                for row in self.pre_process_rows(rows, section):
+                    write_row(row, ws, fields, work_sheet_titles)
+
+        total = None
+        if self.progress.export_id and username:
+            total = count_mongo(username, id_string, filter_query)
+        self.progress.set_phase(PHASE_FORMAT, total=total)
+
         index = 1
         indices = {}
         survey_name = self.survey.name
+        # process rows by batch to split columns of many rows at once
+        outputs = []
         for d in data:
             joined_export = dict_to_joined_export(d, index, indices,
                                                   survey_name)
@@ -499,28 +546,18 @@ class ExportBuilder:
                 output[survey_name] = {}
             output[survey_name][INDEX] = index
             output[survey_name][PARENT_INDEX] = -1
-            for section in self.sections:
-                # get data for this section and write to xls
-                section_name = section['name']
-                fields = [
-                    element['xpath'] for element in
-                    section['elements']] + self.EXTRA_FIELDS
-
-                ws = work_sheets[section_name]
-                # section might not exist within the output, e.g. data was
-                # not provided for said repeat - write test to check this
-                row = output.get(section_name, None)
-                if type(row) == dict:
-                    write_row(
-                        self.pre_process_row(row, section),
-                        ws, fields, work_sheet_titles)
-                elif type(row) == list:
-                    for child_row in row:
-                        write_row(
-                            self.pre_process_row(child_row, section),
-                            ws, fields, work_sheet_titles)
+            outputs.append(output)
+            if len(outputs) == self.BATCH_SIZE:
+                write_sections(outputs)
+                self.progress.advance(len(outputs))
+                outputs = []
             index += 1
 
+        if outputs:
+            write_sections(outputs)
+            self.progress.advance(len(outputs))
+
+        self.progress.set_phase(PHASE_WRITE)
         wb.save(filename=path)
 
     def to_flat_csv_export(self, path, data, username, id_string, filter_query):
@@ -534,6 +571,7 @@ class ExportBuilder:
             self.GROUP_DELIMITER,
             self.SPLIT_SELECT_MULTIPLES,
             self.BINARY_SELECT_MULTIPLES,
+            progress=self.progress,
         )
         csv_builder.export_to(path)
 
@@ -558,6 +596,36 @@ def generate_export(export_type, extension, username, id_string,
     xform = XForm.objects.get(
         user__username__iexact=username, id_string__exact=id_string)
 
+    # Filtered exports requested through the API are not persisted as
+    # `Export` objects, so keep their files in a cache instead of
+    # regenerating them each time the same query comes in.
+    fingerprint = None
+    if (
+        settings.EXPORT_CACHE_ENABLED
+        and filter_query is not None
+        and export_id is None
+    ):
+        fingerprint = get_export_fingerprint(
+            xform,
+            export_type,
+            extension,
+            filter_query,
+            group_delimiter,
+            split_select_multiples,
+            binary_select_multiples,
+        )
+        cached_file_path = get_cached_export(fingerprint)
+        if cached_file_path:
+            export = Export(xform=xform, export_type=export_type)
+            export.filedir, export.filename = os.path.split(cached_file_path)
+            export.internal_status = Export.SUCCESSFUL
+            return export
+
+    # report the progress of asynchronous exports, which can be cancelled
+    # between two steps
+    progress = ExportProgress(export_id)
+    progress.set_phase(PHASE_QUERY)
+
     # query mongo for the cursor
     records = query_mongo(username, id_string, filter_query)
 
@@ -565,6 +633,7 @@ def generate_export(export_type, extension, username, id_string,
     export_builder.GROUP_DELIMITER = group_delimiter
     export_builder.SPLIT_SELECT_MULTIPLES = split_select_multiples
     export_builder.BINARY_SELECT_MULTIPLES = binary_select_multiples
+    export_builder.progress = progress
     export_builder.set_survey(xform.data_dictionary().survey)
 
     prefix = slugify('{}_export__{}__{}'.format(export_type, username, id_string))
@@ -572,33 +641,62 @@ def generate_export(export_type, extension, username, id_string,
 
     # get the export function by export type
     func = getattr(export_builder, export_type_func_map[export_type])
-    func.__call__(
-        temp_file.name, records, username, id_string, filter_query)
-
-    # generate filename
-    basename = "%s_%s" % (
-        id_string, datetime.now().strftime("%Y_%m_%d_%H_%M_%S"))
-    filename = basename + "." + extension
+    try:
+        func.__call__(
+            temp_file.name, records, username, id_string, filter_query)
+        progress.set_phase(PHASE_UPLOAD)
+    except ExportCancelledError:
+        # closing the temporary file deletes it
+        temp_file.close()
+        raise
+
+    if fingerprint:
+        file_path = get_export_cache_file_path(
+            username, id_string, export_type, fingerprint, extension
+        )
+    else:
+        # generate filename
+        basename = "%s_%s" % (
+            id_string, datetime.now().strftime("%Y_%m_%d_%H_%M_%S"))
+        filename = basename + "." + extension
 
-    # check filename is unique
-    while not Export.is_filename_unique(xform, filename):
-        filename = increment_index_in_filename(filename)
+        # check filename is unique
+        while not Export.is_filename_unique(xform, filename):
+            filename = increment_index_in_filename(filename)
 
-    file_path = os.path.join(
-        username,
-        'exports',
-        id_string,
-        export_type,
-        filename)
+        file_path = os.path.join(
+            username,
+            'exports',
+            id_string,
+            export_type,
+            filename)
+
+    # Point to the file of an identical export, if any, instead of storing
+    # the same content again. Cached exports are already deduplicated by
+    # fingerprint.
+    file_hash = None
+    export_filename = None
+    if not fingerprint:
+        file_hash = get_export_file_hash(temp_file)
+        export_filename = Export.get_filepath_by_hash(
+            xform, export_type, file_hash
+        )
 
-    # TODO: if s3 storage, make private - how will we protect local storage??
-    # seek to the beginning as required by storage classes
-    temp_file.seek(0)
-    export_filename = default_storage.save(
-        file_path,
-        File(temp_file, file_path))
+    if not export_filename:
+        # TODO: if s3 storage, make private - how will we protect local storage??
+        # seek to the beginning as required by storage classes
+        temp_file.seek(0)
+        export_filename = default_storage.save(
+            file_path,
+            File(temp_file, file_path))
+    export_size = os.path.getsize(temp_file.name)
     temp_file.close()
 
+    if fingerprint:
+        store_export_in_cache(
+            xform, fingerprint, export_filename, export_size
+        )
+
     dir_name, basename = os.path.split(export_filename)
 
     # get or create export object
@@ -608,19 +706,55 @@ def generate_export(export_type, extension, username, id_string,
         export = Export(xform=xform, export_type=export_type)
     export.filedir = dir_name
     export.filename = basename
+    export.file_hash = file_hash
     export.internal_status = Export.SUCCESSFUL
     # do not persist exports that have a filter
     if filter_query is None:
         export.save()
+    progress.clear()
     return export
 
 
-def query_mongo(username, id_string, query=None):
+def get_export_file_hash(export_file):
+    """
+    Return the hash of the content of `export_file`.
+
+    XLSX files embed the time they have been generated at, so only the
+    checksums of their parts, except the document properties, are hashed.
+    """
+    if not zipfile.is_zipfile(export_file):
+        return get_hash(export_file, algorithm='sha1', prefix=True)
+
+    with zipfile.ZipFile(export_file) as zip_file:
+        checksums = '\n'.join(
+            f'{info.filename}:{info.CRC}:{info.file_size}'
+            for info in sorted(zip_file.infolist(), key=lambda i: i.filename)
+            if info.filename != 'docProps/core.xml'
+        )
+    return get_hash(checksums.encode(), algorithm='sha1', prefix=True)
+
+
+def query_mongo(username, id_string, query=None, fields=None):
+    return xform_instances.find(
+        _get_mongo_query(username, id_string, query),
+        fields,
+        max_time_ms=settings.MONGO_DB_MAX_TIME_MS,
+    )
+
+
+def count_mongo(username, id_string, query=None):
+    return xform_instances.count_documents(
+        _get_mongo_query(username, id_string, query),
+        maxTimeMS=settings.MONGO_DB_MAX_TIME_MS,
+    )
+
+
+def _get_mongo_query(username, id_string, query=None):
     query = json.loads(query, object_hook=json_util.object_hook)\
         if query else {}
     query = MongoHelper.to_safe_dict(query)
     query[USERFORM_ID] = '{0}_{1}'.format(username, id_string)
-    return xform_instances.find(query, max_time_ms=settings.MONGO_DB_MAX_TIME_MS)
+    return query
 
 
 def should_create_new_export(xform, export_type):
@@ -699,6 +833,52 @@ def generate_attachments_zip_export(
     return export
 
 
+KML_HEADER = """<?xml version="1.0" encoding="utf-8"?>
+<kml xmlns="http://earth.google.com/kml/2.2">
+  <Document>
+    <name>{name}</name>
+    <Style id="sh_red-circle">
+      <IconStyle>
+        <scale>1.3</scale>
+        <Icon>
+          <href>http://maps.google.com/mapfiles/kml/paddle/red-circle.png</href>
+        </Icon>
+        <hotSpot x="32" y="1" xunits="pixels" yunits="pixels"/>
+      </IconStyle>
+      <ListStyle>
+        <ItemIcon>
+          <href>http://maps.google.com/mapfiles/kml/paddle/red-circle-lv.png</href>
+        </ItemIcon>
+      </ListStyle>
+    </Style>
+    <StyleMap id="msn_red-circle">
+      <Pair>
+        <key>normal</key>
+        <styleUrl>#sn_red-circle</styleUrl>
+      </Pair>
+      <Pair>
+        <key>highlight</key>
+        <styleUrl>#sh_red-circle</styleUrl>
+      </Pair>
+    </StyleMap>
+"""
+KML_PLACEMARK = """    <Placemark>
+      <description>
+        Survey Instance: {uuid}
+      </description>
+      <styleUrl>#sh_red-circle</styleUrl>
+      <Point>
+        <coordinates>
+          {lng}, {lat}
+        </coordinates>
+      </Point>
+    </Placemark>
+"""
+KML_FOOTER = """  </Document>
+</kml>
+"""
+
+
 def generate_kml_export(
     export_type,
     extension,
@@ -706,14 +886,131 @@ def generate_kml_export(
     id_string,
     export_id=None,
     filter_query=None,  # Not used, ToDo removed it?
+    bbox=None,
+    start=None,
+    end=None,
 ):
-    user = User.objects.get(username=username)
-    xform = XForm.objects.get(user__username=username, id_string=id_string)
-    response = render(
-        request=None,
-        template_name='survey.kml',
-        context={'data': kml_export_data(id_string, user)},
+    return _generate_geo_export(
+        export_type,
+        extension,
+        username,
+        id_string,
+        export_id,
+        _kml_export_chunks,
+        bbox,
+        start,
+        end,
+    )
+
+
+def generate_geojson_export(
+    export_type,
+    extension,
+    username,
+    id_string,
+    export_id=None,
+    filter_query=None,  # Not used, see `generate_kml_export()`
+    bbox=None,
+    start=None,
+    end=None,
+):
+    return _generate_geo_export(
+        export_type,
+        extension,
+        username,
+        id_string,
+        export_id,
+        _geojson_export_chunks,
+        bbox,
+        start,
+        end,
+    )
+
+
+def geo_export_points(xform, bbox=None, start=None, end=None):
+    """
+    Return an iterator of `(id, uuid, longitude, latitude)` tuples, one for
+    the first geopoint of each submission of `xform`.
+
+    Coordinates are extracted by the database, submissions are never loaded.
+
+    :param bbox: `(min_lng, min_lat, max_lng, max_lat)` bounding box the
+        points must be within
+    :param start: Earliest submission time, as a date, a datetime or an ISO
+        8601 string
+    :param end: Latest submission time, same format as `start`
+    """
+    first_point = Func(
+        F('geom'), Value(1), function='ST_GeometryN', output_field=PointField()
     )
+    queryset = Instance.objects.filter(
+        xform=xform,
+        deleted_at__isnull=True,
+        geom__isnull=False,
+        **_get_date_created_filters(start, end),
+    )
+    if bbox:
+        # Use the spatial index before checking the exact coordinates
+        queryset = queryset.filter(geom__bboverlaps=Polygon.from_bbox(bbox))
+
+    queryset = queryset.annotate(
+        lng=Func(first_point, function='ST_X', output_field=FloatField()),
+        lat=Func(first_point, function='ST_Y', output_field=FloatField()),
+    ).filter(lng__isnull=False)
+
+    if bbox:
+        min_lng, min_lat, max_lng, max_lat = bbox
+        queryset = queryset.filter(
+            lng__range=(min_lng, max_lng), lat__range=(min_lat, max_lat)
+        )
+
+    return queryset.order_by('id').values_list(
+        'id', 'uuid', 'lng', 'lat'
+    ).iterator(chunk_size=ExportBuilder.BATCH_SIZE)
+
+
+def parse_bbox(value):
+    """
+    Parse a `min_lng,min_lat,max_lng,max_lat` string into a list of floats.
+    Raise `ValueError` if `value` is not a valid bounding box.
+    """
+    bbox = [float(coordinate) for coordinate in value.split(',')]
+    if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        raise ValueError(f'Invalid bounding box: {value}')
+    return bbox
+
+
+def _get_date_created_filters(start=None, end=None):
+    filters = {}
+    for lookup, value in (('gte', start), ('lte', end)):
+        if not value:
+            continue
+        if isinstance(value, str):
+            parsed_value = parse_datetime(value) or parse_date(value)
+            if parsed_value is None:
+                raise ValueError(f'Invalid date: {value}')
+            value = parsed_value
+        if isinstance(value, datetime):
+            filters[f'date_created__{lookup}'] = value
+        else:
+            # Whole days are included
+            filters[f'date_created__date__{lookup}'] = value
+    return filters
+
+
+def _generate_geo_export(
+    export_type,
+    extension,
+    username,
+    id_string,
+    export_id,
+    chunks_func,
+    bbox=None,
+    start=None,
+    end=None,
+):
+    xform = XForm.objects.get(user__username=username, id_string=id_string)
+    points = geo_export_points(xform, bbox, start, end)
 
     basename = "%s_%s" % (id_string,
                           datetime.now().strftime("%Y_%m_%d_%H_%M_%S"))
@@ -725,15 +1022,13 @@ def generate_kml_export(
         export_type,
         filename)
 
-    temp_file = NamedTemporaryFile(suffix=extension)
-    temp_file.write(response.content)
-    temp_file.seek(0)
-    export_filename = default_storage.save(
-        file_path,
-        File(temp_file, file_path))
-    temp_file.close()
+    absolute_filename = _get_absolute_filename(file_path)
 
-    dir_name, basename = os.path.split(export_filename)
+    with default_storage.open(absolute_filename, 'wb') as destination_file:
+        for chunk in chunks_func(id_string, points):
+            destination_file.write(chunk.encode())
+
+    dir_name, basename = os.path.split(absolute_filename)
 
     # get or create export object
     if export_id:
@@ -749,26 +1044,26 @@ def generate_kml_export(
     return export
 
 
-def kml_export_data(id_string, user):
-
-    instances = Instance.objects.filter(
-        xform__user=user,
-        xform__id_string=id_string,
-        geom__isnull=False
-    ).order_by('id')
-    data_for_template = []
+def _kml_export_chunks(name, points):
+    yield KML_HEADER.format(name=xml_escape(name))
+    for _, uuid, lng, lat in points:
+        yield KML_PLACEMARK.format(uuid=xml_escape(uuid or ''), lng=lng, lat=lat)
+    yield KML_FOOTER
 
-    for instance in instances:
-        point = instance.point
-        if point:
-            data_for_template.append({
-                'name': id_string,
-                'id': instance.uuid,
-                'lat': point.y,
-                'lng': point.x,
-                })
 
-    return data_for_template
+def _geojson_export_chunks(name, points):
+    yield '{"type": "FeatureCollection", "features": ['
+    separator = ''
+    for pk, uuid, lng, lat in points:
+        feature = {
+            'type': 'Feature',
+            'id': pk,
+            'geometry': {'type': 'Point', 'coordinates': [lng, lat]},
+            'properties': {'uuid': uuid},
+        }
+        yield separator + json.dumps(feature)
+        separator = ', '
+    yield ']}'
 
 
 def _get_absolute_filename(filename: str) -> str:
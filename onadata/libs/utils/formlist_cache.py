@@ -0,0 +1,86 @@
+# coding: utf-8
+import hashlib
+import json
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import quote_etag
+
+from onadata.libs.utils.cache_tools import log_cache_lookup
+
+# A change of any of these versions invalidates the cached form lists which
+# depend on it
+GLOBAL_VERSION_KEY = 'formlist_version'
+USER_VERSION_KEY = 'formlist_version_user_{}'
+OWNER_VERSION_KEY = 'formlist_version_owner_{}'
+
+# Log the hit ratio every `LOG_INTERVAL` lookups
+LOG_INTERVAL = 1000
+
+
+def get_formlist_cache_key(request, username=None):
+    """
+    Return the cache key of the form list returned to `request`, which
+    depends on the requesting user, the owner of the forms when `username` is
+    specified, the `formID` filter and the host (download URLs are absolute).
+    """
+    version_keys = [GLOBAL_VERSION_KEY]
+    if not request.user.is_anonymous:
+        version_keys.append(USER_VERSION_KEY.format(request.user.pk))
+    if username is not None:
+        version_keys.append(OWNER_VERSION_KEY.format(username.lower()))
+
+    versions = cache.get_many(version_keys)
+    missing_versions = {
+        key: uuid4().hex for key in version_keys if key not in versions
+    }
+    if missing_versions:
+        cache.set_many(missing_versions, None)
+        versions.update(missing_versions)
+
+    parts = [
+        [versions[key] for key in version_keys],
+        None if request.user.is_anonymous else request.user.pk,
+        username.lower() if username is not None else None,
+        request.GET.get('formID'),
+        request.build_absolute_uri('/'),
+    ]
+    digest = hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+    return f'formlist_{digest}'
+
+
+def get_cached_formlist(cache_key):
+    """
+    Return the cached form list as a dict with `etag` and `content` keys, or
+    `None`
+    """
+    formlist = cache.get(cache_key)
+    log_cache_lookup('formlist', formlist is not None, LOG_INTERVAL)
+    return formlist
+
+
+def store_formlist_in_cache(cache_key, content):
+    formlist = {
+        'etag': quote_etag(hashlib.md5(content.encode()).hexdigest()),
+        'content': content,
+    }
+    cache.set(cache_key, formlist, settings.FORMLIST_CACHE_TIMEOUT)
+    return formlist
+
+
+def invalidate_formlist_cache(user_ids=None, usernames=None):
+    """
+    Invalidate the cached form lists of users `user_ids`, and of the forms
+    owned by `usernames`. All the form lists are invalidated if none are
+    given.
+    """
+    if user_ids is None and usernames is None:
+        keys = [GLOBAL_VERSION_KEY]
+    else:
+        keys = [USER_VERSION_KEY.format(pk) for pk in user_ids or []]
+        keys += [
+            OWNER_VERSION_KEY.format(username.lower())
+            for username in usernames or []
+        ]
+    cache.set_many({key: uuid4().hex for key in keys}, None)
@@ -1,9 +1,8 @@
 # coding: utf-8
 from io import BytesIO
-from tempfile import NamedTemporaryFile
 
-import requests
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from PIL import Image
@@ -35,59 +34,124 @@ def get_dimensions(size_, longest_side):
     return flat(width, height)
 
 
-def _save_thumbnails(image, original_path, size, suffix):
-    # Thumbnail format will be set by original file extension.
-    # Use same format to keep transparency of GIF/PNG
-    nm = NamedTemporaryFile(suffix='.%s' % image.format)
+def _save_thumbnail(image, image_format, filename, size, suffix):
     try:
         # Ensure conversion to float in operations
         image.thumbnail(get_dimensions(image.size, float(size)), Image.ANTIALIAS)
     except ZeroDivisionError:
         pass
+
+    # Thumbnail format is the format of the original file.
+    # Use same format to keep transparency of GIF/PNG
+    buffer = BytesIO()
     try:
-        image.save(nm.name)
+        image.save(buffer, format=image_format)
     except IOError:
         # e.g. `IOError: cannot write mode P as JPEG`, which gets raised when
         # someone uploads an image in an indexed-color format like GIF
-        image.convert('RGB').save(nm.name)
+        buffer = BytesIO()
+        image.convert('RGB').save(buffer, format=image_format)
 
     # Try to delete file with the same name if it already exists to avoid useless file.
     # i.e if `file_<suffix>.jpg` exists, Storage will save `a_<suffix>_<random_string>.jpg`
     # but nothing in the code is aware about this `<random_string>
+    thumbnail_path = get_path(filename, suffix)
     try:
-        default_storage.delete(get_path(original_path, suffix))
+        default_storage.delete(thumbnail_path)
     except IOError:
         pass
 
-    default_storage.save(
-        get_path(original_path, suffix), ContentFile(nm.read()))
+    default_storage.save(thumbnail_path, ContentFile(buffer.getvalue()))
 
-    nm.close()
 
+def resize(filename, sizes=None):
+    """
+    Create the thumbnails of the image `filename` for `sizes` (keys of
+    `settings.THUMB_CONF`), all of them by default.
 
-def resize(filename):
-    is_local = default_storage.__class__.__name__ == 'FileSystemStorage'
-    image = None
-    original_path = None
+    Returns the list of sizes which have been created.
+    """
+    conf = settings.THUMB_CONF
+    # From largest to smallest, each thumbnail is downscaled from the
+    # previous one
+    sizes = [key for key in settings.THUMB_ORDER if sizes is None or key in sizes]
+    if not sizes or not default_storage.exists(filename):
+        return []
 
-    if is_local:
-        path = default_storage.path(filename)
-        image = Image.open(path)
-        original_path = path
-    else:
-        path = default_storage.url(filename)
-        original_path = filename
-        req = requests.get(path)
-        if req.status_code == 200:
-            im = BytesIO(req.content)
-            image = Image.open(im)
+    try:
+        with default_storage.open(filename, 'rb') as image_file:
+            image = Image.open(image_file)
+            # JPEG images are decoded straight to the smallest scale which is
+            # still larger than the largest thumbnail
+            image.draft(
+                image.mode,
+                get_dimensions(image.size, float(conf[sizes[0]]['size'])),
+            )
+            image.load()
+    except (IOError, OSError):
+        return []
+
+    # e.g. MPO images (JPEG with extra data) cannot be written back
+    image_format = image.format if image.format in Image.SAVE else 'JPEG'
+    for key in sizes:
+        _save_thumbnail(
+            image, image_format, filename, conf[key]['size'], conf[key]['suffix']
+        )
+    return sizes
+
+
+def generate_thumbnails(filename, sizes=None, force=False):
+    """
+    Create the thumbnails of the image `filename` for `sizes` which do not
+    exist in storage yet, or all of them if `force` is `True`.
+
+    Returns the set of sizes which exist.
+    """
+    sizes = set(sizes or settings.THUMB_ORDER)
+    existing = set()
+    if not force:
+        for key in sizes:
+            thumbnail_path = get_path(filename, settings.THUMB_CONF[key]['suffix'])
+            if (
+                default_storage.exists(thumbnail_path)
+                and default_storage.size(thumbnail_path) > 0
+            ):
+                existing.add(key)
+
+    return existing | set(resize(filename, sizes - existing))
 
-    if image:
-        conf = settings.THUMB_CONF
-        [_save_thumbnails(
-            image, original_path,
-            conf[key]['size'],
-            conf[key]['suffix']) for key in settings.THUMB_ORDER]
+
+def get_cached_thumbnails(attachment):
+    """
+    Return the set of thumbnail sizes known to exist for `attachment`
+    """
+    return cache.get(_get_thumbnails_cache_key(attachment), set())
+
+
+def cache_thumbnails(attachment, sizes):
+    cache.set(
+        _get_thumbnails_cache_key(attachment),
+        set(sizes),
+        settings.THUMBNAIL_CACHE_TIMEOUT,
+    )
+
+
+def create_thumbnails(attachment, sizes=None):
+    """
+    Create the thumbnails of `attachment` for `sizes`, all of them by default,
+    unless they exist already. Returns whether they all exist.
+
+    The sizes which exist are cached, the storage is only checked on cache
+    misses.
+    """
+    sizes = set(sizes or settings.THUMB_ORDER)
+    existing = get_cached_thumbnails(attachment)
+    if sizes <= existing:
+        return True
+
+    existing |= generate_thumbnails(attachment.media_file.name, sizes - existing)
+    cache_thumbnails(attachment, existing)
+    return sizes <= existing
 
 
 def image_url(attachment, suffix):
@@ -95,21 +159,18 @@ def image_url(attachment, suffix):
     Return url of an image given size(@param suffix)
     e.g large, medium, small, or generate required thumbnail
     """
-    url = attachment.media_file.url
-    if suffix == 'original':
-        return url
-    else:
-        if suffix in settings.THUMB_CONF:
-            size = settings.THUMB_CONF[suffix]['suffix']
-            filename = attachment.media_file.name
-            if default_storage.exists(filename):
-                if default_storage.exists(get_path(filename, size)) and \
-                        default_storage.size(get_path(filename, size)) > 0:
-                    url = default_storage.url(
-                        get_path(filename, size))
-                else:
-                    resize(filename)
-                    return image_url(attachment, suffix)
-            else:
-                return None
-    return url
+    if suffix == 'original' or suffix not in settings.THUMB_CONF:
+        return attachment.media_file.url
+
+    if not create_thumbnails(attachment, [suffix]):
+        return None
+
+    return default_storage.url(
+        get_path(
+            attachment.media_file.name, settings.THUMB_CONF[suffix]['suffix']
+        )
+    )
+
+
+def _get_thumbnails_cache_key(attachment):
+    return f'thumbnails_{attachment.pk}'
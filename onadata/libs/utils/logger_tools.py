@@ -77,7 +77,12 @@ from onadata.apps.main.models import UserProfile
 from onadata.apps.viewer.models.data_dictionary import DataDictionary
 from onadata.apps.viewer.models.parsed_instance import ParsedInstance
 from onadata.libs.utils import common_tags
+from onadata.libs.utils.auth_cache import (
+    get_profile_flags,
+    has_xform_permission,
+)
 from onadata.libs.utils.model_tools import queryset_iterator, set_uuid
+from onadata.libs.utils.mongo_sync import sync_instances_to_mongo
 
 OPEN_ROSA_VERSION_HEADER = 'X-OpenRosa-Version'
 HTTP_OPEN_ROSA_VERSION_HEADER = 'HTTP_X_OPENROSA_VERSION'
@@ -108,16 +113,19 @@ def check_submission_permissions(
     :returns: None.
     :raises: PermissionDenied based on the above criteria.
     """
-    profile = UserProfile.objects.get_or_create(user=xform.user)[0]
+    profile_flags = get_profile_flags(xform.user_id)
+    if profile_flags is None:
+        profile = UserProfile.objects.get_or_create(user=xform.user)[0]
+        profile_flags = {'require_auth': profile.require_auth}
     if (
         request
         and (
-            profile.require_auth
+            profile_flags['require_auth']
             or xform.require_auth
             or request.path == '/submission'
         )
         and xform.user != request.user
-        and not request.user.has_perm('report_xform', xform)
+        and not has_xform_permission(request.user, 'report_xform', xform)
     ):
         raise PermissionDenied(t('Forbidden'))
 
@@ -807,9 +815,8 @@ def _has_edit_xform_permission(
 
 def _update_mongo_for_xform(xform, only_update_missing=True):
 
-    instance_ids = set(
-        [i.id for i in Instance.objects.only('id').filter(xform=xform)])
-    sys.stdout.write("Total no of instances: %d\n" % len(instance_ids))
+    instances = Instance.objects.filter(xform=xform)
+    sys.stdout.write("Total no of instances: %d\n" % instances.count())
     mongo_ids = set()
     user = xform.user
     userform_id = "%s_%s" % (user.username, xform.id_string)
@@ -822,40 +829,13 @@ def _update_mongo_for_xform(xform, only_update_missing=True):
                 max_time_ms=settings.MONGO_DB_MAX_TIME_MS
         )])
         sys.stdout.write("Total no of mongo instances: %d\n" % len(mongo_ids))
-        # get the difference
-        instance_ids = instance_ids.difference(mongo_ids)
     else:
         # clear mongo records
         mongo_instances.delete_many({common_tags.USERFORM_ID: userform_id})
 
-    # get instances
-    sys.stdout.write(
-        "Total no of instances to update: %d\n" % len(instance_ids))
-    instances = Instance.objects.only('id').in_bulk(
-        [id_ for id_ in instance_ids])
-    total = len(instances)
-    done = 0
-    for id_, instance in instances.items():
-        (pi, created) = ParsedInstance.objects.get_or_create(instance=instance)
-        try:
-            save_success = pi.save(asynchronous=False)
-        except InstanceEmptyError:
-            print(
-                "\033[91m[WARNING] - Skipping Instance #{}/uuid:{} because "
-                "it is empty\033[0m".format(id_, instance.uuid)
-            )
-        else:
-            if not save_success:
-                print(
-                    "\033[91m[ERROR] - Instance #{}/uuid:{} - Could not save "
-                    "the parsed instance\033[0m".format(id_, instance.uuid)
-                )
-            else:
-                done += 1
-
-        progress = "\r%.2f %% done..." % ((float(done) / float(total)) * 100)
-        sys.stdout.write(progress)
-        sys.stdout.flush()
+    sync_instances_to_mongo(
+        instances, skip_ids=mongo_ids, stdout=sys.stdout
+    )
     sys.stdout.write(
         "\nUpdated %s\n------------------------------------------\n"
         % xform.id_string)
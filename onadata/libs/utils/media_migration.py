@@ -0,0 +1,165 @@
+# coding: utf-8
+import mimetypes
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db.models import F
+from django.utils import timezone
+
+from onadata.apps.logger.models import MediaMigrationCheckpoint
+
+DEFAULT_WORKERS = 8
+DEFAULT_BATCH_SIZE = 1000
+# Files larger than this are uploaded in parts of the same size
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+
+COPIED = 'copied'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+
+class MediaMigration:
+    """
+    Apply an operation to batches of media files with a bounded pool of
+    threads, saving the position reached after each batch to a
+    `MediaMigrationCheckpoint` so that an interrupted run resumes from it.
+
+    The checkpoint only moves forward while no operation has failed, so that
+    failed files are retried by the next run.
+
+    Operations return a `(status, bytes)` tuple, and must not use the
+    database: they run in other threads.
+    """
+
+    # minimum delay (in seconds) between two progress reports
+    REPORT_INTERVAL = 5
+
+    def __init__(
+        self,
+        name,
+        workers=DEFAULT_WORKERS,
+        dry_run=False,
+        resume=True,
+        stdout=None,
+    ):
+        self.name = name
+        self.workers = workers
+        self.dry_run = dry_run
+        self.resume = resume
+        self.stdout = stdout
+        self.counts = {COPIED: 0, SKIPPED: 0, FAILED: 0}
+        self.bytes = 0
+        self._started = None
+        self._reported = 0
+
+    def get_position(self):
+        """
+        Return the position to start from, or `None` to start from the
+        beginning
+        """
+        if not self.resume:
+            return None
+        checkpoint = MediaMigrationCheckpoint.objects.filter(
+            name=self.name
+        ).first()
+        return checkpoint.position if checkpoint else None
+
+    def run(self, batches, operation, after_batch=None):
+        """
+        :param batches: Iterable of `(position, items)` tuples, `position`
+            being the one to resume from once all `items` are processed
+        :param operation: Callable applied to each item
+        :param after_batch: Callable run in the main thread once all the
+            items of a batch are processed, before the checkpoint is saved
+        :returns: The number of copied, skipped and failed items
+        :rtype: dict
+        """
+        self._started = time.time()
+        if not self.resume and not self.dry_run:
+            MediaMigrationCheckpoint.objects.filter(name=self.name).delete()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for position, items in batches:
+                for status, size in executor.map(operation, items):
+                    self.counts[status] += 1
+                    self.bytes += size
+                if after_batch:
+                    after_batch()
+                self._save_position(position, len(items))
+                self._report()
+
+        self._report(force=True)
+        return self.counts
+
+    def _report(self, force=False):
+        if not self.stdout:
+            return
+        now = time.time()
+        if not force and now - self._reported < self.REPORT_INTERVAL:
+            return
+
+        self._reported = now
+        elapsed = max(now - self._started, 0.001)
+        processed = sum(self.counts.values())
+        self.stdout.write(
+            '{}{}: {} copied, {} skipped, {} failed; {:.1f} files/s, '
+            '{:.1f} MB/s\n'.format(
+                '[dry run] ' if self.dry_run else '',
+                self.name,
+                self.counts[COPIED],
+                self.counts[SKIPPED],
+                self.counts[FAILED],
+                processed / elapsed,
+                self.bytes / elapsed / 1024 / 1024,
+            )
+        )
+        self.stdout.flush()
+
+    def _save_position(self, position, count):
+        if self.dry_run or self.counts[FAILED]:
+            return
+        checkpoint, _ = MediaMigrationCheckpoint.objects.get_or_create(
+            name=self.name
+        )
+        MediaMigrationCheckpoint.objects.filter(pk=checkpoint.pk).update(
+            position=str(position),
+            processed=F('processed') + count,
+            # `update()` does not set `auto_now` fields
+            date_modified=timezone.now(),
+        )
+
+
+def get_s3_client(s3):
+    """
+    Return the boto3 client of the storage `s3`: unlike boto3 resources,
+    clients are thread-safe
+    """
+    return s3.connection.meta.client
+
+
+def get_s3_key(s3, name):
+    from storages.utils import clean_name
+
+    # Same as the keys of `S3Boto3Storage`, which can be in a sub-directory
+    return s3._normalize_name(clean_name(name))
+
+
+def get_transfer_config():
+    from boto3.s3.transfer import TransferConfig
+
+    return TransferConfig(
+        multipart_threshold=MULTIPART_THRESHOLD,
+        multipart_chunksize=MULTIPART_THRESHOLD,
+        # Files are already uploaded concurrently
+        max_concurrency=2,
+    )
+
+
+def get_upload_extra_args(s3, name):
+    extra_args = {}
+    if s3.default_acl:
+        extra_args['ACL'] = s3.default_acl
+    content_type, _ = mimetypes.guess_type(name)
+    if content_type:
+        extra_args['ContentType'] = content_type
+    return extra_args
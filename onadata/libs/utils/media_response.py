@@ -0,0 +1,174 @@
+# coding: utf-8
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage, FileSystemStorage
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    HttpResponseNotFound,
+    HttpResponseNotModified,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.utils.cache import parse_etags
+from django.utils.http import urlquote
+from django.utils.translation import gettext as t
+
+MODE_STREAM = 'stream'
+MODE_X_ACCEL = 'x-accel'
+MODE_REDIRECT = 'redirect'
+
+# Only single byte ranges are supported, e.g. `bytes=0-1023` or `bytes=-500`
+range_pattern = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_protected_url(media_url):
+    """
+    Return the URL of the nginx internal location which serves `media_url`
+    """
+    if not isinstance(default_storage, FileSystemStorage):
+        # Double-encode the S3 URL to take advantage of NGINX's
+        # otherwise troublesome automatic decoding
+        return '/protected-s3/{}'.format(urlquote(media_url))
+
+    return media_url.replace(settings.MEDIA_URL, '/protected/')
+
+
+def get_storage_file_response(
+    request,
+    file_path,
+    content_type,
+    size=None,
+    etag=None,
+    content_disposition=None,
+):
+    """
+    Return a response sending the file `file_path` of the default storage,
+    according to `settings.MEDIA_FILE_RESPONSE_MODE`.
+
+    Files are never loaded in memory. When streamed by Django, a single byte
+    range can be requested with the `Range` header, e.g. to seek in videos,
+    and the file is not sent at all if its `etag` matches `If-None-Match`.
+
+    :param str file_path: Path of the file in the default storage
+    :param str content_type: Content type of the file
+    :param int size: Size of the file in bytes, asked to the storage if
+        `None`
+    :param str etag: Quoted ETag of the file
+    :param str content_disposition: Value of the `Content-Disposition` header
+    """
+    mode = settings.MEDIA_FILE_RESPONSE_MODE
+
+    if mode == MODE_REDIRECT:
+        # URLs are signed and expire when using S3
+        return HttpResponseRedirect(default_storage.url(file_path))
+
+    if etag:
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+    if mode == MODE_X_ACCEL:
+        # nginx takes care of streaming the file and of ranges
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = get_protected_url(
+            default_storage.url(file_path)
+        )
+        return _set_headers(response, etag, content_disposition)
+
+    try:
+        if size is None:
+            size = default_storage.size(file_path)
+        media_file = default_storage.open(file_path, 'rb')
+    except IOError:
+        return HttpResponseNotFound(t('The requested file could not be found.'))
+
+    byte_range = _get_byte_range(request, size, etag)
+    if byte_range is None:
+        response = FileResponse(
+            media_file,
+            content_type=content_type,
+            block_size=settings.MEDIA_FILE_RESPONSE_CHUNK_SIZE,
+        )
+        response['Content-Length'] = size
+        return _set_headers(response, etag, content_disposition)
+
+    start, end = byte_range
+    if start >= size:
+        media_file.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    media_file.seek(start)
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        _read_chunks(media_file, length),
+        status=206,
+        content_type=content_type,
+    )
+    response['Content-Length'] = length
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return _set_headers(response, etag, content_disposition)
+
+
+def _get_byte_range(request, size, etag):
+    """
+    Return the first and last (inclusive) positions of the byte range
+    requested with the `Range` header, or `None` if the whole file has to be
+    sent.
+
+    Multiple and malformed ranges are ignored, as allowed by RFC 7233.
+    """
+    range_header = request.META.get('HTTP_RANGE')
+    if not range_header:
+        return None
+
+    # The file has changed since the client received its first bytes
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag:
+        return None
+
+    match = range_pattern.match(range_header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range, i.e. the last `last` bytes
+        return max(size - int(last), 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+
+    return start, end
+
+
+def _read_chunks(media_file, length):
+    try:
+        while length > 0:
+            chunk = media_file.read(
+                min(settings.MEDIA_FILE_RESPONSE_CHUNK_SIZE, length)
+            )
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        media_file.close()
+
+
+def _set_headers(response, etag, content_disposition):
+    response['Accept-Ranges'] = 'bytes'
+    if etag:
+        response['ETag'] = etag
+    if content_disposition:
+        response['Content-Disposition'] = content_disposition
+    return response
@@ -0,0 +1,216 @@
+# coding: utf-8
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import connection
+
+from onadata.apps.logger.models import Instance, XForm
+from onadata.apps.viewer.models.parsed_instance import xform_instances
+from onadata.libs.utils.common_tags import ID, USERFORM_ID, XML_HASH
+from onadata.libs.utils.mongo_sync import sync_instances_to_mongo
+
+DEFAULT_CHUNK_SIZE = 5000
+
+COUNTERS = (
+    'instances',
+    'documents',
+    'missing',
+    'orphaned',
+    'stale',
+    'unhashed',
+    'repaired',
+)
+
+
+def check_mongo_consistency(
+    xforms=None,
+    repair=False,
+    include_unhashed=False,
+    workers=1,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+):
+    """
+    Compare the submissions of `xforms` (all the forms by default) in
+    PostgreSQL with their documents in MongoDB, and optionally repair the
+    divergent ones.
+
+    The ids of both stores are read in the same order by chunks of
+    `chunk_size` and merged, so memory does not depend on the size of the
+    forms. A document is:
+        * missing if its submission is not in MongoDB,
+        * orphaned if it is not in PostgreSQL anymore,
+        * stale if its `_xml_hash` differs from the submission `xml_hash`,
+        * unhashed if it has been written before `_xml_hash` existed.
+
+    :param bool repair: Rewrite missing and stale documents, and delete
+        orphaned ones
+    :param bool include_unhashed: Also rewrite unhashed documents
+    :param int workers: Number of forms checked concurrently
+    :returns: The results of each inconsistent form, and a summary of all of
+        them
+    :rtype: tuple(list, dict)
+    """
+    start = time.time()
+    # Reading a form by id is only efficient with this index
+    xform_instances.create_index([(USERFORM_ID, 1), (ID, 1)])
+
+    if xforms is None:
+        xforms = XForm.objects.all()
+    xforms = xforms.select_related('user').only(
+        'pk', 'id_string', 'user__username'
+    ).order_by('pk')
+
+    check = partial(
+        _check_xform,
+        repair=repair,
+        include_unhashed=include_unhashed,
+        chunk_size=chunk_size,
+    )
+    if workers > 1:
+        def check_in_thread(xform):
+            try:
+                return check(xform)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(check_in_thread, xforms.iterator()))
+    else:
+        results = [check(xform) for xform in xforms.iterator()]
+
+    summary = {counter: 0 for counter in COUNTERS}
+    inconsistent_results = []
+    for result in results:
+        for counter in COUNTERS:
+            summary[counter] += result[counter]
+        if _is_inconsistent(result, include_unhashed):
+            inconsistent_results.append(result)
+
+    summary['forms'] = len(results)
+    summary['inconsistent_forms'] = len(inconsistent_results)
+    summary['duration'] = round(time.time() - start, 3)
+    logging.info(f'Mongo consistency check: {summary}')
+
+    return inconsistent_results, summary
+
+
+def _check_xform(xform, repair, include_unhashed, chunk_size):
+    userform_id = f'{xform.user.username}_{xform.id_string}'
+    result = {counter: 0 for counter in COUNTERS}
+    result['userform_id'] = userform_id
+    to_sync = []
+    to_delete = []
+
+    def flush():
+        if to_sync:
+            synced, _ = sync_instances_to_mongo(
+                Instance.objects.filter(pk__in=to_sync)
+            )
+            result['repaired'] += synced
+            to_sync.clear()
+        if to_delete:
+            deleted = xform_instances.delete_many(
+                {ID: {'$in': to_delete}, USERFORM_ID: userform_id}
+            )
+            result['repaired'] += deleted.deleted_count
+            to_delete.clear()
+
+    instances = _iter_instance_hashes(xform.pk, chunk_size)
+    documents = _iter_document_hashes(userform_id, chunk_size)
+    instance = next(instances, None)
+    document = next(documents, None)
+    while instance is not None or document is not None:
+        if document is None or (
+            instance is not None and instance[0] < document[0]
+        ):
+            result['instances'] += 1
+            result['missing'] += 1
+            to_sync.append(instance[0])
+            instance = next(instances, None)
+        elif instance is None or document[0] < instance[0]:
+            result['documents'] += 1
+            result['orphaned'] += 1
+            to_delete.append(document[0])
+            document = next(documents, None)
+        else:
+            result['instances'] += 1
+            result['documents'] += 1
+            pk, xml_hash = instance
+            document_hash = document[1]
+            if document_hash is None:
+                result['unhashed'] += 1
+                if include_unhashed:
+                    to_sync.append(pk)
+            elif xml_hash is not None and document_hash != xml_hash:
+                result['stale'] += 1
+                to_sync.append(pk)
+            instance = next(instances, None)
+            document = next(documents, None)
+
+        if not repair:
+            # Only count the divergent documents
+            to_sync.clear()
+            to_delete.clear()
+        elif len(to_sync) + len(to_delete) >= chunk_size:
+            flush()
+
+    if repair:
+        flush()
+
+    return result
+
+
+def _is_inconsistent(result, include_unhashed=False):
+    return bool(
+        result['missing']
+        or result['orphaned']
+        or result['stale']
+        or (include_unhashed and result['unhashed'])
+    )
+
+
+def _iter_instance_hashes(xform_id, chunk_size):
+    """
+    Yield the `(pk, xml_hash)` of the submissions of the form `xform_id`
+    in primary key order
+    """
+    last_pk = 0
+    while True:
+        rows = list(
+            Instance.objects.filter(xform_id=xform_id, pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'xml_hash')[:chunk_size]
+        )
+        if not rows:
+            return
+        yield from rows
+        last_pk = rows[-1][0]
+
+
+def _iter_document_hashes(userform_id, chunk_size):
+    """
+    Yield the `(_id, _xml_hash)` of the documents of `userform_id` in `_id`
+    order
+    """
+    last_id = None
+    while True:
+        query = {USERFORM_ID: userform_id}
+        if last_id is not None:
+            query[ID] = {'$gt': last_id}
+        documents = list(
+            xform_instances.find(
+                query,
+                {ID: 1, XML_HASH: 1},
+                max_time_ms=settings.MONGO_DB_MAX_TIME_MS,
+            )
+            .sort(ID, 1)
+            .limit(chunk_size)
+        )
+        if not documents:
+            return
+        for document in documents:
+            yield document[ID], document.get(XML_HASH)
+        last_id = documents[-1][ID]
@@ -0,0 +1,156 @@
+# coding: utf-8
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from onadata.apps.logger.models import Instance, XForm
+from onadata.apps.logger.xform_instance_parser import XFormInstanceParser
+from onadata.apps.viewer.models.parsed_instance import (
+    ParsedInstance,
+    xform_instances,
+)
+from onadata.libs.utils.common_tags import ID, XFORM_ID_STRING
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def sync_instances_to_mongo(
+    queryset, batch_size=DEFAULT_BATCH_SIZE, skip_ids=None, stdout=None
+):
+    """
+    Rebuild the Mongo documents of the `Instance`s of `queryset`.
+
+    Instances are read by batches of `batch_size` in primary key order, with
+    their attachments, notes and tags prefetched for the whole batch, and
+    each form is parsed once. The documents of a batch are written with a
+    single unordered `bulk_write`.
+
+    Missing `ParsedInstance`s are created, without calling the REST services
+    of the forms.
+
+    :param set skip_ids: Primary keys of the `Instance`s to leave untouched
+    :param stdout: File-like object progress is written to
+    :returns: Number of synced and of failed `Instance`s
+    :rtype: tuple(int, int)
+    """
+    pk_queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    xforms = {}
+    synced_total = failed_total = 0
+    last_pk = 0
+    while True:
+        pks = list(pk_queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not pks:
+            break
+        last_pk = pks[-1]
+
+        if skip_ids:
+            pks = [pk for pk in pks if pk not in skip_ids]
+        if not pks:
+            continue
+
+        synced, failed = _sync_batch(pks, xforms)
+        synced_total += synced
+        failed_total += failed
+        if stdout:
+            stdout.write(
+                f'Synced {synced_total} submissions ({failed_total} failed) '
+                f'up to #{last_pk}\n'
+            )
+            stdout.flush()
+
+    return synced_total, failed_total
+
+
+def _get_xform(xform_id, xforms):
+    """
+    Return the `XForm` `xform_id` from `xforms`, along with its data
+    dictionary, loading them on first use. The survey of the data
+    dictionary is only built once and shared by all the submissions.
+    """
+    if xform_id not in xforms:
+        xform = XForm.objects.select_related('user').get(pk=xform_id)
+        xforms[xform_id] = (xform, xform.data_dictionary())
+    return xforms[xform_id]
+
+
+def _sync_batch(pks, xforms):
+    instances = (
+        Instance.objects.filter(pk__in=pks)
+        .select_related('user', 'parsed_instance')
+        .prefetch_related('attachments', 'notes', 'tags')
+        .defer('json')
+        .order_by('pk')
+    )
+
+    new_parsed_instances = []
+    documents = []
+    failed = 0
+    for instance in instances:
+        xform, data_dictionary = _get_xform(instance.xform_id, xforms)
+        instance.xform = xform
+
+        try:
+            parsed_instance = instance.parsed_instance
+        except ParsedInstance.DoesNotExist:
+            parsed_instance = ParsedInstance(instance=instance)
+            parsed_instance._set_geopoint()
+            new_parsed_instances.append(parsed_instance)
+        parsed_instance.instance = instance
+
+        try:
+            # Parse the submission with the shared data dictionary rather
+            # than fetching it again
+            instance._parser = XFormInstanceParser(
+                instance.xml, data_dictionary
+            )
+            document = parsed_instance.to_dict_for_mongo()
+        except Exception:
+            document = None
+
+        if not document or document.get(XFORM_ID_STRING) is None:
+            print('\033[91m[ERROR] Could not parse instance '
+                  '#{}/uuid:{}\033[0m'.format(instance.pk, instance.uuid))
+            failed += 1
+            continue
+
+        documents.append(document)
+
+    if new_parsed_instances:
+        ParsedInstance.objects.bulk_create(
+            new_parsed_instances, ignore_conflicts=True
+        )
+
+    if not documents:
+        return 0, failed
+
+    failed_indexes = set()
+    try:
+        xform_instances.bulk_write(
+            [
+                ReplaceOne({ID: document[ID]}, document, upsert=True)
+                for document in documents
+            ],
+            ordered=False,
+        )
+    except BulkWriteError as e:
+        failed_indexes = {
+            error['index'] for error in e.details.get('writeErrors', [])
+        }
+
+    synced_ids = []
+    failed_ids = []
+    for index, document in enumerate(documents):
+        if index in failed_indexes:
+            failed_ids.append(document[ID])
+        else:
+            synced_ids.append(document[ID])
+
+    # Skip the labor-intensive stuff in Instance.save() to gain performance
+    Instance.objects.filter(
+        pk__in=synced_ids, is_synced_with_mongo=False
+    ).update(is_synced_with_mongo=True)
+    if failed_ids:
+        Instance.objects.filter(
+            pk__in=failed_ids, is_synced_with_mongo=True
+        ).update(is_synced_with_mongo=False)
+
+    return len(synced_ids), failed + len(failed_ids)
@@ -1,9 +1,13 @@
 # coding: utf-8
 import os
 import logging
+import shutil
+import time
 import traceback
 import requests
 import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from tempfile import NamedTemporaryFile
@@ -17,6 +21,9 @@ from django.utils.translation import gettext as t
 
 SLASH = "/"
 
+# Size of the chunks copied from attachments to ZIP archives
+ZIP_EXPORT_CHUNK_SIZE = 1024 * 1024
+
 
 class MyError(Exception):
     pass
@@ -202,26 +209,176 @@ def create_attachments_zipfile(attachments, output_file=None):
     with zipfile.ZipFile(
         output_file, 'w', zipfile.ZIP_STORED, allowZip64=True
     ) as zip_file:
-        for attachment in attachments:
-            if default_storage.exists(attachment.media_file.name):
-                try:
-                    with default_storage.open(
-                        attachment.media_file.name, 'rb'
-                    ) as source_file:
-                        zip_file.writestr(
-                            attachment.media_file.name, source_file.read()
-                        )
-                except Exception as e:
-                    report_exception(
-                        "Error adding file \"{}\" to archive.".format(
-                            attachment.media_file.name
-                        ),
-                        e,
+        for attachment, source_file, error in _prefetch_attachment_files(
+            attachments
+        ):
+            if error is not None:
+                _report_attachment_error(attachment, error)
+                continue
+
+            zip_info, force_zip64 = _get_attachment_zip_info(attachment)
+            try:
+                with source_file, zip_file.open(
+                    zip_info, 'w', force_zip64=force_zip64
+                ) as destination:
+                    shutil.copyfileobj(
+                        source_file, destination, ZIP_EXPORT_CHUNK_SIZE
                     )
+            except Exception as e:
+                _report_attachment_error(attachment, e)
 
     return output_file
 
 
+def stream_attachments_zipfile(attachments):
+    """
+    Generator yielding a ZIP archive of `attachments` chunk by chunk as it is
+    built from storage. Nothing is written to disk, and files are stored
+    without compression since most attachments (pictures, audio, video) are
+    already compressed.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(
+        stream, 'w', zipfile.ZIP_STORED, allowZip64=True
+    ) as zip_file:
+        for attachment, source_file, error in _prefetch_attachment_files(
+            attachments
+        ):
+            if error is not None:
+                _report_attachment_error(attachment, error)
+                continue
+
+            zip_info, force_zip64 = _get_attachment_zip_info(attachment)
+            try:
+                with source_file, zip_file.open(
+                    zip_info, 'w', force_zip64=force_zip64
+                ) as destination:
+                    while chunk := source_file.read(ZIP_EXPORT_CHUNK_SIZE):
+                        destination.write(chunk)
+                        yield stream.consume()
+            except Exception as e:
+                # The entry is closed with what has been read so far and the
+                # archive stays valid
+                _report_attachment_error(attachment, e)
+            yield stream.consume()
+
+    # Central directory
+    yield stream.consume()
+
+
+class _ZipStream:
+    """
+    Write-only, non-seekable file-like object which keeps what `zipfile`
+    writes until it is consumed.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def consume(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _get_attachment_zip_info(attachment):
+    zip_info = zipfile.ZipInfo(
+        attachment.media_file.name,
+        date_time=time.localtime(time.time())[:6],
+    )
+    zip_info.compress_type = zipfile.ZIP_STORED
+    zip_info.external_attr = 0o600 << 16
+    # Let `zipfile` decide whether ZIP64 extensions are needed from the
+    # expected size, and force them when the size is unknown
+    zip_info.file_size = attachment.media_file_size or 0
+    force_zip64 = attachment.media_file_size is None
+    return zip_info, force_zip64
+
+
+def _report_attachment_error(attachment, error):
+    # Missing files are skipped silently, like they used to be when
+    # `exists()` was called first
+    if _is_file_not_found_error(error):
+        return
+
+    report_exception(
+        "Error adding file \"{}\" to archive.".format(
+            attachment.media_file.name
+        ),
+        error,
+    )
+
+
+def _is_file_not_found_error(error):
+    if isinstance(error, FileNotFoundError):
+        return True
+    # `botocore.exceptions.ClientError` raised by S3 storage
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        return response.get('Error', {}).get('Code') in ['404', 'NoSuchKey']
+    # `azure.core.exceptions.ResourceNotFoundError` raised by Azure storage
+    return error.__class__.__name__ == 'ResourceNotFoundError'
+
+
+def _open_attachment_file(attachment):
+    """
+    Open the file of `attachment` from storage. Return a tuple
+    `(file, error)`.
+    """
+    try:
+        source_file = default_storage.open(attachment.media_file.name, 'rb')
+        # Remote storages open files lazily, reading forces them to start
+        # downloading the file within the worker thread
+        source_file.read(0)
+    except Exception as e:
+        return None, e
+    return source_file, None
+
+
+def _prefetch_attachment_files(attachments):
+    """
+    Yield `(attachment, file, error)` tuples in the order of `attachments`,
+    while a bounded pool of threads opens the next files in the background.
+    """
+    max_workers = settings.ZIP_EXPORT_MAX_WORKERS
+    # Limit the number of files opened ahead of the one being written
+    max_pending = max_workers * 2
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for attachment in attachments:
+                pending.append((
+                    attachment,
+                    executor.submit(_open_attachment_file, attachment),
+                ))
+                if len(pending) > max_pending:
+                    attachment_, future = pending.popleft()
+                    yield (attachment_, *future.result())
+
+            while pending:
+                attachment_, future = pending.popleft()
+                yield (attachment_, *future.result())
+        finally:
+            # Close prefetched files if the consumer stopped early
+            for _, future in pending:
+                source_file, _ = future.result()
+                if source_file is not None:
+                    source_file.close()
+
+
 def _get_form_url(username):
     if settings.TESTING_MODE:
         http_host = 'http://{}'.format(settings.TEST_HTTP_HOST)
@@ -398,6 +398,8 @@ CACHES = {
 }
 
 DIGEST_NONCE_BACKEND = 'onadata.apps.django_digest_backends.cache.RedisCacheNonceStorage'
+# Compare and update nonce counts with a Redis script instead of a lock
+DIGEST_NONCE_ATOMIC_UPDATE = env.bool('DIGEST_NONCE_ATOMIC_UPDATE', True)
 
 ###################################
 # Django Rest Framework settings  #
@@ -521,6 +523,10 @@ THUMB_CONF = {
 }
 # order of thumbnails from largest to smallest
 THUMB_ORDER = ['large', 'medium', 'small']
+# duration to remember which thumbnails of an attachment exist (in seconds)
+THUMBNAIL_CACHE_TIMEOUT = env.int('THUMBNAIL_CACHE_TIMEOUT', 7 * 24 * 60 * 60)
+# number of processes creating thumbnails with `create_image_thumbnails`
+THUMBNAIL_MAX_WORKERS = env.int('THUMBNAIL_MAX_WORKERS', 4)
 
 # Number of times Celery retries to send data to external rest service
 REST_SERVICE_MAX_RETRIES = 3
@@ -557,6 +563,56 @@ GOOGLE_ANALYTICS_DOMAIN = "auto"
 # duration to keep zip exports before deletion (in seconds)
 ZIP_EXPORT_COUNTDOWN = 24 * 60 * 60
 
+# number of attachments fetched concurrently from storage for zip exports
+ZIP_EXPORT_MAX_WORKERS = env.int('ZIP_EXPORT_MAX_WORKERS', 4)
+
+# Filtered exports generated through the API are cached and reused as long as
+# the form, its submissions and the export options are unchanged
+EXPORT_CACHE_ENABLED = env.bool('EXPORT_CACHE_ENABLED', True)
+# duration to keep cached exports (in seconds)
+EXPORT_CACHE_TIMEOUT = env.int('EXPORT_CACHE_TIMEOUT', 24 * 60 * 60)
+# oldest cached exports of a form are deleted beyond these limits
+EXPORT_CACHE_MAX_FILES_PER_FORM = env.int('EXPORT_CACHE_MAX_FILES_PER_FORM', 20)
+EXPORT_CACHE_MAX_BYTES_PER_FORM = env.int(
+    'EXPORT_CACHE_MAX_BYTES_PER_FORM', 1024 * 1024 * 1024
+)
+
+# duration to keep the progress of asynchronous exports (in seconds)
+EXPORT_PROGRESS_TIMEOUT = env.int('EXPORT_PROGRESS_TIMEOUT', 24 * 60 * 60)
+
+# CSV files uploaded for import from this size (in bytes) are imported by a
+# Celery task, whose status is kept for `CSV_IMPORT_STATUS_TIMEOUT` seconds
+CSV_IMPORT_ASYNC_THRESHOLD = env.int(
+    'CSV_IMPORT_ASYNC_THRESHOLD', 5 * 1024 * 1024
+)
+CSV_IMPORT_STATUS_TIMEOUT = env.int('CSV_IMPORT_STATUS_TIMEOUT', 24 * 60 * 60)
+
+# OpenRosa form lists are cached until a form, a permission or a disclaimer
+# changes, or at most for this duration (in seconds) to catch up with changes
+# made directly in the database
+FORMLIST_CACHE_TIMEOUT = env.int('FORMLIST_CACHE_TIMEOUT', 15 * 60)
+
+# Authentication tokens, profile flags (`require_auth`, MFA) and permissions
+# on forms checked by the OpenRosa endpoints are cached for this duration (in
+# seconds). Keep it short: KPI changes them directly in the database.
+AUTH_CACHE_TIMEOUT = env.int('AUTH_CACHE_TIMEOUT', 30)
+
+# How media files (attachments and form media) are sent to clients:
+# - 'stream': read from storage by Django, chunk by chunk
+# - 'x-accel': delegated to nginx with `X-Accel-Redirect`, through the
+#   `/protected/` and `/protected-s3/` internal locations
+# - 'redirect': redirected to the storage URL, signed when using S3
+MEDIA_FILE_RESPONSE_MODE = env.str('MEDIA_FILE_RESPONSE_MODE', 'stream')
+# size (in bytes) of the chunks streamed to clients
+MEDIA_FILE_RESPONSE_CHUNK_SIZE = env.int(
+    'MEDIA_FILE_RESPONSE_CHUNK_SIZE', 64 * 1024
+)
+
+# duration to keep submissions rendered for ODK Briefcase (in seconds)
+BRIEFCASE_SUBMISSION_CACHE_TIMEOUT = env.int(
+    'BRIEFCASE_SUBMISSION_CACHE_TIMEOUT', 24 * 60 * 60
+)
+
 # default content length for submission requests
 DEFAULT_CONTENT_LENGTH = 10000000
 
@@ -634,6 +690,15 @@ DEFAULT_VALIDATION_STATUSES = [
 # Does not need to match KPI setting
 PAIRED_DATA_EXPIRATION = 300
 
+# Serve manifests with the current hash of expired paired data xml files and
+# refresh them in the background, instead of waiting for KPI to answer
+PAIRED_DATA_STALE_WHILE_REVALIDATE = env.bool(
+    'PAIRED_DATA_STALE_WHILE_REVALIDATE', True
+)
+
+# Timeout in sec. of background requests refreshing paired data xml files
+PAIRED_DATA_REFRESH_TIMEOUT = env.int('PAIRED_DATA_REFRESH_TIMEOUT', 30)
+
 # Minimum size (in bytes) of files to allow fast calculation of hashes
 # Should match KoBoCAT setting
 HASH_BIG_FILE_SIZE_THRESHOLD = 0.5 * 1024 * 1024  # 512 kB
@@ -812,6 +877,21 @@ MONGO_DB = mongo_client[mongo_db_name]
 # Timeout for Mongo, must be, at least, as long as Celery timeout.
 MONGO_DB_MAX_TIME_MS = CELERY_TASK_TIME_LIMIT * 1000
 
+# Periodically compare the submissions with their MongoDB documents
+MONGO_CONSISTENCY_CHECK_ENABLED = env.bool(
+    'MONGO_CONSISTENCY_CHECK_ENABLED', False
+)
+MONGO_CONSISTENCY_CHECK_REPAIR = env.bool(
+    'MONGO_CONSISTENCY_CHECK_REPAIR', False
+)
+MONGO_CONSISTENCY_CHECK_WORKERS = env.int('MONGO_CONSISTENCY_CHECK_WORKERS', 1)
+if MONGO_CONSISTENCY_CHECK_ENABLED:
+    CELERY_BEAT_SCHEDULE['check-mongo-consistency'] = {
+        'task': 'onadata.apps.viewer.tasks.check_mongo_consistency_of_all_forms',
+        'schedule': crontab(hour=3, minute=0),
+        'options': {'queue': 'kobocat_queue'}
+    }
+
 
 ################################
 # Sentry settings              #